@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal zip writer for .pkpass files.
+
+Unlike `zipfile`, it can write members whose data was compressed
+beforehand, so that files shared by many passes are compressed only once.
+"""
+import collections
+import contextlib
+import hashlib
+import os
+import struct
+import threading
+import time
+import zlib
+from io import BytesIO
+
+_local_header = struct.Struct('<4s5H3L2H')
+_central_header = struct.Struct('<4s6H3L5H2L')
+_end_record = struct.Struct('<4s4H2LH')
+
+# Compression methods, as in zipfile (only imported to read archives)
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+_UTF8_FLAG = 0x800
+_VERSION = 20
+_CREATED_BY = 3 << 8 | _VERSION  # Unix, for the file permissions
+
+
+class ZipEntry(object):
+    """
+    Content of a zip member: its (possibly compressed) data, along with the
+    CRC-32 and the size of the uncompressed data.
+    """
+
+    def __init__(self, data, crc, size, compress_type=ZIP_STORED):
+        self.data = data
+        self.crc = crc
+        self.size = size
+        self.compress_type = compress_type
+
+    def read(self):
+        """
+        :return: The uncompressed data.
+        """
+        if self.compress_type == ZIP_STORED:
+            return self.data
+        if self.compress_type == ZIP_DEFLATED:
+            return zlib.decompress(self.data, -15)
+        raise ValueError('Unsupported compression method %r' % self.compress_type)
+
+
+def read_entries(source):
+    """
+    Reads the members of the zip archive `source` (a path, bytes or a file
+    object) without decompressing them.
+
+    :return: `ZipEntry` of every member, by name.
+    """
+    import zipfile
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        fileobj = BytesIO(source)
+    elif isinstance(source, str) or hasattr(source, '__fspath__'):
+        fileobj = open(source, 'rb')
+    else:
+        fileobj = source
+    try:
+        entries = collections.OrderedDict()
+        for zinfo in zipfile.ZipFile(fileobj).infolist():
+            fileobj.seek(zinfo.header_offset)
+            header = _local_header.unpack(fileobj.read(_local_header.size))
+            if header[0] != b'PK\x03\x04':
+                raise zipfile.BadZipFile('Bad local header for %s' % zinfo.filename)
+            fileobj.seek(header[-2] + header[-1], 1)  # Name and extra field
+            entries[zinfo.filename] = ZipEntry(fileobj.read(zinfo.compress_size), zinfo.CRC,
+                                               zinfo.file_size, zinfo.compress_type)
+        return entries
+    finally:
+        if fileobj is not source:
+            fileobj.close()
+
+
+def compress(data, compress_type=ZIP_STORED, level=zlib.Z_DEFAULT_COMPRESSION):
+    """
+    Returns the `ZipEntry` for `data`. Deflated data that turns out to be
+    bigger than the original (e.g. for PNG images) is stored instead.
+    """
+    crc = zlib.crc32(data)
+    if compress_type == ZIP_DEFLATED:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        if len(compressed) < len(data):
+            return ZipEntry(compressed, crc, len(data), ZIP_DEFLATED)
+    elif compress_type != ZIP_STORED:
+        raise ValueError('Unsupported compression method %r' % compress_type)
+    return ZipEntry(data, crc, len(data), ZIP_STORED)
+
+
+class ArchiveInfo(object):
+    """
+    Summary of a written archive: its size, its checksum (hex digest, if
+    requested) and the CRC-32 of each member, by name.
+    """
+
+    def __init__(self, size, checksum, crcs):
+        self.size = size
+        self.checksum = checksum
+        self.crcs = crcs
+
+
+class ZipWriter(object):
+    """
+    Writes a zip archive sequentially to a file object (or to a new file if
+    given a path). The file object only needs a `write` method, so it can
+    be a socket file, a pipe or an HTTP response.
+
+    If `checksum` is the name of a `hashlib` algorithm, the written data is
+    hashed on the fly.
+    """
+
+    def __init__(self, fileobj, checksum=None):
+        if isinstance(fileobj, (str, bytes)) or hasattr(fileobj, '__fspath__'):
+            self.fileobj = open(fileobj, 'wb')
+            self._close_fileobj = True
+        else:
+            self.fileobj = fileobj
+            self._close_fileobj = False
+        self.offset = 0  # Bytes written so far
+        self._members = []
+        self._hash = hashlib.new(checksum) if checksum else None
+
+        year, month, day, hour, minute, second = time.localtime()[:6]
+        self._dostime = hour << 11 | minute << 5 | second // 2
+        self._dosdate = (year - 1980) << 9 | month << 5 | day
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write(self, data):
+        self.fileobj.write(data)
+        self.offset += len(data)
+        if self._hash is not None:
+            self._hash.update(data)
+
+    def write(self, name, data, compress_type=ZIP_STORED):
+        """
+        Compresses `data` (bytes or str, encoded as UTF-8) and writes it as
+        the member `name`.
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.write_entry(name, compress(data, compress_type))
+
+    def write_entry(self, name, entry):
+        """
+        Writes the `ZipEntry` `entry` as the member `name`.
+        """
+        try:
+            filename = name.encode('ascii')
+            flags = 0
+        except UnicodeEncodeError:
+            filename = name.encode('utf-8')
+            flags = _UTF8_FLAG
+        if self.offset + len(entry.data) > 0xFFFFFFFF or len(self._members) == 0xFFFF:
+            raise ValueError('Archive too big, zip64 is not supported')
+
+        self._members.append((filename, flags, entry.compress_type, entry.crc, len(entry.data),
+                              entry.size, self.offset))
+        self._write(_local_header.pack(
+            b'PK\x03\x04', _VERSION, flags, entry.compress_type, self._dostime, self._dosdate,
+            entry.crc, len(entry.data), entry.size, len(filename), 0))
+        self._write(filename)
+        self._write(entry.data)
+
+    def close(self):
+        """
+        Writes the central directory, which finishes the archive.
+        """
+        start = self.offset
+        for filename, flags, compress_type, crc, compress_size, size, offset in self._members:
+            self._write(_central_header.pack(
+                b'PK\x01\x02', _CREATED_BY, _VERSION, flags, compress_type, self._dostime,
+                self._dosdate, crc, compress_size, size, len(filename), 0, 0, 0, 0, 0o600 << 16, offset))
+            self._write(filename)
+        count = len(self._members)
+        self._write(_end_record.pack(b'PK\x05\x06', 0, 0, count, count, self.offset - start, start, 0))
+        if self._close_fileobj:
+            self.fileobj.close()
+
+    def info(self):
+        """
+        :return: ArchiveInfo
+        """
+        return ArchiveInfo(
+            self.offset,
+            self._hash.hexdigest() if self._hash is not None else None,
+            {filename.decode('utf-8'): crc for filename, _, _, crc, _, _, _ in self._members},
+        )
+
+
+def write_archive(fileobj, data, checksum=None):
+    """
+    Writes the already built archive `data` to `fileobj` (or to a new file
+    if given a path), as `ZipWriter` would have written it.
+
+    :return: ArchiveInfo
+    """
+    if isinstance(fileobj, (str, bytes)) or hasattr(fileobj, '__fspath__'):
+        with open(fileobj, 'wb') as fd:
+            fd.write(data)
+    else:
+        fileobj.write(data)
+    return ArchiveInfo(
+        len(data),
+        hashlib.new(checksum, data).hexdigest() if checksum else None,
+        _read_crcs(data),
+    )
+
+
+@contextlib.contextmanager
+def atomic_path(path):
+    """
+    Yields the temporary path where to write the file `path`, which is
+    renamed to `path` once written: readers never see half written files,
+    and nothing is left behind if writing fails.
+    """
+    tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_file(path, data):
+    """
+    Writes `data` (bytes) to the file `path` atomically (see `atomic_path`).
+
+    :return: path
+    """
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'wb') as fd:
+            fd.write(data)
+    return path
+
+
+def _read_crcs(data):
+    # From the central directory of an archive written by ZipWriter (no
+    # archive comment nor zip64 records)
+    end = _end_record.unpack_from(data, len(data) - _end_record.size)
+    count, offset = end[4], end[6]
+    crcs = {}
+    for _ in range(count):
+        header = _central_header.unpack_from(data, offset)
+        offset += _central_header.size
+        crcs[data[offset:offset + header[10]].decode('utf-8')] = header[7]
+        offset += header[10] + header[11] + header[12]
+    return crcs
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Creation of many passes at once, spread over a pool of worker processes.
+"""
+import collections
+import functools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from passbook.archive import ZIP_STORED, write_file
+from passbook.registry import resolve_signer
+
+# What the tasks run by the current worker process share (its signer...),
+# see _init_worker
+_worker = {}
+
+
+def _init_worker(state):
+    """
+    Initializer of pool processes: keeps `state` (a dict) for their tasks.
+    """
+    _worker.clear()
+    _worker.update(state)
+
+
+def _create_one(item, directory=None, signer=None, compression=ZIP_STORED, template=None):
+    """
+    Creates the .pkpass file of `item`, a pass or, given a
+    `passbook.template.PassTemplate`, the serial number and the values of a
+    pass of the template. The signer and template of the worker process
+    are used by default.
+
+    :return: `(serialNumber, bytes)`, or `(serialNumber, path)` of the
+             `<serialNumber>.pkpass` file written to `directory`.
+    """
+    signer = signer or _worker.get('signer')
+    template = template or _worker.get('template')
+    if template is None:
+        serialNumber = item.serialNumber
+        signer = resolve_signer(signer, item.passTypeIdentifier, item.teamIdentifier)
+        data = item.create(signer=signer, compression=compression).getvalue()
+    else:
+        serialNumber, values = item
+        data = template.create(values, signer, compression=compression).getvalue()
+    if directory:
+        return serialNumber, write_file(os.path.join(directory, '%s.pkpass' % serialNumber), data)
+    return serialNumber, data
+
+
+class Report(object):
+    """
+    Base of the reports of batch operations (passes created or verified,
+    notifications sent...), updated as each item is done: `count` items in
+    `elapsed` seconds. Subclasses tell outcomes apart in `_add`.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @property
+    def throughput(self):
+        """
+        :return: Items done per second.
+        """
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+    def add(self, *args):
+        """
+        Counts an item done (see `_add` for `args`).
+        """
+        with self._lock:
+            self.count += 1
+            self._add(*args)
+            self.elapsed = time.perf_counter() - self._start
+
+    def _add(self, *args):
+        pass
+
+
+class _Failure(object):
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+def imap_unordered(function, iterable, workers, initializer=None, initargs=(), max_pending=None):
+    """
+    Like `multiprocessing.Pool.imap_unordered`, but the items of `iterable`
+    are consumed lazily: only `max_pending` of them (4 per worker by
+    default) are handed to the pool of `workers` processes at a time.
+    """
+    max_pending = max_pending or workers * 4
+    results = queue.Queue()
+
+    def on_error(exception):
+        results.put(_Failure(exception))
+
+    def next_result():
+        result = results.get()
+        if isinstance(result, _Failure):
+            raise result.exception
+        return result
+
+    pool = multiprocessing.Pool(workers, initializer, initargs)
+    try:
+        pending = 0
+        for item in iterable:
+            pool.apply_async(function, (item,), callback=results.put, error_callback=on_error)
+            pending += 1
+            if pending >= max_pending:
+                yield next_result()
+                pending -= 1
+        while pending:
+            yield next_result()
+            pending -= 1
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+
+def create_many(passes, signer, workers=None, directory=None, max_pending=None):
+    """
+    Creates the .pkpass files of all the given passes with `signer`, or
+    with the signer of their type if `signer` is a
+    `passbook.registry.SignerRegistry`.
+
+    Passes are signed and zipped in a pool of `workers` processes (one per
+    CPU by default, in the current process if `workers` is 1), each of them
+    loading the signing identity once. `passes` can be any iterable
+    (e.g. a generator): only `max_pending` passes are handed to the pool
+    at a time, so memory stays bounded regardless of the batch size.
+
+    Yields `(serialNumber, bytes)` tuples as soon as each pass is ready (so
+    not necessarily in input order) or, if `directory` is given,
+    `(serialNumber, path)` tuples of the `<serialNumber>.pkpass` files
+    written there.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        for passfile in passes:
+            yield _create_one(passfile, directory, signer)
+        return
+
+    function = functools.partial(_create_one, directory=directory)
+    for result in imap_unordered(function, passes, workers, _init_worker, ({'signer': signer},), max_pending):
+        yield result
+
+
+class _AsyncCreation(object):
+    """
+    Asynchronous iterator of the passes created by `create_many_async`.
+    """
+
+    def __init__(self, passes, signer, executor, concurrency):
+        self._passes = iter(passes)
+        self._signer = signer
+        self._executor = executor
+        self._concurrency = concurrency
+        self._pending = set()  # Tasks creating passes
+        self._done = collections.deque()  # Tasks done, not yielded yet
+        self._exhausted = False
+
+    def __aiter__(self):
+        return self
+
+    async def _create(self, passfile):
+        return passfile.serialNumber, await passfile.create_async(self._signer, self._executor)
+
+    async def __anext__(self):
+        import asyncio  # Only imported (slow to import) when used
+        while not self._done:
+            while not self._exhausted and len(self._pending) < self._concurrency:
+                try:
+                    passfile = next(self._passes)
+                except StopIteration:
+                    self._exhausted = True
+                else:
+                    self._pending.add(asyncio.ensure_future(self._create(passfile)))
+            if not self._pending:
+                raise StopAsyncIteration
+            done, self._pending = await asyncio.wait(self._pending, return_when=asyncio.FIRST_COMPLETED)
+            self._done.extend(done)
+        return self._done.popleft().result()
+
+    async def aclose(self):
+        """
+        Cancels the passes being created and stops the iteration.
+        """
+        for task in self._pending:
+            task.cancel()
+        self._pending = set()
+        self._done.clear()
+        self._exhausted = True
+
+
+def create_many_async(passes, signer, executor=None, concurrency=None):
+    """
+    Asyncio counterpart of `create_many`: creates the .pkpass files of all
+    the given passes in `executor` (see `Pass.create_async`). `passes` can
+    be any iterable, consumed lazily: at most `concurrency` passes (one per
+    CPU by default) are in flight at a time.
+
+    :return: Asynchronous iterator (`async for`) of `(serialNumber, bytes)`
+             tuples, yielded as soon as each pass is ready (so not
+             necessarily in input order). `aclose()` cancels the passes
+             still in flight.
+    """
+    return _AsyncCreation(passes, signer, executor, concurrency or os.cpu_count() or 1)
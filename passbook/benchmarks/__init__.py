@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the pass creation pipeline, run against the test certificates
+with:
+
+    python -m passbook.benchmarks
+
+Every benchmark is a function registered with `@benchmark` that returns a
+dict of metrics, by name, as `(value, unit)` tuples. Results can be saved
+as a baseline and later runs compared against it (see `--help`).
+"""
+import collections
+import os
+import time
+
+from passbook.models import AssetRegistry, Barcode, BarcodeFormat, Pass, PassSigner, StoreCard
+
+BENCHMARKS = collections.OrderedDict()
+
+# Units of the metrics for which a bigger value is better
+HIGHER_IS_BETTER = {'passes/s', 'notifications/s', 'x'}
+
+_certificates = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test', 'certificates')
+
+# Approximate size in bytes of the 1x version of every image
+_images = {
+    'icon': 2 * 1024,
+    'logo': 8 * 1024,
+    'strip': 48 * 1024,
+    'background': 32 * 1024,
+    'thumbnail': 8 * 1024,
+    'footer': 4 * 1024,
+}
+_scales = {'': 1, '@2x': 4, '@3x': 9}
+
+# Files included in the passes of every size
+PASS_SIZES = collections.OrderedDict([
+    ('empty', {}),
+    ('small', {'icon.png': _images['icon'], 'logo.png': _images['logo']}),
+    ('large', collections.OrderedDict(
+        ('%s%s.png' % (image, suffix), size * scale)
+        for image, size in _images.items() for suffix, scale in _scales.items()
+    )),
+])
+
+
+def benchmark(function):
+    BENCHMARKS[function.__name__] = function
+    return function
+
+
+def get_signer():
+    try:
+        with open(os.path.join(_certificates, 'password.txt')) as file_:
+            password = file_.read().strip()
+    except IOError:
+        password = ''
+    return PassSigner(
+        os.path.join(_certificates, 'certificate.pem'),
+        os.path.join(_certificates, 'private.key'),
+        os.path.join(_certificates, 'wwdr_certificate.pem'),
+        password,
+    )
+
+
+def create_files(size):
+    """
+    Returns the (random) content of the files of the passes of the given
+    size, by name.
+    """
+    return collections.OrderedDict(
+        (filename, os.urandom(length)) for filename, length in PASS_SIZES[size].items()
+    )
+
+
+def create_pass(serialNumber, files=None, assets=None):
+    """
+    Creates a store card including `files` (content by name) with
+    `Pass.addFile`, and `assets` (`Asset` by name) with `Pass.addAsset`.
+    """
+    cardInfo = StoreCard()
+    cardInfo.addHeaderField('level', 'Gold', 'Level')
+    cardInfo.addPrimaryField('name', u'Jähn Doe', 'Name')
+    cardInfo.addSecondaryField('balance', '22.50', 'Balance')
+    cardInfo.addAuxiliaryField('expires', '2030-01-01', 'Expires')
+    cardInfo.addBackField('terms', 'Terms and conditions ' * 20, 'Terms')
+    passfile = Pass(cardInfo, organizationName='Org Name', passTypeIdentifier='pass.com.example',
+                    teamIdentifier='AGK5BZEN3E')
+    passfile.serialNumber = serialNumber
+    passfile.description = 'Benchmark pass'
+    passfile.barcode = Barcode(serialNumber, BarcodeFormat.QR)
+    passfile.backgroundColor = 'rgb(255, 255, 255)'
+    for filename, data in (files or {}).items():
+        passfile.addFile(filename, _Reader(data))
+    for filename, asset in (assets or {}).items():
+        passfile.addAsset(filename, asset)
+    return passfile
+
+
+def create_assets(files):
+    registry = AssetRegistry()
+    return collections.OrderedDict((filename, registry.add(data)) for filename, data in files.items())
+
+
+class _Reader(object):
+    # File object stand-in that doesn't copy the data when read
+
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+def timed(function, *args, **kwargs):
+    """
+    :return: The time it took to call `function`, in seconds.
+    """
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def percentiles(samples, prefix=''):
+    """
+    :return: The p50, p90 and p99 latencies of `samples` (in seconds) as
+             metrics, in milliseconds.
+    """
+    samples = sorted(samples)
+    metrics = collections.OrderedDict()
+    for percentile in (50, 90, 99):
+        index = min(len(samples) - 1, int(round(percentile / 100.0 * (len(samples) - 1))))
+        metrics['%sp%d' % (prefix, percentile)] = (samples[index] * 1000, 'ms')
+    return metrics
+
+
+def throughput(count, elapsed):
+    return (count / elapsed if elapsed else float('inf'), 'passes/s')
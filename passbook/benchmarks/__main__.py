@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import argparse
+import collections
+import json
+import os
+import sys
+
+from passbook.benchmarks import BENCHMARKS, HIGHER_IS_BETTER
+# Modules that register the benchmarks
+from passbook.benchmarks import bundle, images, imports, localization, memory, pipeline, push  # noqa: F401
+from passbook.benchmarks import registry, serialization, signing, validation  # noqa: F401
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(prog='python -m passbook.benchmarks',
+                                     description='Benchmarks of the pass creation pipeline.')
+    parser.add_argument('benchmarks', nargs='*', choices=[[]] + list(BENCHMARKS), metavar='benchmark',
+                        help='Benchmarks to run (all by default): %s' % ', '.join(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=200, help='Samples per latency measure (default: 200)')
+    parser.add_argument('--passes', type=int, default=200, help='Passes per throughput measure (default: 200)')
+    parser.add_argument('--workers', type=int, help='Worker processes for parallel creation (default: CPUs)')
+    parser.add_argument('--baseline', default=BASELINE, help='Baseline file (default: %(default)s)')
+    parser.add_argument('--save-baseline', action='store_true', help='Save the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='Slowdown against the baseline considered a regression (default: 1.5)')
+    return parser.parse_args(args)
+
+
+def compare(value, unit, baseline):
+    """
+    :return: How many times better (> 1) or worse (< 1) `value` is.
+    """
+    if unit in HIGHER_IS_BETTER:
+        return value / baseline if baseline else float('inf')
+    return baseline / value if value else float('inf')
+
+
+def main(args=None):
+    options = parse_args(sys.argv[1:] if args is None else args)
+    try:
+        with open(options.baseline) as file_:
+            baseline = json.load(file_)
+    except (IOError, ValueError):
+        baseline = {}
+
+    results = collections.OrderedDict()
+    regressions = []
+    for name in options.benchmarks or BENCHMARKS:
+        print(name)
+        for metric, (value, unit) in BENCHMARKS[name](options).items():
+            metric = '%s.%s' % (name, metric)
+            results[metric] = value
+            line = '  %-40s %12.3f %-9s' % (metric[len(name) + 1:], value, unit)
+            if metric in baseline:
+                ratio = compare(value, unit, baseline[metric])
+                line += ' %6.2fx vs baseline' % ratio
+                if ratio * options.threshold < 1:
+                    line += ' REGRESSION'
+                    regressions.append(metric)
+            print(line)
+            sys.stdout.flush()
+
+    if options.save_baseline:
+        baseline.update(results)
+        with open(options.baseline, 'w') as file_:
+            json.dump(baseline, file_, indent=2, sort_keys=True)
+        print('Baseline saved to %s' % options.baseline)
+    elif regressions:
+        print('%d regression(s) against the baseline' % len(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
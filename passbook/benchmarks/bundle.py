@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Passes/sec and size of a .pkpasses bundle of large passes sharing their
+images, built with `PassBundle` against creating every pass on its own and
+zipping the archives together.
+"""
+import collections
+import os
+import zipfile
+from io import BytesIO
+
+from passbook.archive import ZIP_DEFLATED
+from passbook.bundle import PassBundle
+from passbook.benchmarks import benchmark, create_assets, create_files, create_pass, get_signer, throughput, timed
+
+# Passes per bundle, e.g. the tickets of a group
+BUNDLE_SIZE = 10
+
+
+@benchmark
+def bundle(options):
+    signer = get_signer()
+    signer.smime  # Key loading isn't measured
+    files = create_files('large')
+    assets = create_assets(files)
+    bundles = max(1, options.passes // BUNDLE_SIZE)
+    count = bundles * BUNDLE_SIZE
+    workers = options.workers or max(2, os.cpu_count() or 1)
+    sizes = {}
+
+    def separately():
+        for _ in range(bundles):
+            output = BytesIO()
+            with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+                for i in range(BUNDLE_SIZE):
+                    passfile = create_pass(str(i), files)
+                    data = passfile.create(signer=signer, compression=ZIP_DEFLATED).getvalue()
+                    archive.writestr('%d.pkpass' % i, data)
+            sizes['separately'] = len(output.getvalue())
+
+    def bundled(workers=1):
+        for _ in range(bundles):
+            passes = [create_pass(str(i), assets=assets) for i in range(BUNDLE_SIZE)]
+            output = PassBundle(passes).create(signer, compression=ZIP_DEFLATED, workers=workers)
+            sizes['bundle'] = len(output.getvalue())
+
+    metrics = collections.OrderedDict()
+    metrics['separately'] = throughput(count, timed(separately))
+    metrics['bundle'] = throughput(count, timed(bundled))
+    metrics['bundle.parallel'] = throughput(count, timed(bundled, workers))
+    metrics['separately.size'] = (sizes['separately'] / 1024.0, 'KB')
+    metrics['bundle.size'] = (sizes['bundle'] / 1024.0, 'KB')
+    return metrics
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Time to optimize a PNG image and the size saved, and, with Pillow, time
+to derive the versions of a master image against reusing them from the
+disk cache.
+"""
+import collections
+import shutil
+import struct
+import tempfile
+import zlib
+
+from passbook.benchmarks import benchmark, percentiles, timed
+from passbook.images import ImagePipeline, optimize_png
+
+_XMP = (b'<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">' +
+        b'<rdf:Description rdf:about=""/>' * 100 + b'</rdf:RDF></x:xmpmeta>')
+
+
+def create_png(width, height, level=0):
+    """
+    :return: An RGB gradient compressed at the given `level`, with XMP
+             metadata, as exported by image editors.
+    """
+    raw = b''.join(b'\x00' + b''.join(bytes((x % 256, y % 256, 0)) for x in range(width)) for y in range(height))
+
+    def chunk(chunk_type, body):
+        return struct.pack('>I', len(body)) + chunk_type + body + struct.pack('>I', zlib.crc32(chunk_type + body))
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) +
+            chunk(b'iTXt', b'XML:com.adobe.xmp\x00\x00\x00\x00\x00' + _XMP) +
+            chunk(b'IDAT', zlib.compress(raw, level)) + chunk(b'IEND', b''))
+
+
+@benchmark
+def images(options):
+    metrics = collections.OrderedDict()
+    data = create_png(750, 288, 6)  # A strip@2x.png
+    samples = [timed(optimize_png, data) for _ in range(max(1, options.repeat // 10))]
+    metrics.update(percentiles(samples, prefix='optimize.'))
+    metrics['optimize.reduction'] = (len(data) / len(optimize_png(data)), 'x')
+
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return metrics
+    master = create_png(1500, 576)
+    directory = tempfile.mkdtemp()
+    try:
+        ImagePipeline(directory).variants('strip', master)
+        samples = [timed(ImagePipeline().variants, 'strip', master) for _ in range(max(1, options.repeat // 20))]
+        metrics.update(percentiles(samples, prefix='derive.'))
+        samples = [timed(ImagePipeline(directory).variants, 'strip', master) for _ in range(options.repeat)]
+        metrics.update(percentiles(samples, prefix='cached.'))
+    finally:
+        shutil.rmtree(directory)
+    return metrics
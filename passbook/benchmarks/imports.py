@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Cold start times, in fresh interpreters: importing passbook and building a
+pass.json (which must not import any crypto module), and creating a first
+signed pass.
+"""
+import collections
+import subprocess
+import sys
+
+from passbook.benchmarks import benchmark, percentiles
+
+# Crypto modules, only imported to sign (or verify) passes
+CRYPTO_MODULES = ('M2Crypto', 'cryptography')
+
+_SCRIPT = '''
+import sys
+import time
+
+start = time.perf_counter()
+from passbook.benchmarks import create_pass, get_signer
+passfile = create_pass('1234567')
+passfile._createPassJson()
+if %(sign)r:
+    passfile.create(signer=get_signer())
+elapsed = time.perf_counter() - start
+crypto = sorted(name for name in sys.modules if name.split('.')[0] in %(crypto)r)
+print('%%r %%s' %% (elapsed, ' '.join(crypto)))
+'''
+
+
+def cold_start(sign=False):
+    """
+    Builds a pass (and signs it, if `sign`) in a new interpreter.
+
+    :return: The time it took, including the imports, in seconds, and the
+             crypto modules imported.
+    """
+    output = subprocess.check_output([sys.executable, '-c', _SCRIPT % {'sign': sign, 'crypto': CRYPTO_MODULES}])
+    elapsed, _, modules = output.decode('ascii').strip().partition(' ')
+    return float(elapsed), modules.split()
+
+
+@benchmark
+def imports(options):
+    metrics = collections.OrderedDict()
+    for name, sign in (('json', False), ('signed', True)):
+        samples = []
+        for _ in range(max(1, options.repeat // 20)):
+            elapsed, modules = cold_start(sign)
+            assert sign or not modules, 'Crypto modules imported without signing: %s' % ', '.join(modules)
+            samples.append(elapsed)
+        metrics.update(percentiles(samples, prefix='%s.' % name))
+    return metrics
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Time to create a pass localized in a dozen languages, against the same pass
+in a single language.
+"""
+import collections
+
+from passbook.benchmarks import benchmark, create_pass, get_signer, percentiles, timed
+from passbook.localization import Localizations
+
+LOCALES = ('de', 'en', 'es', 'fr', 'it', 'ja', 'ko', 'nl', 'pt-BR', 'ru', 'sv', 'zh-Hans')
+
+
+def create_localizations(locales=LOCALES):
+    localizations = Localizations()
+    for locale in locales:
+        localizations.addStrings(locale, collections.OrderedDict(
+            ('Text %d' % i, u'Translation %d (%s) ' % (i, locale) * 4) for i in range(40)))
+    return localizations
+
+
+@benchmark
+def localization(options):
+    signer = get_signer()
+    signer.load()
+    metrics = collections.OrderedDict()
+    for name, locales in (('single', LOCALES[:1]), ('locales_%d' % len(LOCALES), LOCALES)):
+        localizations = create_localizations(locales)
+
+        def create():
+            passfile = create_pass('1234567')
+            localizations.add_to(passfile)
+            passfile.create(signer=signer)
+
+        samples = [timed(create) for _ in range(options.repeat)]
+        metrics.update(percentiles(samples, prefix='%s.' % name))
+    return metrics
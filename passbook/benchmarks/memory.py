@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Memory held by passes built in memory, e.g. a whole flight of boarding
+passes, and peak memory of exports as the number of passes grows: with
+every archive kept in memory, and with the streaming pipeline.
+"""
+import collections
+import os
+import shutil
+import tempfile
+import tracemalloc
+
+from passbook.benchmarks import benchmark, create_pass, get_signer
+from passbook.pipeline import DirectoryWriter, export
+from passbook.models import (Barcode, BarcodeFormat, BoardingPass, DateField, IBeacon, Location, NumberField, Pass,
+                             TransitType)
+
+
+def create_boarding_pass(i):
+    info = BoardingPass(TransitType.AIR)
+    info.addHeaderField('gate', 'B%d' % (i % 40), 'Gate')
+    info.addPrimaryField('from', 'EZE', 'Buenos Aires')
+    info.addPrimaryField('to', 'ZRH', u'Zürich')
+    info.addSecondaryField('passenger', 'Passenger %d' % i, 'Passenger')
+    info.addAuxiliaryField('seat', '%dA' % (i % 60), 'Seat')
+    info.auxiliaryFields.append(DateField('boarding', '2030-01-01T10:00Z', 'Boarding'))
+    info.auxiliaryFields.append(NumberField('group', i % 5, 'Group'))
+    info.addBackField('terms', 'Terms and conditions', 'Terms')
+    passfile = Pass(info, organizationName='Org Name', passTypeIdentifier='pass.com.example',
+                    teamIdentifier='AGK5BZEN3E')
+    passfile.serialNumber = str(i)
+    passfile.description = 'Boarding pass'
+    passfile.barcode = Barcode('M1PASSENGER/%d' % i, BarcodeFormat.PDF417)
+    passfile.locations = [Location(-34.8222, -58.5358), Location(47.4582, 8.5555)]
+    passfile.ibeacons = [IBeacon('E2C56DB5-DFFB-48D2-B060-D0F5A71096E0', 1, i % 100)]
+    return passfile
+
+
+@benchmark
+def memory(options):
+    count = options.passes * 10
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        passes = [create_boarding_pass(i) for i in range(count)]
+        for passfile in passes:
+            passfile._createPassJson()  # Serializing must not make passes bigger
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert len(passes) == count
+    return collections.OrderedDict([('boarding_pass', (used / 1024.0 / count, 'KB/pass'))])
+
+
+def _create_pass(i):
+    # Every pass with its own 16 KB image
+    return create_pass(str(i), {'strip.png': os.urandom(16 * 1024)})
+
+
+def peak_memory(function, *args):
+    """
+    :return: The peak memory allocated while calling `function`, in KB.
+    """
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1] / 1024.0
+    finally:
+        tracemalloc.stop()
+
+
+def export_in_memory(count, signer):
+    return [_create_pass(i).create(signer=signer).getvalue() for i in range(count)]
+
+
+def export_streaming(count, signer, directory):
+    for _ in export(range(count), signer, DirectoryWriter(directory), factory=_create_pass):
+        pass
+
+
+@benchmark
+def export_memory(options):
+    signer = get_signer()
+    signer.load()
+    metrics = collections.OrderedDict()
+    directory = tempfile.mkdtemp()
+    try:
+        for suffix, count in (('', options.passes), ('_4x', options.passes * 4)):
+            metrics['in_memory.peak%s' % suffix] = (peak_memory(export_in_memory, count, signer), 'KB')
+            metrics['streaming.peak%s' % suffix] = (peak_memory(export_streaming, count, signer, directory), 'KB')
+    finally:
+        shutil.rmtree(directory)
+    return metrics
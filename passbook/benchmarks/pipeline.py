@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Latency of every stage of `Pass.create` and passes/sec of the single, batch,
+parallel (once the pool of processes is started) and cached creation of
+passes of every size.
+"""
+import collections
+import os
+import time
+from io import BytesIO
+
+from passbook.batch import create_many
+from passbook.cache import MemoryCache
+from passbook.benchmarks import (PASS_SIZES, benchmark, create_assets, create_files, create_pass, get_signer,
+                                 percentiles, throughput, timed)
+
+
+@benchmark
+def stages(options):
+    signer = get_signer()
+    signer.smime  # Key loading is measured on its own
+    metrics = collections.OrderedDict()
+    for size in PASS_SIZES:
+        files = create_files(size)
+        samples = collections.defaultdict(list)
+        for i in range(options.repeat):
+            passfile = create_pass(str(i))
+            samples['files'].append(timed(lambda: [passfile.addFile(name, BytesIO(data))
+                                                   for name, data in files.items()]))
+            start = time.perf_counter()
+            pass_json = passfile._createPassJson()
+            samples['json'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            manifest = passfile._createManifest(pass_json)
+            samples['manifest'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            signature = signer.sign(manifest)
+            samples['signature'].append(time.perf_counter() - start)
+
+            samples['zip'].append(timed(passfile._createZip, pass_json, manifest, signature, BytesIO()))
+        for stage, stage_samples in samples.items():
+            metrics.update(percentiles(stage_samples, prefix='%s.%s.' % (size, stage)))
+
+    samples = [timed(lambda: get_signer().smime) for _ in range(max(1, options.repeat // 10))]
+    metrics.update(percentiles(samples, prefix='key.'))
+    return metrics
+
+
+@benchmark
+def creation(options):
+    signer = get_signer()
+    signer.load()  # Key loading is measured by stages
+    count = options.passes
+    workers = options.workers or max(2, os.cpu_count() or 1)
+    metrics = collections.OrderedDict()
+    for size in PASS_SIZES:
+        files = create_files(size)
+
+        def single():
+            for i in range(count):
+                create_pass(str(i), files).create(signer=signer)
+
+        assets = create_assets(files)
+
+        def batch():
+            passes = (create_pass(str(i), assets=assets) for i in range(count))
+            for _ in create_many(passes, signer, workers=1):
+                pass
+
+        def parallel():
+            # Only measured once the pool is up: from the first pass created
+            passes = (create_pass(str(i), assets=assets) for i in range(count + 1))
+            results = create_many(passes, signer, workers=workers)
+            next(results)
+            start = time.perf_counter()
+            for _ in results:
+                pass
+            return time.perf_counter() - start
+
+        create_pass('0', files).create(signer=signer)  # Warm up
+        metrics['%s.single' % size] = throughput(count, timed(single))
+        metrics['%s.batch' % size] = throughput(count, timed(batch))
+        metrics['%s.parallel' % size] = throughput(count, parallel())
+
+        def cached(cache):
+            # Passes requested again unchanged
+            for _ in range(count):
+                create_pass('1', assets=assets).create(signer=signer, cache=cache)
+
+        cache = MemoryCache()
+        create_pass('1', assets=assets).create(signer=signer, cache=cache)
+        metrics['%s.cached' % size] = throughput(count, timed(cached, cache))
+    return metrics
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Notifications/sec of `PushDispatcher` against a local fake push server.
+"""
+import collections
+import http.server
+import threading
+
+from passbook.benchmarks import benchmark
+from passbook.push import HTTPTransport, PushDispatcher
+
+
+class FakePushHandler(http.server.BaseHTTPRequestHandler):
+    # Keep-alive connections, as APNs
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        pushToken = self.path.rsplit('/', 1)[-1]
+        status = self.server.respond(self, pushToken)
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class FakePushServer(http.server.ThreadingHTTPServer):
+    """
+    Push server on a free local port, answering 410 for the push tokens
+    starting with 'unregistered' and 503 to the first notification sent to
+    those starting with 'busy'. Counts the notifications sent to every push
+    token and the connections opened.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakePushHandler)
+        self.notifications = collections.Counter()
+        self.topics = set()
+        self.clients = set()
+        self._lock = threading.Lock()
+
+    def respond(self, handler, pushToken):
+        with self._lock:
+            self.notifications[pushToken] += 1
+            self.topics.add(handler.headers.get('apns-topic'))
+            self.clients.add(handler.client_address)
+            count = self.notifications[pushToken]
+        if pushToken.startswith('unregistered'):
+            return 410
+        if pushToken.startswith('busy') and count == 1:
+            return 503
+        return 200
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+    @property
+    def transport(self):
+        return HTTPTransport(*self.server_address)
+
+
+@benchmark
+def push(options):
+    count = options.passes * 10
+    pushTokens = ['%064x' % i for i in range(count)]
+    metrics = collections.OrderedDict()
+    with FakePushServer() as server:
+        for connections in (1, 8):
+            dispatcher = PushDispatcher(server.transport, connections=connections)
+            report = dispatcher.notify(pushTokens, 'pass.com.example')
+            assert report.sent == count
+            metrics['connections_%d' % connections] = (report.throughput, 'notifications/s')
+    return metrics
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Passes/sec of a batch mixing the pass types of several brands, signed with
+the signers of a `SignerRegistry` against loading the identity of every
+pass from its files.
+"""
+import collections
+import time
+
+from passbook.benchmarks import benchmark, create_pass, get_signer, throughput
+from passbook.models import PassSigner
+from passbook.registry import SignerRegistry
+
+BRANDS = 8
+
+
+def create_passes(count):
+    passes = []
+    for i in range(count):
+        passfile = create_pass(str(i))
+        passfile.passTypeIdentifier = 'pass.com.brand%d' % (i % BRANDS)
+        passes.append(passfile)
+    return passes
+
+
+@benchmark
+def registry(options):
+    identity = get_signer()
+    signers = SignerRegistry()
+    for brand in range(BRANDS):
+        signers.register('pass.com.brand%d' % brand, 'AGK5BZEN3E', identity.certificate, identity.key,
+                         identity.wwdr_certificate, identity.password)
+    passes = create_passes(options.passes)
+    metrics = collections.OrderedDict()
+
+    start = time.perf_counter()
+    for passfile in passes:
+        passfile.create(signer=PassSigner(identity.certificate, identity.key, identity.wwdr_certificate,
+                                          identity.password))
+    metrics['per_pass_identity'] = throughput(len(passes), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for passfile in passes:
+        passfile.create(signer=signers.signer_for(passfile))
+    metrics['registry'] = throughput(len(passes), time.perf_counter() - start)
+    assert signers.loads == min(BRANDS, len(passes))
+    return metrics
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Time to serialize pass.json with every JSON backend installed, against the
+former `json.dumps(passfile, default=PassHandler)`.
+"""
+import collections
+import json
+
+from passbook.benchmarks import benchmark, create_pass, percentiles, timed
+from passbook.benchmarks.memory import create_boarding_pass
+from passbook.serialization import BACKENDS, PassHandler, get_json_backend
+
+
+def _backends():
+    backends = collections.OrderedDict([('json', get_json_backend())])
+    for name in BACKENDS:
+        try:
+            backends['%s_compact' % name] = get_json_backend(name, compact=True)
+        except ImportError:
+            pass
+    return backends
+
+
+@benchmark
+def serialization(options):
+    backends = _backends()
+    metrics = collections.OrderedDict()
+    for kind, passfile in (('store_card', create_pass('1234567')), ('boarding_pass', create_boarding_pass(1))):
+        samples = [timed(json.dumps, passfile, default=PassHandler) for _ in range(options.repeat)]
+        metrics.update(percentiles(samples, prefix='%s.legacy.' % kind))
+        legacy = metrics['%s.legacy.p50' % kind][0]
+        for name, backend in backends.items():
+            samples = [timed(lambda: backend.dumps(passfile.json_dict())) for _ in range(options.repeat)]
+            metrics.update(percentiles(samples, prefix='%s.%s.' % (kind, name)))
+            p50 = metrics['%s.%s.p50' % (kind, name)][0]
+            metrics['%s.%s.speedup' % (kind, name)] = (legacy / p50 if p50 else float('inf'), 'x')
+    return metrics
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Time to load the test identity and to sign a manifest with every signing
+backend installed.
+"""
+import collections
+
+from passbook.benchmarks import benchmark, create_pass, get_signer, percentiles, timed
+from passbook.models import PassSigner
+from passbook.signing import BACKENDS
+
+
+@benchmark
+def signing(options):
+    identity = get_signer()
+    manifest = create_pass('1234567')._createManifest('{}')
+    metrics = collections.OrderedDict()
+    for name in BACKENDS:
+        signer = PassSigner(identity.certificate, identity.key, identity.wwdr_certificate, identity.password,
+                            backend=name)
+        try:
+            signer.backend
+        except ImportError:
+            continue
+
+        def load():
+            PassSigner(signer.certificate, signer.key, signer.wwdr_certificate, signer.password,
+                       backend=signer.backend).load()
+
+        samples = [timed(load) for _ in range(max(1, options.repeat // 10))]
+        metrics.update(percentiles(samples, prefix='%s.key.' % name))
+        signer.load()
+        samples = [timed(signer.sign, manifest) for _ in range(options.repeat)]
+        metrics.update(percentiles(samples, prefix='%s.sign.' % name))
+    return metrics
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+Time to validate a pass, against the time to sign it: what an invalid pass
+dropped by the validator saves.
+"""
+import collections
+
+from passbook.benchmarks import PASS_SIZES, benchmark, create_files, create_pass, get_signer, percentiles, timed
+from passbook.validation import Validator
+
+
+@benchmark
+def validation(options):
+    validator = Validator()
+    signer = get_signer()
+    signer.load()
+    metrics = collections.OrderedDict()
+    for size in PASS_SIZES:
+        passfile = create_pass('1234567', create_files(size))
+        samples = [timed(validator.errors, passfile) for _ in range(options.repeat)]
+        metrics.update(percentiles(samples, prefix='%s.' % size))
+    manifest = passfile._createManifest(passfile._createPassJson())
+    samples = [timed(signer.sign, manifest) for _ in range(options.repeat)]
+    signature = percentiles(samples)['p50'][0]
+    p50 = metrics['large.p50'][0]
+    metrics['large.vs_signature'] = (signature / p50 if p50 else float('inf'), 'x')
+    return metrics
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+.pkpasses bundles: several passes (a family's tickets, the boarding passes
+of an itinerary...) delivered in one download.
+"""
+import pickle
+from io import BytesIO
+
+from passbook.archive import ZIP_STORED, ZipWriter
+from passbook.batch import _init_worker, _worker, imap_unordered
+from passbook.models import Asset
+from passbook.registry import resolve_signer
+
+MIME_TYPE = 'application/vnd.apple.pkpasses'
+
+
+class _MemberPickler(pickle.Pickler):
+    """
+    Pickles the members of a bundle for the worker processes, with the
+    shared `assets` (by SHA1 hash) only referenced: workers get them once,
+    from their initializer.
+    """
+
+    def __init__(self, fileobj, assets):
+        super().__init__(fileobj, pickle.HIGHEST_PROTOCOL)
+        self.assets = assets
+
+    def persistent_id(self, obj):
+        if isinstance(obj, Asset) and self.assets.get(obj.sha1) is obj:
+            return obj.sha1
+        return None
+
+
+class _MemberUnpickler(pickle.Unpickler):
+
+    def __init__(self, fileobj, assets):
+        super().__init__(fileobj)
+        self.assets = assets
+
+    def persistent_load(self, sha1):
+        return self.assets[sha1]
+
+
+def _dump_members(passes, assets):
+    for position, passfile in enumerate(passes):
+        output = BytesIO()
+        _MemberPickler(output, assets).dump(passfile)
+        yield position, output.getvalue()
+
+
+def _create_member(item, state=None):
+    """
+    Creates the .pkpass file of a member of a bundle, `(position, passfile)`
+    (or the passfile pickled by `_MemberPickler`), through `Pass.create`
+    with the signer, compression, hooks, cache and validator of `state`
+    (those of the worker process by default).
+
+    :return: `(position, bytes)`
+    """
+    position, passfile = item
+    state = state or _worker
+    if isinstance(passfile, bytes):
+        passfile = _MemberUnpickler(BytesIO(passfile), state['assets']).load()
+    signer = resolve_signer(state['signer'], passfile.passTypeIdentifier, passfile.teamIdentifier)
+    zip_file = passfile.create(signer=signer, compression=state['compression'], hooks=state['hooks'],
+                               cache=state['cache'], validator=state['validator'])
+    return position, zip_file.getvalue()
+
+
+class PassBundle(object):
+    """
+    Builds a .pkpasses bundle, a zip archive holding the .pkpass file of
+    every pass added, in order.
+
+    Every member pass has to include its own copy of the files it shares
+    with the others, but shared `Asset`s (see `AssetRegistry`) are hashed
+    and compressed once for all of them, and sent once to every worker
+    process. Members are stored as they are in the bundle, without
+    compressing them again.
+    """
+
+    def __init__(self, passes=()):
+        self.passes = list(passes)
+
+    def addPass(self, passfile):
+        self.passes.append(passfile)
+
+    def _shared_assets(self, compression):
+        """
+        :return: The `Asset`s included in more than one pass, by SHA1 hash,
+                 compressed with `compression`.
+        """
+        seen = set()
+        shared = {}
+        for passfile in self.passes:
+            for asset in passfile._files.values():
+                if id(asset) in seen:
+                    shared.setdefault(asset.sha1, asset).zip_entry(compression)
+                seen.add(id(asset))
+        return shared
+
+    def _names(self):
+        for passfile in self.passes:
+            serialNumber = passfile.serialNumber
+            if not serialNumber or serialNumber.startswith('.') or '/' in serialNumber or '\\' in serialNumber:
+                raise ValueError('Invalid serialNumber %r for a bundle member' % serialNumber)
+        names = ['%s.pkpass' % passfile.serialNumber for passfile in self.passes]
+        if len(set(names)) != len(names):
+            # Serial numbers are only unique by pass type
+            names = ['%d-%s' % (i, name) for i, name in enumerate(names)]
+        return names
+
+    def create(self, signer, zip_file=None, compression=ZIP_STORED, workers=1, hooks=None, cache=None,
+               validator=None):
+        """
+        Creates the .pkpasses file (see `stream`).
+        """
+        if not zip_file:
+            zip_file = BytesIO()
+        self.stream(zip_file, signer, compression, workers=workers, hooks=hooks, cache=cache, validator=validator)
+        return zip_file
+
+    def stream(self, fileobj, signer, compression=ZIP_STORED, checksum='sha256', workers=1, hooks=None, cache=None,
+               validator=None):
+        """
+        Writes the .pkpasses file to `fileobj`, each pass as soon as it is
+        created, in input order. Passes are created as `Pass.create` does,
+        with `hooks`, `cache` and `validator` (`Pass.hooks`, `Pass.cache` and
+        `Pass.validator` by default), signed by `signer` (a `PassSigner` or
+        a `passbook.registry.SignerRegistry`) and zipped with `compression`.
+        With more than one of `workers`, they are created in a pool of
+        processes, each one using its own copy of `hooks` and `cache`. The
+        files that passes share are compressed before, and sent once to
+        every process.
+
+        An invalid pass raises `passbook.validation.ValidationError` before
+        it is signed. Serial numbers name the members of the bundle: one
+        that isn't a valid file name raises `ValueError` before any pass is
+        created.
+
+        :return: passbook.archive.ArchiveInfo
+        """
+        if not self.passes:
+            raise ValueError('A bundle needs one pass at least')
+        names = self._names()
+        state = {'signer': signer, 'compression': compression, 'hooks': hooks, 'cache': cache,
+                 'validator': validator}
+        if workers == 1:
+            members = (_create_member(item, state) for item in enumerate(self.passes))
+        else:
+            state['assets'] = assets = self._shared_assets(compression)
+            members = imap_unordered(_create_member, _dump_members(self.passes, assets), workers, _init_worker,
+                                     (state,))
+
+        zf = ZipWriter(fileobj, checksum)
+        ready = {}  # Members created before the ones preceding them
+        position = 0
+        for i, data in members:
+            ready[i] = data
+            while position in ready:
+                zf.write(names[position], ready.pop(position), ZIP_STORED)
+                position += 1
+        zf.close()
+        return zf.info()
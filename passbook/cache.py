@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Caches of built .pkpass files, so that passes requested again unchanged
+(retries, downloads, web service updates...) aren't signed again.
+"""
+import collections
+import hashlib
+import os
+import threading
+
+from passbook.archive import write_file
+
+
+class PassCache(object):
+    """
+    Base of the caches of .pkpass files. A pass is cached under the digest
+    of its manifest, which holds the hashes of pass.json and of every file,
+    and of the identity that signs it: passes built again with the same
+    content are served from the cache without signing nor zipping them.
+
+    `hits` and `misses` count the lookups. Subclasses implement `_get` and
+    `_set`.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(manifest, signer, compression):
+        """
+        :return: The cache key of the pass with the given `manifest` (str),
+                 signed by `signer` and zipped with `compression`.
+        """
+        digest = hashlib.sha256(manifest.encode('utf-8'))
+        # The stamp of the signer changes when its identity is replaced at
+        # the same paths (e.g. by a SignerRegistry reload)
+        key = '\x00%s\x00%s\x00%r\x00%d' % (signer.certificate, signer.wwdr_certificate,
+                                            getattr(signer, 'stamp', None), compression)
+        digest.update(key.encode('utf-8'))
+        return digest.hexdigest()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key):
+        """
+        :return: The .pkpass file (bytes) cached under `key`, None if there
+                 isn't one.
+        """
+        data = self._get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def set(self, key, data):
+        self._set(key, data)
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, data):
+        raise NotImplementedError
+
+
+class MemoryCache(PassCache):
+    """
+    Keeps the last `max_entries` passes used (and no more than `max_size`
+    bytes of them, if given) in memory.
+    """
+
+    def __init__(self, max_entries=1024, max_size=None):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.size = 0  # Bytes cached
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def _set(self, key, data):
+        if self.max_size is not None and len(data) > self.max_size:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = data
+            self.size += len(data)
+            while len(self._entries) > self.max_entries or (self.max_size is not None and self.size > self.max_size):
+                self.size -= len(self._entries.popitem(last=False)[1])
+
+
+class DiskCache(PassCache):
+    """
+    Keeps passes as files in `directory`, removing the least recently used
+    ones when they take more than `max_size` bytes (256 MB by default).
+
+    Passes cached by previous runs are used too. The size limit is enforced
+    on the files known to this instance, so the directory shouldn't be
+    shared by several processes writing to it.
+    """
+
+    def __init__(self, directory, max_size=256 * 1024 * 1024):
+        super().__init__()
+        self.directory = directory
+        self.max_size = max_size
+        self.size = 0  # Bytes cached
+        self._entries = collections.OrderedDict()  # Size of the cached passes, least recently used first
+
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.pkpass'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-len('.pkpass')], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self.size += size
+        self._evict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, key):
+        return os.path.join(self.directory, '%s.pkpass' % key)
+
+    def _get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fd:
+                data = fd.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.size -= self._entries.pop(key, 0)
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return data
+
+    def _set(self, key, data):
+        if len(data) > self.max_size:
+            return
+        write_file(self._path(key), data)
+        with self._lock:
+            self.size += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.max_size:
+            key, size = self._entries.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+"""
+Command line bulk generator: creates the passes of a template for every
+row of a CSV or JSON Lines input, e.g.:
+
+    passbook template.json rows.csv --output passes/ --certificate certificate.pem --key private.key \\
+        --wwdr-certificate wwdr.pem --password-file password.txt
+
+The template is a pass.json document (plus an optional "files" object with
+the path of every file to include, relative to the template, an "images"
+one with the master image of the images whose versions are derived by
+`passbook.images.ImagePipeline`, e.g. {"logo": "logo.png"}, and a
+"localizations" one with the translations of every locale, e.g. {"fr":
+{"Balance": "Solde"}}, or the path of its pass.strings file) in which the
+strings starting with '$' are variables: "$balance" is replaced with the
+value of the balance column of each row ('$$' escapes a literal '$'). Every
+row must have a serialNumber, which is always a variable.
+"""
+import argparse
+import csv
+import functools
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+
+from passbook.archive import ZIP_DEFLATED, ZIP_STORED
+from passbook.batch import Report, _create_one, _init_worker, imap_unordered
+from passbook.images import ImagePipeline
+from passbook.localization import Localizations
+from passbook.models import (Barcode, BoardingPass, Coupon, CurrencyField, DateField, EventTicket, Field, Generic,
+                             IBeacon, Location, NumberField, Pass, PassSigner, StoreCard)
+from passbook.signing import BACKENDS
+from passbook.template import PassTemplate, Variable
+from passbook.validation import Validator
+
+STYLES = {style().jsonname: style for style in (BoardingPass, Coupon, EventTicket, Generic, StoreCard)}
+
+_FIELD_GROUPS = ('headerFields', 'primaryFields', 'secondaryFields', 'backFields', 'auxiliaryFields')
+
+# Keys of the template that aren't pass attributes, or are generated
+_GENERATED_KEYS = ('formatVersion', 'serialNumber', 'barcodes', 'files', 'images')
+
+
+def _variables(value):
+    """
+    :return: `value` (from a parsed template) with its '$name' strings
+             replaced with variables.
+    """
+    if isinstance(value, dict):
+        return {key: _variables(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_variables(item) for item in value]
+    if isinstance(value, str) and value.startswith('$'):
+        return value[1:] if value.startswith('$$') else Variable(value[1:])
+    return value
+
+
+def _set_attributes(obj, attributes, what):
+    for name, value in attributes.items():
+        try:
+            getattr(obj, name)
+            setattr(obj, name, value)
+        except AttributeError:
+            raise ValueError('Unknown %s key: %s' % (what, name))
+
+
+def _field(definition):
+    definition = dict(definition)
+    args = definition.pop('key'), definition.pop('value'), definition.pop('label', '')
+    if 'dateStyle' in definition or 'timeStyle' in definition:
+        field = DateField(*args)
+    elif 'numberStyle' in definition:
+        field = NumberField(*args)
+    elif 'currencyCode' in definition:
+        field = CurrencyField(*args)
+    else:
+        field = Field(*args)
+    _set_attributes(field, definition, 'field')
+    return field
+
+
+def load_template(path, pipeline=None):
+    """
+    Loads the template definition at `path` (see the module documentation),
+    deriving its images with `pipeline` (an `ImagePipeline` without disk
+    cache by default).
+
+    :return: PassTemplate
+    """
+    with open(path, encoding='utf-8') as fd:
+        definition = json.load(fd)
+    translations = definition.pop('localizations', {})  # Without variables
+    definition = _variables(definition)
+    styles = [style for style in STYLES if style in definition]
+    if len(styles) != 1:
+        raise ValueError('The template must have exactly one of the keys: %s' % ', '.join(sorted(STYLES)))
+
+    fields = dict(definition.pop(styles[0]))
+    passInformation = STYLES[styles[0]]()
+    if 'transitType' in fields:
+        passInformation.transitType = fields.pop('transitType')
+    for group in _FIELD_GROUPS:
+        getattr(passInformation, group).extend(_field(field) for field in fields.pop(group, ()))
+    if fields:
+        raise ValueError('Unknown %s key: %s' % (styles[0], ', '.join(sorted(fields))))
+
+    passfile = Pass(passInformation)
+    if 'barcode' in definition or definition.get('barcodes'):
+        barcode = dict(definition.pop('barcode', None) or definition['barcodes'][0])
+        passfile.barcode = Barcode(barcode.pop('message'))
+        _set_attributes(passfile.barcode, barcode, 'barcode')
+    passfile.locations = [_location(location) for location in definition.pop('locations', ())] or None
+    passfile.ibeacons = [_beacon(beacon) for beacon in definition.pop('beacons', ())] or None
+
+    directory = os.path.dirname(os.path.abspath(path))
+    for filename, filepath in definition.get('files', {}).items():
+        with open(os.path.join(directory, filepath), 'rb') as fd:
+            passfile.addFile(filename, fd)
+    images = definition.get('images', {})
+    if images:
+        pipeline = pipeline or ImagePipeline()
+    for name, filepath in images.items():
+        pipeline.add(passfile, name, os.path.join(directory, filepath))
+    localizations = Localizations()
+    for locale, strings in translations.items():
+        if isinstance(strings, str):
+            with open(os.path.join(directory, strings), 'rb') as fd:
+                strings = fd.read()
+        localizations.addStrings(locale, strings)
+    localizations.add_to(passfile)
+    for key in _GENERATED_KEYS:
+        definition.pop(key, None)
+    _set_attributes(passfile, definition, 'pass')
+    passfile.serialNumber = Variable('serialNumber')
+    return PassTemplate(passfile)
+
+
+def _location(definition):
+    definition = dict(definition)
+    location = Location(definition.pop('latitude'), definition.pop('longitude'), definition.pop('altitude', 0.0))
+    _set_attributes(location, definition, 'location')
+    return location
+
+
+def _beacon(definition):
+    definition = dict(definition)
+    beacon = IBeacon(definition.pop('proximityUUID'), definition.pop('major', None), definition.pop('minor', None))
+    _set_attributes(beacon, definition, 'beacon')
+    return beacon
+
+
+def read_rows(fileobj, format='jsonl'):
+    """
+    Yields the rows (dicts of values by variable name) of `fileobj`, a text
+    file in the given `format`: 'csv' (with a header line) or 'jsonl' (a
+    JSON object per line).
+    """
+    if format == 'csv':
+        for row in csv.DictReader(fileobj):
+            yield row
+        return
+    for line in fileobj:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _serial_number(row, variables, number):
+    serialNumber = row.get('serialNumber')
+    if not isinstance(serialNumber, str) or not serialNumber:
+        raise ValueError('Row %d: missing serialNumber' % number)
+    if serialNumber.startswith('.') or '/' in serialNumber or '\\' in serialNumber:
+        raise ValueError('Row %d: invalid serialNumber %r' % (number, serialNumber))
+    missing = variables.difference(row)
+    if missing:
+        raise ValueError('Row %d (%s): missing %s' % (number, serialNumber, ', '.join(sorted(missing))))
+    return serialNumber
+
+
+class DirectoryOutput(object):
+    """
+    Writes the passes as <serialNumber>.pkpass files in `directory` (from the
+    worker processes, which then only send back their path).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def open(self, resume):
+        os.makedirs(self.directory, exist_ok=True)
+        if not resume:
+            return set()
+        return {filename[:-len('.pkpass')] for filename in os.listdir(self.directory)
+                if filename.endswith('.pkpass')}
+
+    def add(self, serialNumber, result):
+        pass
+
+    def close(self):
+        pass
+
+
+class TarOutput(object):
+    """
+    Writes the passes as <serialNumber>.pkpass members of the tar archive at
+    `path` ('-' for standard output).
+    """
+    directory = None
+
+    def __init__(self, path):
+        self.path = path
+        self._tar = None
+
+    def _completed(self):
+        """
+        :return: The serial numbers in the archive and the offset after its
+                 last complete member, dropping any member cut by a crash.
+        """
+        size = os.path.getsize(self.path)
+        done, end = set(), 0
+        try:
+            with tarfile.open(self.path, 'r') as tar:
+                for member in tar:
+                    member_end = member.offset_data + -(-member.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+                    if member_end > size:
+                        break
+                    done.add(member.name[:-len('.pkpass')])
+                    end = member_end
+        except (tarfile.ReadError, EOFError):
+            pass
+        return done, end
+
+    def open(self, resume):
+        if self.path == '-':
+            self._tar = tarfile.open(fileobj=sys.stdout.buffer, mode='w|')
+            return set()
+        done = set()
+        if resume and os.path.exists(self.path):
+            done, end = self._completed()
+            with open(self.path, 'r+b') as fd:
+                fd.truncate(end)
+                fd.seek(end)
+                fd.write(tarfile.NUL * tarfile.BLOCKSIZE * 2)  # End of archive, where appending starts
+            self._tar = tarfile.open(self.path, 'a')
+        else:
+            self._tar = tarfile.open(self.path, 'w')
+        return done
+
+    def add(self, serialNumber, data):
+        info = tarfile.TarInfo('%s.pkpass' % serialNumber)
+        info.size = len(data)
+        info.mtime = time.time()
+        info.mode = 0o644
+        self._tar.addfile(info, io.BytesIO(data))
+        self._tar.fileobj.flush()
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
+
+
+class GenerationReport(Report):
+    """
+    Counts the passes created (and the rows skipped, already created by a
+    previous run) by `generate`, as they are created.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.skipped = 0
+
+
+def generate(template, rows, signer, output, workers=None, compression=ZIP_STORED, resume=False, report=None,
+             max_pending=None):
+    """
+    Creates the passes of `template` for all the `rows` and writes them to
+    `output` (`DirectoryOutput` or `TarOutput`), in a pool of `workers`
+    processes (one per CPU by default, in the current process if `workers`
+    is 1). Rows are read as passes are created, `max_pending` at a time at
+    most (see `passbook.batch.imap_unordered`).
+
+    With `resume`, the rows whose pass is already in `output` are skipped.
+
+    Yields the serial number of every pass created.
+    """
+    report = report or GenerationReport()
+    done = output.open(resume)
+    variables = template.variables
+
+    def items():
+        for number, row in enumerate(rows, 1):
+            serialNumber = _serial_number(row, variables, number)
+            if serialNumber in done:
+                report.skipped += 1
+                continue
+            yield serialNumber, row
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    try:
+        if workers == 1:
+            results = (_create_one(item, output.directory, signer, compression, template) for item in items())
+        else:
+            function = functools.partial(_create_one, directory=output.directory, compression=compression)
+            results = imap_unordered(function, items(), workers, _init_worker,
+                                     ({'signer': signer, 'template': template},), max_pending)
+        for serialNumber, result in results:
+            output.add(serialNumber, result)
+            report.add()
+            yield serialNumber
+    finally:
+        output.close()
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(prog='passbook', description='Creates the passes of a template for every row '
+                                     'of a CSV or JSON Lines input.')
+    parser.add_argument('template', help='Template definition (pass.json with $variables)')
+    parser.add_argument('input', nargs='?', default='-', help='CSV or JSON Lines file (default: standard input)')
+    parser.add_argument('--format', choices=['csv', 'jsonl'],
+                        help='Input format (default: csv for .csv files, jsonl otherwise)')
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument('--output', help='Directory where <serialNumber>.pkpass files are written')
+    output.add_argument('--tar', help="Tar archive where the passes are written ('-' for standard output)")
+    parser.add_argument('--certificate', required=True, help='Pass type certificate (PEM)')
+    parser.add_argument('--key', required=True, help='Private key of the certificate (PEM)')
+    parser.add_argument('--wwdr-certificate', required=True, help='Apple WWDR certificate')
+    parser.add_argument('--password-file', help='File with the password of the key (default: the '
+                        'PASSBOOK_KEY_PASSWORD environment variable)')
+    parser.add_argument('--signing-backend', choices=sorted(BACKENDS), help='Signing backend (default: m2crypto)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPUs)')
+    parser.add_argument('--deflate', action='store_true', help='Compress the passes')
+    parser.add_argument('--image-cache', help='Directory where the image versions derived from the template '
+                        'images are cached')
+    parser.add_argument('--no-validation', action='store_true',
+                        help="Don't validate the template (see passbook.validation) before creating passes")
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip the rows whose pass is already in the output (after a crash)')
+    parser.add_argument('--quiet', action='store_true', help="Don't print the progress")
+    return parser.parse_args(args)
+
+
+def _read_password(options):
+    if options.password_file:
+        with open(options.password_file) as fd:
+            return fd.read().strip()
+    return os.environ.get('PASSBOOK_KEY_PASSWORD', '')
+
+
+def _progress(report, final=False):
+    line = '%d passes created, %d skipped, %.1f passes/s' % (report.count, report.skipped, report.throughput)
+    sys.stderr.write('\r' + line + ('\n' if final else ''))
+    sys.stderr.flush()
+
+
+def main(args=None):
+    options = parse_args(sys.argv[1:] if args is None else args)
+    if options.tar == '-' and options.resume:
+        print('passbook: error: --resume needs a tar file', file=sys.stderr)
+        return 2
+    if options.input == '-':
+        input_ = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+    else:
+        input_ = open(options.input, encoding='utf-8', newline='')
+    format = options.format or ('csv' if options.input.lower().endswith('.csv') else 'jsonl')
+    output = DirectoryOutput(options.output) if options.output else TarOutput(options.tar)
+    signer = PassSigner(options.certificate, options.key, options.wwdr_certificate, _read_password(options),
+                        backend=options.signing_backend)
+    report = GenerationReport()
+    compression = ZIP_DEFLATED if options.deflate else ZIP_STORED
+    try:
+        template = load_template(options.template, ImagePipeline(options.image_cache))
+        if not options.no_validation:
+            Validator().check(template.passfile)
+        last = 0
+        for _ in generate(template, read_rows(input_, format), signer, output, options.workers, compression,
+                          options.resume, report):
+            if not options.quiet and time.perf_counter() - last >= 1:
+                last = time.perf_counter()
+                _progress(report)
+    except (ValueError, OSError, ImportError) as e:
+        print('passbook: error: %s' % e, file=sys.stderr)
+        return 1
+    finally:
+        input_.close()
+        if not options.quiet:
+            _progress(report, final=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
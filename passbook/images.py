@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Image pipeline: derives the 1x, @2x and @3x versions of the pass images
+(logo, strip...) from a single master image, at Apple's dimensions, and
+optimizes them losslessly. Variants are derived once per master image and
+cached on disk, so all the passes of a campaign share the same files.
+
+Resizing needs Pillow (`pip install Pillow`), only imported when a variant
+isn't cached yet. `optimize_png` works on its own.
+"""
+import collections
+import hashlib
+import os
+import struct
+import threading
+import zlib
+from io import BytesIO
+
+from passbook.archive import write_file
+from passbook.models import AssetRegistry
+
+# Size, in points, that the images of every style fit in (None for all the
+# other styles)
+IMAGE_SIZES = {
+    'icon': {None: (29, 29)},
+    'logo': {None: (160, 50)},
+    'thumbnail': {None: (90, 90)},
+    'strip': {'eventTicket': (375, 98), 'storeCard': (375, 144), 'coupon': (375, 144), 'boardingPass': (375, 123),
+              'generic': (375, 123), None: (375, 123)},
+    'background': {None: (180, 220)},
+    'footer': {None: (286, 15)},
+}
+
+# Pixels per point of every version of the images, by file name suffix
+SCALES = collections.OrderedDict([('', 1), ('@2x', 2), ('@3x', 3)])
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Chunks kept by optimize_png: the image itself and how to render its colors
+_KEPT_CHUNKS = {b'IHDR', b'PLTE', b'tRNS', b'IDAT', b'IEND', b'gAMA', b'cHRM', b'sRGB', b'iCCP', b'sBIT'}
+
+# Changes whenever the variants derived from the same master would change
+_VERSION = '1'
+
+
+def _chunks(data):
+    if data[:8] != PNG_SIGNATURE:
+        raise ValueError('Not a PNG image')
+    position = 8
+    while position + 8 <= len(data):
+        length, = struct.unpack('>I', data[position:position + 4])
+        chunk_type = data[position + 4:position + 8]
+        yield chunk_type, data[position + 8:position + 8 + length]
+        position += length + 12
+        if chunk_type == b'IEND':
+            return
+
+
+def _chunk(chunk_type, body):
+    return struct.pack('>I', len(body)) + chunk_type + body + struct.pack('>I', zlib.crc32(chunk_type + body))
+
+
+def optimize_png(data):
+    """
+    Optimizes the PNG image `data` losslessly: drops the metadata chunks
+    (text, timestamps...) and deflates the pixels again at the highest
+    compression level, if that makes them smaller.
+
+    :return: The optimized image, or `data` if it can't be made smaller.
+    """
+    chunks = []
+    pixels = []
+    for chunk_type, body in _chunks(data):
+        if chunk_type in (b'acTL', b'fcTL', b'fdAT'):
+            return data  # Animated PNG
+        if chunk_type == b'IDAT':
+            if not pixels:
+                chunks.append((chunk_type, None))
+            pixels.append(body)
+        elif chunk_type in _KEPT_CHUNKS:
+            chunks.append((chunk_type, body))
+    original = b''.join(pixels)
+    raw = zlib.decompress(original)
+    compressed = [original]
+    for strategy in (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED):
+        compressor = zlib.compressobj(9, zlib.DEFLATED, zlib.MAX_WBITS, 9, strategy)
+        compressed.append(compressor.compress(raw) + compressor.flush())
+    pixels = min(compressed, key=len)
+    result = PNG_SIGNATURE + b''.join(_chunk(chunk_type, pixels if body is None else body)
+                                      for chunk_type, body in chunks)
+    return result if len(result) < len(data) else data
+
+
+def image_size(name, style=None):
+    """
+    :return: The width and height, in points, that the image `name` ('logo',
+             'strip'...) fits in, for passes of the given `style`.
+    """
+    sizes = IMAGE_SIZES[name]
+    return sizes.get(style, sizes[None])
+
+
+def _read(source):
+    if isinstance(source, bytes):
+        return source
+    if hasattr(source, 'read'):
+        return source.read()
+    with open(source, 'rb') as fd:
+        return fd.read()
+
+
+class ImagePipeline(object):
+    """
+    Derives the versions of pass images from master images. Each version is
+    scaled down (never up) to fit in Apple's dimensions for the image, and,
+    with `optimize`, optimized losslessly.
+
+    Variants are kept in memory (as `Asset`s of `registry`, shared by all the
+    passes) and, if `directory` is given, saved there under the hash of the
+    master image: later runs reuse them without Pillow.
+    """
+
+    def __init__(self, directory=None, registry=None, optimize=True):
+        self.directory = directory
+        self.registry = registry or AssetRegistry()
+        self.optimize = optimize
+        self._variants = {}
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _key(self, data, name, size):
+        digest = hashlib.sha256(data)
+        digest.update(('\x00%s\x00%dx%d\x00%s\x00%s' % ((name,) + size + (self.optimize, _VERSION))).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key, filename):
+        return os.path.join(self.directory, '%s-%s' % (key, filename))
+
+    def _load(self, key, filenames):
+        files = collections.OrderedDict()
+        for filename in filenames:
+            try:
+                with open(self._path(key, filename), 'rb') as fd:
+                    files[filename] = fd.read()
+            except IOError:
+                return None
+        return files
+
+    def _save(self, key, files):
+        for filename, data in files.items():
+            write_file(self._path(key, filename), data)
+
+    def _derive(self, data, size):
+        """
+        :return: The PNG data of every version of the master image `data`
+                 fitting in `size` (in points), by file name suffix.
+        """
+        try:
+            from PIL import Image
+        except ImportError:
+            raise ImportError('Deriving image variants needs Pillow (pip install Pillow)')
+        master = Image.open(BytesIO(data))
+        master.load()
+        versions = collections.OrderedDict()
+        for suffix, scale in SCALES.items():
+            image = master.copy()
+            image.thumbnail((size[0] * scale, size[1] * scale), Image.LANCZOS)
+            output = BytesIO()
+            image.save(output, 'PNG', optimize=self.optimize)
+            versions[suffix] = optimize_png(output.getvalue()) if self.optimize else output.getvalue()
+        return versions
+
+    def variants(self, name, source, style=None):
+        """
+        Derives the versions of the image `name` ('icon', 'logo', 'strip',
+        'thumbnail', 'background' or 'footer') of passes of the given
+        `style` from `source` (bytes, a file object or a path).
+
+        :return: OrderedDict of `Asset` by file name ('logo.png',
+                 'logo@2x.png', 'logo@3x.png').
+        """
+        data = _read(source)
+        size = image_size(name, style)
+        key = self._key(data, name, size)
+        with self._lock:
+            assets = self._variants.get(key)
+        if assets is not None:
+            return assets
+
+        filenames = ['%s%s.png' % (name, suffix) for suffix in SCALES]
+        files = self._load(key, filenames) if self.directory else None
+        if files is None:
+            versions = self._derive(data, size)
+            files = collections.OrderedDict(
+                ('%s%s.png' % (name, suffix), versions[suffix]) for suffix in SCALES)
+            if self.directory:
+                self._save(key, files)
+        assets = collections.OrderedDict((filename, self.registry.add(png)) for filename, png in files.items())
+        with self._lock:
+            return self._variants.setdefault(key, assets)
+
+    def add(self, passfile, name, source):
+        """
+        Adds the versions of the image `name` derived from `source` to
+        `passfile`.
+        """
+        style = getattr(passfile.passInformation, 'jsonname', None)
+        for filename, asset in self.variants(name, source, style).items():
+            passfile.addAsset(filename, asset)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Localization bundles: the `<locale>.lproj/pass.strings` string tables (and
+localized images) of the passes of a campaign, encoded and hashed once and
+shared by every pass.
+"""
+import codecs
+import collections
+import re
+
+from passbook.models import AssetRegistry
+
+_locale = re.compile(r'^[A-Za-z]{2,3}([-_][A-Za-z0-9]+)*$')
+
+
+def _quote(text):
+    return '"%s"' % text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def encode_strings(strings):
+    """
+    :return: The pass.strings file with the translations in `strings` (a
+             dict of the translated text by key, i.e. by the text used in
+             pass.json), UTF-16 encoded with a byte order mark.
+    """
+    lines = ['%s = %s;\n' % (_quote(key), _quote(value)) for key, value in strings.items()]
+    return codecs.BOM_UTF16_LE + ''.join(lines).encode('utf-16-le')
+
+
+class Localizations(object):
+    """
+    The localized files of a campaign, by locale ('en', 'fr', 'pt-BR'...).
+    Every file is encoded and hashed once, when added, and included in
+    passes as a shared `Asset` (of `registry`), so a pass in many languages
+    costs little more to build than one in a single language:
+
+        localizations = Localizations()
+        localizations.addStrings('fr', {'Balance': 'Solde', 'Gold': 'Or'})
+        localizations.addFile('fr', 'logo.png', open('logo-fr.png', 'rb'))
+        for passfile in passes:
+            localizations.add_to(passfile)
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry or AssetRegistry()
+        self._assets = collections.OrderedDict()
+
+    @property
+    def locales(self):
+        return sorted({filename.split('.lproj/', 1)[0] for filename in self._assets})
+
+    def assets(self):
+        """
+        :return: The `Asset` of every localized file, by its name in the
+                 pass ('fr.lproj/pass.strings'...).
+        """
+        return self._assets
+
+    def addFile(self, locale, name, data):
+        """
+        Adds the file `name` (bytes or a file object) localized for `locale`.
+        """
+        if not _locale.match(locale):
+            raise ValueError('Invalid locale: %s' % locale)
+        if not name or '/' in name or name.startswith('.'):
+            raise ValueError('Invalid file name: %s' % name)
+        self._assets['%s.lproj/%s' % (locale, name)] = self.registry.add(data)
+
+    def addStrings(self, locale, strings):
+        """
+        Adds the string table of `locale` (a dict of translations by key,
+        see `encode_strings`), or the content of a pass.strings file.
+        """
+        if isinstance(strings, dict):
+            strings = encode_strings(strings)
+        self.addFile(locale, 'pass.strings', strings)
+
+    def add_to(self, passfile):
+        """
+        Includes all the localized files in `passfile`.
+        """
+        for filename, asset in self._assets.items():
+            passfile.addAsset(filename, asset)
@@ -1,13 +1,16 @@
 # -*- coding: utf-8 -*-
-import decimal
+import collections
 import hashlib
 import json
-import zipfile
+import os
+import threading
+import time
+import zlib
 from io import BytesIO
 
-from M2Crypto import SMIME
-from M2Crypto import X509
-from M2Crypto.X509 import X509_Stack
+from passbook.archive import ZIP_STORED, ZipWriter, compress, read_entries, write_archive
+from passbook.serialization import PassHandler, default_json_backend
+from passbook.signing import SigningBackend, get_signing_backend
 
 
 class Alignment:
@@ -48,21 +51,87 @@ class NumberStyle:
     SPELLOUT = 'PKNumberStyleSpellOut'
 
 
-class Field(object):
+class CompactObject(object):
+    """
+    Base of the objects that a pass holds many of (fields, barcodes,
+    locations...). They keep their attributes in `__slots__` instead of a
+    per instance `__dict__`.
+    """
+    __slots__ = ()
+
+    # Attributes only included in the JSON representation when not None
+    _optional_keys = ()
+
+    def _json_dict(self):
+        """
+        :return: The attributes always included in the JSON representation.
+        """
+        return {}
+
+    def json_dict(self):
+        d = self._json_dict()
+        for name in self._optional_keys:
+            value = getattr(self, name)
+            if value is not None:
+                d[name] = value
+        if type(self).__dictoffset__:
+            # Attributes of subclasses that don't define __slots__
+            d.update(self.__dict__)
+        return d
+
+
+class Field(CompactObject):
+    # Keys that Apple adds to fields (row, semantics...) can be set as any
+    # other attribute: they are kept in _other_keys, a dict only created for
+    # the fields that have them
+    __slots__ = ('key', 'value', 'label', 'changeMessage', 'textAlignment', 'attributedValue',
+                 'dataDetectorTypes', '_other_keys')
+    _optional_keys = ('attributedValue', 'dataDetectorTypes')
 
     def __init__(self, key, value, label=''):
+        self._other_keys = None
 
         self.key = key  # Required. The key must be unique within the scope
         self.value = value  # Required. Value of the field. For example, 42
         self.label = label  # Optional. Label text for the field.
         self.changeMessage = ''  # Optional. Format string for the alert text that is displayed when the pass is updated
         self.textAlignment = Alignment.LEFT
+        self.attributedValue = None  # Optional. Value of the field, including HTML markup for links
+        self.dataDetectorTypes = None  # Optional. Data detectors that are applied to the field's value
+
+    def __setattr__(self, name, value):
+        try:
+            object.__setattr__(self, name, value)
+        except AttributeError:  # Not a slot
+            if self._other_keys is None:
+                self._other_keys = {}
+            self._other_keys[name] = value
+
+    def __getattr__(self, name):
+        # Only called for the attributes that aren't set slots
+        if name != '_other_keys' and self._other_keys and name in self._other_keys:
+            return self._other_keys[name]
+        raise AttributeError('%r object has no attribute %r' % (type(self).__name__, name))
 
     def json_dict(self):
-        return self.__dict__
+        d = super().json_dict()
+        if self._other_keys:
+            d.update(self._other_keys)
+        return d
+
+    def _json_dict(self):
+        return {
+            'key': self.key,
+            'value': self.value,
+            'label': self.label,
+            'changeMessage': self.changeMessage,
+            'textAlignment': self.textAlignment,
+        }
 
 
 class DateField(Field):
+    __slots__ = ('dateStyle', 'timeStyle', 'isRelative', 'ignoresTimeZone')
+    _optional_keys = Field._optional_keys + ('ignoresTimeZone',)
 
     def __init__(self, key, value, label='', dateStyle=DateStyle.SHORT,
                  timeStyle=DateStyle.SHORT, ignoresTimeZone=False):
@@ -70,47 +139,58 @@ class DateField(Field):
         self.dateStyle = dateStyle  # Style of date to display
         self.timeStyle = timeStyle  # Style of time to display
         self.isRelative = False  # If true, the labels value is displayed as a relative date
-        if ignoresTimeZone:
-            self.ignoresTimeZone = ignoresTimeZone
+        self.ignoresTimeZone = ignoresTimeZone if ignoresTimeZone else None
 
-    def json_dict(self):
-        return self.__dict__
+    def _json_dict(self):
+        d = super()._json_dict()
+        d['dateStyle'] = self.dateStyle
+        d['timeStyle'] = self.timeStyle
+        d['isRelative'] = self.isRelative
+        return d
 
 
 class NumberField(Field):
+    __slots__ = ('numberStyle',)
 
     def __init__(self, key, value, label=''):
         super().__init__(key, value, label)
         self.numberStyle = NumberStyle.DECIMAL  # Style of date to display
 
-    def json_dict(self):
-        return self.__dict__
+    def _json_dict(self):
+        d = super()._json_dict()
+        d['numberStyle'] = self.numberStyle
+        return d
 
 
 class CurrencyField(Field):
+    __slots__ = ('currencyCode',)
 
     def __init__(self, key, value, label='', currencyCode=''):
         super().__init__(key, value, label)
         self.currencyCode = currencyCode  # ISO 4217 currency code
 
-    def json_dict(self):
-        return self.__dict__
+    def _json_dict(self):
+        d = super()._json_dict()
+        d['currencyCode'] = self.currencyCode
+        return d
 
 
-class Barcode(object):
+class Barcode(CompactObject):
+    __slots__ = ('format', 'message', 'messageEncoding', 'altText')
+    _optional_keys = ('altText',)
 
     def __init__(self, message, format=BarcodeFormat.PDF417, altText='', messageEncoding='iso-8859-1'):
         self.format = format
         self.message = message  # Required. Message or payload to be displayed as a barcode
         self.messageEncoding = messageEncoding  # Required. Text encoding that is used to convert the message
-        if altText:
-            self.altText = altText  # Optional. Text displayed near the barcode
+        self.altText = altText if altText else None  # Optional. Text displayed near the barcode
 
-    def json_dict(self):
-        return self.__dict__
+    def _json_dict(self):
+        return {'format': self.format, 'message': self.message, 'messageEncoding': self.messageEncoding}
 
 
-class Location(object):
+class Location(CompactObject):
+    __slots__ = ('latitude', 'longitude', 'altitude', 'distance', 'relevantText')
 
     def __init__(self, latitude, longitude, altitude=0.0):
         # Required. Latitude, in degrees, of the location.
@@ -134,11 +214,19 @@ class Location(object):
         # the pass is currently near the location
         self.relevantText = ''
 
-    def json_dict(self):
-        return self.__dict__
+    def _json_dict(self):
+        return {
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'altitude': self.altitude,
+            'distance': self.distance,
+            'relevantText': self.relevantText,
+        }
+
 
+class IBeacon(CompactObject):
+    __slots__ = ('proximityUUID', 'major', 'minor', 'relevantText')
 
-class IBeacon(object):
     def __init__(self, proximityuuid, major, minor):
         # IBeacon data
         self.proximityUUID = proximityuuid
@@ -148,8 +236,13 @@ class IBeacon(object):
         # Optional. Text message where near the ibeacon
         self.relevantText = ''
 
-    def json_dict(self):
-        return self.__dict__
+    def _json_dict(self):
+        return {
+            'proximityUUID': self.proximityUUID,
+            'major': self.major,
+            'minor': self.minor,
+            'relevantText': self.relevantText,
+        }
 
 
 class PassInformation(object):
@@ -232,12 +325,102 @@ class StoreCard(PassInformation):
         self.jsonname = 'storeCard'
 
 
+class Asset(object):
+    """
+    Content of a file included in a pass, along with its SHA1 hash.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.sha1 = hashlib.sha1(data).hexdigest()
+        self._entries = {}  # Compressed data, by compression method
+
+    def zip_entry(self, compress_type=ZIP_STORED):
+        """
+        :return: passbook.archive.ZipEntry, compressed only once per method
+        """
+        try:
+            return self._entries[compress_type]
+        except KeyError:
+            entry = compress(self.data, compress_type, zlib.Z_BEST_COMPRESSION)
+            return self._entries.setdefault(compress_type, entry)
+
+
+class AssetRegistry(object):
+    """
+    Holds the files shared by many passes (icons, logos, strips...) keyed
+    by their content hash, so that every distinct file is read, hashed and
+    kept in memory only once however many passes include it.
+    """
+
+    def __init__(self):
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._assets)
+
+    def __contains__(self, sha1):
+        return sha1 in self._assets
+
+    def get(self, sha1):
+        return self._assets[sha1]
+
+    def add(self, data):
+        """
+        Adds the content of a file (bytes or a file object) to the registry
+        and returns its `Asset`, which can then be included in any number of
+        passes with `Pass.addAsset`.
+        """
+        if hasattr(data, 'read'):
+            data = data.read()
+        asset = Asset(data)
+        with self._lock:
+            return self._assets.setdefault(asset.sha1, asset)
+
+
+class PassHooks(object):
+    """
+    Instrumentation of the creation of passes: subclass it and pass an
+    instance to `Pass.create` (or set it as `Pass.hooks` to instrument
+    every pass) to feed the duration of every stage to a metrics system.
+    """
+
+    def stage(self, passfile, name, seconds, size):
+        """
+        Called when the stage `name` of the creation of `passfile` finishes:
+        'validation' (only with a validator), 'key' (loading the signing
+        identity, only when not loaded yet),
+        'json', 'manifest', 'signature' and 'zip', or 'cache' (reading the
+        .pkpass file from the cache) instead of the last two for cached
+        passes. `size` is the length in bytes of what the stage produced.
+        """
+
+
 class Pass(object):
 
+    # Default PassHooks of all passes, None to disable instrumentation
+    hooks = None
+
+    # JSONBackend that serializes pass.json and manifest.json, None for the
+    # fastest one installed
+    json_backend = None
+
+    # Default PassCache of all passes, None to build every pass from scratch
+    cache = None
+
+    # Default passbook.validation.Validator of all passes, None to sign them
+    # without validation
+    validator = None
+
+    # passbook.registry.SignerRegistry with the signer of every pass type,
+    # used by create() and stream() when no signer is given
+    signers = None
+
     def __init__(self, passInformation, json='', passTypeIdentifier='',
                  organizationName='', teamIdentifier=''):
 
-        self._files = {}  # Holds the files to include in the .pkpass
+        self._files = {}  # Holds the files (Assets) to include in the .pkpass
         self._hashes = {}  # Holds the SHAs of the files array
 
         # Standard Keys
@@ -300,57 +483,214 @@ class Pass(object):
 
     # Adds file to the file array
     def addFile(self, name, fd):
-        self._files[name] = fd.read()
+        self._files[name] = Asset(fd.read())
+
+    # Adds a shared file (see AssetRegistry) to the file array
+    def addAsset(self, name, asset):
+        self._files[name] = asset
 
     # Creates the actual .pkpass file
-    def create(self, certificate, key, wwdr_certificate, password, zip_file=None):
-        pass_json = self._createPassJson()
+    def create(self, certificate=None, key=None, wwdr_certificate=None,
+               password=None, zip_file=None, signer=None, compression=ZIP_STORED, hooks=None, cache=None,
+               validator=None):
+        """
+        Creates the .pkpass file. Either pass the paths to the certificate,
+        key and WWDR certificate (and the key password), or a `PassSigner`
+        built once and reused for many passes. Without either, the signer of
+        the pass type is taken from `Pass.signers`.
+
+        With `compression=zipfile.ZIP_DEFLATED` the archive is compressed.
+        Files added as assets are compressed once and reused by every pass
+        that includes them, only pass.json, manifest.json and the signature
+        are compressed for each pass.
+
+        `hooks` (a `PassHooks`, `Pass.hooks` by default) is notified of the
+        duration of every stage.
+
+        With a `cache` (a `passbook.cache.PassCache`, `Pass.cache` by
+        default), a pass whose manifest is unchanged since it was last built
+        is copied from the cache instead of being signed and zipped again.
+
+        With a `validator` (a `passbook.validation.Validator`,
+        `Pass.validator` by default), the pass is validated before anything
+        else and `passbook.validation.ValidationError` raised if invalid.
+        """
+        if signer is None:
+            if certificate is None and self.signers is not None:
+                signer = self.signers.signer_for(self)
+            else:
+                signer = PassSigner(certificate, key, wwdr_certificate, password)
+        return self._create(self._createPassJson, signer, zip_file, compression, hooks, cache, validator)
+
+    def _create(self, createPassJson, signer, zip_file=None, compression=ZIP_STORED, hooks=None, cache=None,
+                validator=None):
+        if not zip_file:
+            zip_file = BytesIO()
+        self._stream(createPassJson, zip_file, signer, compression, hooks=hooks, cache=cache, validator=validator)
+        return zip_file
+
+    def stream(self, fileobj, signer, compression=ZIP_STORED, checksum='sha256', hooks=None, cache=None,
+               validator=None):
+        """
+        Writes the .pkpass file to `fileobj` (any object with a `write`
+        method: a file, a pipe, an HTTP response...) entry by entry, without
+        building the whole archive in memory first.
+
+        :return: passbook.archive.ArchiveInfo with the size of the archive,
+                 its `checksum` digest and the CRC-32 of every file.
+        """
+        if signer is None and self.signers is not None:
+            signer = self.signers.signer_for(self)
+        return self._stream(self._createPassJson, fileobj, signer, compression, checksum, hooks, cache, validator)
+
+    def _stream(self, createPassJson, fileobj, signer, compression=ZIP_STORED, checksum=None, hooks=None,
+                cache=None, validator=None):
+        if hooks is None:
+            hooks = self.hooks
+        if cache is None:
+            cache = self.cache
+        if validator is None:
+            validator = self.validator
+        if hooks is None:
+            if validator is not None:
+                validator.check(self)
+            pass_json = createPassJson()
+            manifest = self._createManifest(pass_json)
+            if cache is not None:
+                return self._cached(cache, pass_json, manifest, fileobj, signer, compression, checksum)
+            signature = signer.sign(manifest)
+            return self._createZip(pass_json, manifest, signature, zip_file=fileobj,
+                                   compression=compression, checksum=checksum)
+
+        def report(stage, start, size):
+            end = time.perf_counter()
+            hooks.stage(self, stage, end - start, size)
+            return end
+
+        start = time.perf_counter()
+        if validator is not None:
+            validator.check(self)
+            start = report('validation', start, 0)
+        if not signer.loaded:
+            signer.load()
+            start = report('key', start, 0)
+        pass_json = createPassJson()
+        start = report('json', start, len(pass_json.encode('utf-8')))
         manifest = self._createManifest(pass_json)
-        signature = self._createSignature(manifest, certificate, key, wwdr_certificate, password)
+        start = report('manifest', start, len(manifest))
+        if cache is not None:
+            return self._cached(cache, pass_json, manifest, fileobj, signer, compression, checksum, report)
+        signature = signer.sign(manifest)
+        start = report('signature', start, len(signature))
+        info = self._createZip(pass_json, manifest, signature, zip_file=fileobj,
+                               compression=compression, checksum=checksum)
+        report('zip', start, info.size)
+        return info
+
+    def _cached(self, cache, pass_json, manifest, fileobj, signer, compression, checksum, report=None):
+        """
+        Writes the .pkpass file cached for `manifest` to `fileobj`, signing
+        and caching it first if it isn't cached.
+        """
+        start = time.perf_counter()
+        key = cache.key(manifest, signer, compression)
+        data = cache.get(key)
+        if data is None:
+            zip_file = BytesIO()
+            signature = signer.sign(manifest)
+            if report is not None:
+                start = report('signature', start, len(signature))
+            info = self._createZip(pass_json, manifest, signature, zip_file=zip_file, compression=compression)
+            if report is not None:
+                report('zip', start, info.size)
+            data = zip_file.getvalue()
+            cache.set(key, data)
+        elif report is not None:
+            report('cache', start, len(data))
+        return write_archive(fileobj, data, checksum)
+
+    def update(self, previous, signer, zip_file=None, compression=ZIP_STORED):
+        """
+        Creates the .pkpass file of a new version of a pass from the .pkpass
+        file of its `previous` version (a path, bytes or a file object).
+
+        Files of the previous version that this pass doesn't include, or
+        includes with the same content, are copied as they are: they are
+        neither read into the pass, hashed again, nor recompressed. So
+        updating a pass only needs the changed files (often none, when only
+        pass.json changes) to be added to it.
+        """
+        entries = read_entries(previous)
+        previous_hashes = json.loads(entries['manifest.json'].read().decode('utf-8'))
+
+        pass_json = self._createPassJson()
+        hashes = {'pass.json': hashlib.sha1(pass_json.encode('utf-8')).hexdigest()}
+        files = collections.OrderedDict()
+        for filename, entry in entries.items():
+            if filename not in ('signature', 'manifest.json', 'pass.json'):
+                hashes[filename] = previous_hashes[filename]
+                files[filename] = entry
+        for filename, asset in self._files.items():
+            if hashes.get(filename) != asset.sha1:
+                hashes[filename] = asset.sha1
+                files[filename] = asset.zip_entry(compression)
+        self._hashes = hashes
+        manifest = self._dumps(hashes)
+        signature = signer.sign(manifest)
+
         if not zip_file:
             zip_file = BytesIO()
-        self._createZip(pass_json, manifest, signature, zip_file=zip_file)
+        zf = ZipWriter(zip_file)
+        zf.write('signature', signature, compression)
+        zf.write('manifest.json', manifest, compression)
+        zf.write('pass.json', pass_json, compression)
+        for filename, entry in files.items():
+            zf.write_entry(filename, entry)
+        zf.close()
         return zip_file
 
+    async def create_async(self, signer, executor=None):
+        """
+        Creates the .pkpass file without blocking the running event loop and
+        returns its content.
+
+        The whole pipeline runs in `executor` (the loop's default executor if
+        None), whose size bounds the number of passes being built at a time.
+        Prefer a `concurrent.futures.ProcessPoolExecutor` so that signing
+        doesn't compete with the event loop for the GIL.
+        """
+        import asyncio  # Only imported (slow to import) when used
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, _create_pass, self, signer)
+
     def _createPassJson(self):
-        return json.dumps(self, default=PassHandler)
+        return self._dumps(self.json_dict())
+
+    def _dumps(self, obj):
+        return (self.json_backend or default_json_backend()).dumps(obj)
 
     def _createManifest(self, pass_json):
         """
         Creates the hashes for all the files included in the pass file.
         """
-        self._hashes['pass.json'] = hashlib.sha1(pass_json.encode('utf-8')).hexdigest()
-        for filename, filedata in self._files.items():
-            self._hashes[filename] = hashlib.sha1(filedata).hexdigest()
-        return json.dumps(self._hashes)
+        hashes = {'pass.json': hashlib.sha1(pass_json.encode('utf-8')).hexdigest()}
+        for filename, asset in self._files.items():
+            hashes[filename] = asset.sha1
+        self._hashes = hashes
+        return self._dumps(hashes)
 
     def _get_smime(self, certificate, key, wwdr_certificate, password):
         """
         :return: M2Crypto.SMIME.SMIME
         """
-        def passwordCallback(*args, **kwds):
-            return bytes(password, encoding='ascii')
-
-        smime = SMIME.SMIME()
-
-        wwdrcert = X509.load_cert(wwdr_certificate)
-        stack = X509_Stack()
-        stack.push(wwdrcert)
-        smime.set_x509_stack(stack)
-
-        smime.load_key(key, certfile=certificate, callback=passwordCallback)
-        return smime
+        return PassSigner(certificate, key, wwdr_certificate, password).smime
 
     def _sign_manifest(self, manifest, certificate, key, wwdr_certificate, password):
         """
         :return: M2Crypto.SMIME.PKCS7
         """
-        smime = self._get_smime(certificate, key, wwdr_certificate, password)
-        pkcs7 = smime.sign(
-            SMIME.BIO.MemoryBuffer(bytes(manifest, encoding='utf8')),
-            flags=SMIME.PKCS7_DETACHED | SMIME.PKCS7_BINARY
-        )
-        return pkcs7
+        signer = PassSigner(certificate, key, wwdr_certificate, password)
+        return signer.sign_pkcs7(manifest)
 
     def _createSignature(self, manifest, certificate, key,
                          wwdr_certificate, password):
@@ -358,20 +698,20 @@ class Pass(object):
         Creates a signature (DER encoded) of the manifest. The manifest is the file
         containing a list of files included in the pass file (and their hashes).
         """
-        pk7 = self._sign_manifest(manifest, certificate, key, wwdr_certificate, password)
-        der = SMIME.BIO.MemoryBuffer()
-        pk7.write_der(der)
-        return der.read()
+        signer = PassSigner(certificate, key, wwdr_certificate, password)
+        return signer.sign(manifest)
 
     # Creates .pkpass (zip archive)
-    def _createZip(self, pass_json, manifest, signature, zip_file=None):
-        zf = zipfile.ZipFile(zip_file or 'pass.pkpass', 'w')
-        zf.writestr('signature', signature)
-        zf.writestr('manifest.json', manifest)
-        zf.writestr('pass.json', pass_json)
-        for filename, filedata in self._files.items():
-            zf.writestr(filename, filedata)
+    def _createZip(self, pass_json, manifest, signature, zip_file=None, compression=ZIP_STORED,
+                   checksum=None):
+        zf = ZipWriter(zip_file or 'pass.pkpass', checksum)
+        zf.write('signature', signature, compression)
+        zf.write('manifest.json', manifest, compression)
+        zf.write('pass.json', pass_json, compression)
+        for filename, asset in self._files.items():
+            zf.write_entry(filename, asset.zip_entry(compression))
         zf.close()
+        return zf.info()
 
     def json_dict(self):
         d = {
@@ -392,7 +732,7 @@ class Pass(object):
             if self.barcode.format not in original_formats:
                 legacyBarcode = Barcode(self.barcode.message, BarcodeFormat.PDF417, self.barcode.altText)
             d.update({'barcodes': newBarcodes})
-            d.update({'barcode': legacyBarcode})
+            d.update({'barcode': legacyBarcode.json_dict()})
 
         if self.relevantDate:
             d.update({'relevantDate': self.relevantDate})
@@ -405,9 +745,9 @@ class Pass(object):
         if self.logoText:
             d.update({'logoText': self.logoText})
         if self.locations:
-            d.update({'locations': self.locations})
+            d.update({'locations': [PassHandler(location) for location in self.locations]})
         if self.ibeacons:
-            d.update({'beacons': self.ibeacons})
+            d.update({'beacons': [PassHandler(ibeacon) for ibeacon in self.ibeacons]})
         if self.userInfo:
             d.update({'userInfo': self.userInfo})
         if self.associatedStoreIdentifiers:
@@ -426,12 +766,153 @@ class Pass(object):
         return d
 
 
-def PassHandler(obj):
-    if hasattr(obj, 'json_dict'):
-        return obj.json_dict()
-    else:
-        # For Decimal latitude and logitude etc.
-        if isinstance(obj, decimal.Decimal):
-            return str(obj)
+class PassSigner(object):
+    """
+    Signs pass manifests with a single identity (certificate, private key
+    and WWDR certificate).
+
+    The certificates and the key are parsed and decrypted once, on first
+    use, and then reused for every signature, so a signer should be built
+    once and shared by all the passes issued with the same identity. It is
+    safe to share it between threads and it can be pickled (e.g. to send it
+    to worker processes), in which case each receiving process loads the
+    identity once and reuses it for every signer unpickled afterwards, until
+    the certificate or key files are replaced (only for named backends).
+
+    `backend` is the `passbook.signing.SigningBackend` that signs, or its
+    name ('m2crypto', the default, or 'cryptography'). Named backends are
+    only created (and their crypto modules imported) on first signature.
+    """
+
+    def __init__(self, certificate, key, wwdr_certificate, password, backend=None):
+        self.certificate = certificate
+        self.key = key
+        self.wwdr_certificate = wwdr_certificate
+        self.password = password
+        self._backend = backend  # As given: a name, None or a backend
+        self._signing_backend = backend if isinstance(backend, SigningBackend) else None
+        self._identity = None
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        # Loaded identities and locks can't be pickled, the receiving
+        # process gets its own signer for the same identity instead
+        return _unpickle_signer, (self.certificate, self.key, self.wwdr_certificate, self.password, self._backend)
+
+    @property
+    def backend(self):
+        """
+        :return: The `passbook.signing.SigningBackend` that signs.
+        """
+        if self._signing_backend is None:
+            self._signing_backend = get_signing_backend(self._backend)
+        return self._signing_backend
+
+    @property
+    def loaded(self):
+        return self._identity is not None
+
+    @property
+    def stamp(self):
+        """
+        :return: What changes when the certificate or key files are replaced
+                 (as of when first requested).
+        """
+        if self._stamp is None:
+            self._stamp = _file_stamp((self.certificate, self.key, self.wwdr_certificate))
+        return self._stamp
+
+    def load(self):
+        """
+        Loads the signing identity, if not loaded yet.
+        """
+        return self.identity
+
+    @property
+    def identity(self):
+        """
+        :return: The identity loaded by the backend.
+        """
+        if self._identity is None:
+            with self._lock:
+                if self._identity is None:
+                    self._identity = self.backend.load(self.certificate, self.key, self.wwdr_certificate,
+                                                       self.password)
+        return self._identity
+
+    @property
+    def smime(self):
+        """
+        :return: M2Crypto.SMIME.SMIME (only with the M2Crypto backend)
+        """
+        return self.identity
+
+    def sign_pkcs7(self, manifest):
+        """
+        :return: M2Crypto.SMIME.PKCS7 (only with the M2Crypto backend)
+        """
+        identity = self.identity
+        with self._lock:
+            return self.backend.sign_pkcs7(identity, manifest)
+
+    def sign(self, manifest):
+        """
+        Creates a signature (DER encoded) of the manifest.
+        """
+        identity = self.identity
+        if self.backend.thread_safe:
+            return self.backend.sign(identity, manifest)
+        with self._lock:
+            return self.backend.sign(identity, manifest)
+
+
+# Signers received from other processes and the stamp of their files, by
+# identity, least recently used first
+_unpickled_signers = collections.OrderedDict()
+_unpickled_lock = threading.Lock()
+MAX_UNPICKLED_SIGNERS = 32
+
+
+def _file_stamp(paths):
+    """
+    :return: What changes when any of the files at `paths` is replaced.
+    """
+    stamp = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stamp.append(None)
         else:
-            return obj
+            stamp.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+    return tuple(stamp)
+
+
+def _reuse_signer(identity, stamp, create):
+    """
+    :return: The signer unpickled before for `identity` if its files haven't
+             changed since (`stamp`), or else a new one built by `create`,
+             which replaces it.
+    """
+    with _unpickled_lock:
+        entry = _unpickled_signers.get(identity)
+        if entry is None or entry[0] != stamp:
+            entry = _unpickled_signers[identity] = (stamp, create())
+        _unpickled_signers.move_to_end(identity)
+        while len(_unpickled_signers) > MAX_UNPICKLED_SIGNERS:
+            _unpickled_signers.popitem(last=False)
+        return entry[1]
+
+
+def _unpickle_signer(certificate, key, wwdr_certificate, password, backend=None):
+    if not (backend is None or isinstance(backend, str)):
+        # Custom backends are unpickled with their own state, never shared
+        return PassSigner(certificate, key, wwdr_certificate, password, backend)
+    return _reuse_signer((PassSigner, certificate, key, wwdr_certificate, password, backend),
+                         _file_stamp((certificate, key, wwdr_certificate)),
+                         lambda: PassSigner(certificate, key, wwdr_certificate, password, backend))
+
+
+def _create_pass(passfile, signer):
+    return passfile.create(signer=signer).getvalue()
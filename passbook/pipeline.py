@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming pipeline for very large exports: passes are built, hashed, signed
+and zipped by lazy generator stages, one pass at a time, e.g.:
+
+    for serialNumber, path in export(rows, signer, DirectoryWriter('out'), factory=create_pass):
+        ...
+
+Each stage only pulls the next pass from the previous one when it needs it,
+and nothing keeps a reference to a pass once its archive is written, so
+memory stays flat however many passes are exported. With `workers`, the
+manifests are signed in a pool of processes (only manifests and signatures
+are sent to them) while the current process builds and zips the passes.
+"""
+import os
+from io import BytesIO
+
+from passbook.archive import ZIP_STORED, atomic_path
+from passbook.batch import _init_worker, _worker, imap_unordered
+from passbook.registry import resolve_signer
+
+
+def build(specs, factory=None):
+    """
+    Yields the pass built by `factory` from each item of `specs` (any
+    iterable, e.g. the rows of a file), or the items themselves if they are
+    already passes.
+    """
+    for spec in specs:
+        yield spec if factory is None else factory(spec)
+
+
+def manifest(passes):
+    """
+    Yields `(passfile, pass_json, manifest)` tuples.
+    """
+    for passfile in passes:
+        pass_json = passfile._createPassJson()
+        yield passfile, pass_json, passfile._createManifest(pass_json)
+
+
+def _sign(item):
+    key, passTypeIdentifier, teamIdentifier, manifest = item
+    return key, resolve_signer(_worker['signer'], passTypeIdentifier, teamIdentifier).sign(manifest)
+
+
+def sign(items, signer, workers=1, max_pending=None):
+    """
+    Yields the `(passfile, pass_json, manifest)` tuples of `items` with the
+    signature of the manifest appended. `signer` can be a
+    `passbook.registry.SignerRegistry`. With more than one worker, at most
+    `max_pending` manifests (4 per worker by default) are being signed at a
+    time, and signed passes are yielded as soon as they are ready.
+    """
+    if workers == 1:
+        for passfile, pass_json, manifest in items:
+            passSigner = resolve_signer(signer, passfile.passTypeIdentifier, passfile.teamIdentifier)
+            yield passfile, pass_json, manifest, passSigner.sign(manifest)
+        return
+
+    pending = {}  # Passes being signed, by key
+
+    def manifests():
+        for key, item in enumerate(items):
+            pending[key] = item
+            yield key, item[0].passTypeIdentifier, item[0].teamIdentifier, item[2]
+
+    for key, signature in imap_unordered(_sign, manifests(), workers, _init_worker, ({'signer': signer},),
+                                         max_pending):
+        yield pending.pop(key) + (signature,)
+
+
+class PassWriter(object):
+    """
+    Where `write` writes the archives of the passes.
+    """
+
+    def write(self, passfile, pass_json, manifest, signature, compression=ZIP_STORED):
+        """
+        Writes the archive of `passfile`.
+
+        :return: What `write` yields for the pass along with its serial
+                 number (e.g. the path of the archive).
+        """
+        raise NotImplementedError
+
+
+class DirectoryWriter(PassWriter):
+    """
+    Writes the archives to `<serialNumber>.pkpass` files in `directory`,
+    straight from the zip writer (never whole in memory). A file only gets
+    its final name once complete.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, passfile, pass_json, manifest, signature, compression=ZIP_STORED):
+        path = os.path.join(self.directory, '%s.pkpass' % passfile.serialNumber)
+        with atomic_path(path) as tmp_path:
+            passfile._createZip(pass_json, manifest, signature, zip_file=tmp_path, compression=compression)
+        return path
+
+
+def write(items, writer=None, compression=ZIP_STORED):
+    """
+    Zips the signed passes of `items` with `writer` (a `PassWriter`) and
+    yields `(serialNumber, result)` tuples, the result of `writer.write`
+    or, without `writer`, the archive itself (bytes).
+    """
+    for passfile, pass_json, manifest, signature in items:
+        if writer is None:
+            buffer = BytesIO()
+            passfile._createZip(pass_json, manifest, signature, zip_file=buffer, compression=compression)
+            result = buffer.getvalue()
+            buffer = None
+        else:
+            result = writer.write(passfile, pass_json, manifest, signature, compression)
+        serialNumber = passfile.serialNumber
+        # Release the pass (and its files) before waiting for the next one
+        passfile = pass_json = manifest = signature = None
+        yield serialNumber, result
+
+
+def export(specs, signer, writer=None, factory=None, compression=ZIP_STORED, workers=1, max_pending=None):
+    """
+    Builds (with `factory`, see `build`), signs and zips the passes of
+    `specs` through the stages above, yielding `(serialNumber, result)`
+    tuples (see `write`) as archives are written.
+    """
+    items = sign(manifest(build(specs, factory)), signer, workers, max_pending)
+    return write(items, writer, compression)
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Push notifications telling the devices registered for passes that they
+were updated, sent to many devices at once over a pool of persistent
+connections.
+"""
+import http.client
+import itertools
+import queue
+import random
+import threading
+import time
+
+from passbook.batch import Report
+
+APNS_HOST = 'api.push.apple.com'
+APNS_SANDBOX_HOST = 'api.sandbox.push.apple.com'
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_UNREGISTERED_STATUS = 410
+
+
+class PushTransport(object):
+    """
+    Sends notifications over connections to a push server. `send` raises
+    `ConnectionError` (or any `OSError`) when the connection fails, in which
+    case the connection is closed and a new one opened.
+    """
+
+    def connect(self):
+        """
+        :return: A new connection.
+        """
+        raise NotImplementedError
+
+    def send(self, connection, pushToken, topic):
+        """
+        Sends an (empty) notification for `topic` (the pass type identifier)
+        to the device with the given `pushToken`.
+
+        :return: The HTTP status of the response.
+        """
+        raise NotImplementedError
+
+    def close(self, connection):
+        pass
+
+
+class HTTPTransport(PushTransport):
+    """
+    Posts the notifications with `http.client` over keep-alive HTTP/1.1
+    connections to `host`, as APNs requests (POST /3/device/<token> with an
+    apns-topic header). Meant for push gateways and test servers: APNs
+    itself only accepts HTTP/2 (see `APNsTransport`).
+    """
+
+    def __init__(self, host, port=None, ssl_context=None, timeout=10):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+
+    def connect(self):
+        if self.ssl_context is not None:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self.ssl_context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def send(self, connection, pushToken, topic):
+        try:
+            connection.request('POST', '/3/device/%s' % pushToken, b'{}',
+                               {'apns-topic': topic, 'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+        except http.client.HTTPException as e:
+            raise ConnectionError(e)
+        return response.status
+
+    def close(self, connection):
+        connection.close()
+
+
+class APNsTransport(PushTransport):
+    """
+    Sends the notifications to the Apple Push Notification service over
+    HTTP/2 with httpx (`pip install passbook[httpx]`), authenticated with
+    the pass type certificate and its key.
+    """
+
+    def __init__(self, certificate, key, password=None, sandbox=False, timeout=10):
+        import httpx
+        self._httpx = httpx
+        self.cert = (certificate, key, password) if password else (certificate, key)
+        self.url = 'https://%s/3/device/' % (APNS_SANDBOX_HOST if sandbox else APNS_HOST)
+        self.timeout = timeout
+
+    def connect(self):
+        return self._httpx.Client(http2=True, cert=self.cert, timeout=self.timeout)
+
+    def send(self, connection, pushToken, topic):
+        try:
+            response = connection.post(self.url + pushToken, content=b'{}', headers={'apns-topic': topic})
+        except self._httpx.TransportError as e:
+            raise ConnectionError(e)
+        return response.status_code
+
+    def close(self, connection):
+        connection.close()
+
+
+class PushReport(Report):
+    """
+    Outcome of `PushDispatcher.notify`, updated as notifications are sent.
+    `unregistered` holds the push tokens of the devices that no longer
+    accept notifications, to be unregistered.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.unregistered = []
+
+    def _add(self, pushToken, status, retries):
+        if status == 200:
+            self.sent += 1
+        elif status == _UNREGISTERED_STATUS:
+            self.unregistered.append(pushToken)
+        else:
+            self.failed += 1
+        self.retries += retries
+
+
+class PushDispatcher(object):
+    """
+    Sends notifications with `transport` over `connections` persistent
+    connections at most, each one used by a thread that sends the push
+    tokens of a batch (of `batch_size` tokens) one after the other.
+
+    Notifications rejected with a 429 or 5xx status, or whose connection
+    fails, are retried up to `retries` times, waiting `backoff` seconds
+    before the first retry and twice as long before every next one.
+    """
+
+    def __init__(self, transport, connections=8, batch_size=100, retries=3, backoff=0.5, max_backoff=30.0):
+        self.transport = transport
+        self.connections = connections
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def _batches(self, pushTokens):
+        pushTokens = iter(pushTokens)
+        while True:
+            batch = list(itertools.islice(pushTokens, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def _delay(self, attempt):
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)  # Spread the retries of all the connections
+
+    def _send(self, state, pushToken, topic):
+        """
+        :return: The final HTTP status (None if the connection kept failing)
+                 and the number of retries.
+        """
+        status = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self._delay(attempt - 1))
+            if state['connection'] is None:
+                try:
+                    state['connection'] = self.transport.connect()
+                except OSError:
+                    continue
+            try:
+                status = self.transport.send(state['connection'], pushToken, topic)
+            except OSError:
+                self.transport.close(state['connection'])
+                state['connection'] = None
+                status = None
+                continue
+            if status not in _RETRY_STATUSES:
+                return status, attempt
+        return status, self.retries
+
+    def _worker(self, batches, topic, report, errors):
+        state = {'connection': None}
+        try:
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    return
+                if errors:
+                    continue  # Only drain the queue, notify() raises the error
+                try:
+                    for pushToken in batch:
+                        status, retries = self._send(state, pushToken, topic)
+                        report.add(pushToken, status, retries)
+                except Exception as e:
+                    errors.append(e)
+        finally:
+            if state['connection'] is not None:
+                self.transport.close(state['connection'])
+
+    def notify(self, pushTokens, topic, report=None):
+        """
+        Notifies the devices with the given `pushTokens` (any iterable, read
+        as batches are sent) that the passes of `topic` (their pass type
+        identifier) were updated.
+
+        :return: PushReport (`report`, if given)
+        """
+        report = report or PushReport()
+        batches = queue.Queue(self.connections * 2)
+        errors = []
+        threads = [threading.Thread(target=self._worker, args=(batches, topic, report, errors))
+                   for _ in range(self.connections)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        try:
+            for batch in self._batches(pushTokens):
+                batches.put(batch)
+        finally:
+            for _ in threads:
+                batches.put(None)
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+        return report
+
+    def notify_updated(self, storage, passTypeIdentifier, serialNumbers, report=None):
+        """
+        Notifies the devices registered in `storage` (a
+        `passbook.webservice.PassStorage`) for the updated passes of
+        `passTypeIdentifier`. Devices registered for several of them are
+        notified once: they ask the web service for all their updated
+        passes.
+
+        :return: PushReport
+        """
+        def pushTokens():
+            seen = set()
+            for serialNumber in serialNumbers:
+                for pushToken in storage.push_tokens(passTypeIdentifier, serialNumber):
+                    if pushToken not in seen:
+                        seen.add(pushToken)
+                        yield pushToken
+
+        return self.notify(pushTokens(), passTypeIdentifier, report)
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Reading and verification of .pkpass files, e.g. to audit issued passes.
+"""
+import hashlib
+import json
+import mmap
+import os
+import threading
+import zipfile
+import zlib
+from io import BytesIO
+
+from passbook.batch import Report, _init_worker, _worker, imap_unordered
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class _MappedFile(mmap.mmap):
+    # zipfile needs file objects to tell whether they are seekable
+
+    def seekable(self):
+        return True
+
+
+class PassVerifier(object):
+    """
+    Verifies pass signatures against the trusted certificates in the PEM
+    file `ca_certificates` (the WWDR certificate, which is then trusted on
+    its own, and/or the Apple root certificate).
+
+    The certificates are loaded once, on first use, and reused for every
+    verification. With `chain=False` the certificate that made the signature
+    isn't validated, only that the signature matches the manifest.
+    """
+
+    def __init__(self, ca_certificates, chain=True):
+        self.ca_certificates = ca_certificates
+        self.chain = chain
+        self._smime = None
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        return _unpickle_verifier, (self.ca_certificates, self.chain)
+
+    def _load(self):
+        from M2Crypto import SMIME, X509, m2
+
+        store = X509.X509_Store()
+        store.load_info(str(self.ca_certificates))
+        store.set_flags(m2.X509_V_FLAG_PARTIAL_CHAIN)
+
+        smime = SMIME.SMIME()
+        smime.set_x509_store(store)
+        smime.set_x509_stack(X509.X509_Stack())
+        return smime
+
+    def verify(self, manifest, signature):
+        """
+        :return: Whether `signature` (DER encoded) is a valid signature of
+                 `manifest` (bytes).
+        """
+        from M2Crypto import BIO, SMIME
+
+        flags = SMIME.PKCS7_DETACHED | SMIME.PKCS7_BINARY
+        if not self.chain:
+            flags |= SMIME.PKCS7_NOVERIFY
+        with self._lock:
+            if self._smime is None:
+                self._smime = self._load()
+            try:
+                pkcs7 = SMIME.load_pkcs7_bio_der(BIO.MemoryBuffer(signature))
+                self._smime.verify(pkcs7, BIO.MemoryBuffer(manifest), flags=flags)
+            except (SMIME.PKCS7_Error, SMIME.SMIME_Error):
+                return False
+        return True
+
+
+_unpickled_verifiers = {}
+
+
+def _unpickle_verifier(*args):
+    try:
+        return _unpickled_verifiers[args]
+    except KeyError:
+        return _unpickled_verifiers.setdefault(args, PassVerifier(*args))
+
+
+class PassArchive(object):
+    """
+    A .pkpass file (a path, bytes or a file object), read lazily: files are
+    only read when needed, and files on disk are memory-mapped.
+    """
+
+    def __init__(self, source):
+        self.path = None
+        self._mmap = None
+        if isinstance(source, (bytes, bytearray)):
+            fileobj = BytesIO(source)
+        elif isinstance(source, str) or hasattr(source, '__fspath__'):
+            self.path = source
+            with open(source, 'rb') as fd:
+                self._mmap = fileobj = _MappedFile(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            fileobj = source
+        try:
+            self._zip = zipfile.ZipFile(fileobj)
+        except Exception:
+            self.close()
+            raise
+        self._manifest = None
+        self._pass_json = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if getattr(self, '_zip', None) is not None:
+            self._zip.close()
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def namelist(self):
+        return self._zip.namelist()
+
+    def read(self, name):
+        return self._zip.read(name)
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            self._manifest = json.loads(self.read('manifest.json').decode('utf-8'))
+        return self._manifest
+
+    @property
+    def pass_json(self):
+        if self._pass_json is None:
+            self._pass_json = json.loads(self.read('pass.json').decode('utf-8'))
+        return self._pass_json
+
+    def _pass_value(self, key):
+        pass_json = self.pass_json
+        return pass_json.get(key) if isinstance(pass_json, dict) else None
+
+    @property
+    def serialNumber(self):
+        return self._pass_value('serialNumber')
+
+    @property
+    def passTypeIdentifier(self):
+        return self._pass_value('passTypeIdentifier')
+
+    def _sha1(self, name):
+        sha1 = hashlib.sha1()
+        with self._zip.open(name) as fd:
+            for chunk in iter(lambda: fd.read(_CHUNK_SIZE), b''):
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+    def verify_manifest(self):
+        """
+        Checks that the manifest lists every file with its right SHA1 hash.
+        Files are hashed in chunks, never read into memory as a whole.
+
+        :return: A list of errors, empty if the manifest is right.
+        """
+        errors = []
+        names = set(name for name in self.namelist() if not name.endswith('/'))
+        names.difference_update(('signature', 'manifest.json'))
+        manifest = self.manifest
+        if not isinstance(manifest, dict):
+            return ['manifest.json is not a JSON object']
+        for name, sha1 in manifest.items():
+            if name not in names:
+                errors.append('%s is missing' % name)
+            elif self._sha1(name) != sha1:
+                errors.append('Wrong hash for %s' % name)
+        for name in sorted(names.difference(manifest)):
+            errors.append('%s is not in the manifest' % name)
+        return errors
+
+    def verify(self, verifier=None):
+        """
+        Checks the manifest and, given a `PassVerifier`, the signature.
+
+        :return: A list of errors, empty if the pass is valid.
+        """
+        errors = self.verify_manifest()
+        if verifier is not None:
+            try:
+                signature = self.read('signature')
+            except KeyError:
+                errors.append('signature is missing')
+            else:
+                if not verifier.verify(self.read('manifest.json'), signature):
+                    errors.append('Invalid signature')
+        return errors
+
+
+class VerificationResult(object):
+
+    def __init__(self, path, serialNumber, errors):
+        self.path = path
+        self.serialNumber = serialNumber
+        self.errors = errors
+
+    @property
+    def valid(self):
+        return not self.errors
+
+
+class ScanReport(Report):
+    """
+    Counts the passes verified by `scan`, as they are verified.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.invalid = 0
+
+    def _add(self, result):
+        if not result.valid:
+            self.invalid += 1
+
+
+def verify_file(path, verifier=None):
+    """
+    Verifies the .pkpass file at `path` (see `PassArchive.verify`).
+
+    :return: VerificationResult
+    """
+    verifier = verifier or _worker.get('verifier')
+    try:
+        with PassArchive(path) as archive:
+            errors = archive.verify(verifier)
+            serialNumber = archive.serialNumber
+    # zipfile raises RuntimeError and NotImplementedError for encrypted or unsupported members
+    except (zipfile.BadZipFile, zlib.error, KeyError, ValueError, OSError, RuntimeError, NotImplementedError) as e:
+        return VerificationResult(path, None, ['Unreadable pass: %s' % e])
+    return VerificationResult(path, serialNumber, errors)
+
+
+def _find_passes(directory):
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if filename.endswith('.pkpass'):
+                yield os.path.join(root, filename)
+
+
+def scan(directory, verifier=None, workers=None, report=None):
+    """
+    Verifies all the .pkpass files in `directory` (and its subdirectories)
+    in a pool of `workers` processes (one per CPU by default, in the current
+    process if `workers` is 1), each of them loading the certificates of
+    `verifier` once.
+
+    Yields a `VerificationResult` for every pass, as soon as it is verified.
+    `report`, a `ScanReport`, is updated with every result.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    paths = _find_passes(directory)
+    if workers == 1:
+        results = (verify_file(path, verifier) for path in paths)
+    else:
+        results = imap_unordered(verify_file, paths, workers, _init_worker, ({'verifier': verifier},))
+    for result in results:
+        if report is not None:
+            report.add(result)
+        yield result
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Signing identities of many pass types (e.g. one per brand of a multi-tenant
+deployment), loaded on demand and reused by every pass of their type.
+"""
+import collections
+import threading
+import time
+
+from passbook.models import PassSigner, _file_stamp, _reuse_signer
+
+_Registration = collections.namedtuple('_Registration', 'certificate key wwdr_certificate password backend')
+
+
+def _stamp(registration):
+    """
+    :return: What changes when the certificates or the key are replaced.
+    """
+    return _file_stamp(registration[:3])
+
+
+class _RegisteredSigner(PassSigner):
+    # Signer of a registry, which limits the signatures made at once
+
+    def __init__(self, registration, stamp, semaphore=None):
+        super().__init__(*registration)
+        self._stamp = stamp
+        self._semaphore = semaphore
+
+    def __reduce__(self):
+        registration = _Registration(self.certificate, self.key, self.wwdr_certificate, self.password,
+                                     self._backend)
+        return _unpickle_registered, (registration, self.stamp)
+
+    def sign(self, manifest):
+        if self._semaphore is None:
+            return super().sign(manifest)
+        with self._semaphore:
+            return super().sign(manifest)
+
+
+def _unpickle_registered(registration, stamp):
+    backend = registration.backend
+    if not (backend is None or isinstance(backend, str)):
+        # Custom backends are unpickled with their own state, never shared
+        return _RegisteredSigner(registration, stamp)
+    # Signers of replaced files are dropped when the new ones are received
+    return _reuse_signer((_RegisteredSigner,) + tuple(registration), stamp,
+                         lambda: _RegisteredSigner(registration, stamp))
+
+
+class SignerRegistry(object):
+    """
+    Signers of the registered pass types, by `passTypeIdentifier` and
+    `teamIdentifier`.
+
+    Identities are only loaded when a pass of their type is signed and then
+    reused: at most `max_loaded` of them are kept, the least recently used
+    one is dropped (and loaded again if needed) when more are. At most
+    `max_concurrent` signatures are made at once (no limit if None) by the
+    threads of a process: the registries sent to worker processes each
+    have their own limit.
+
+    Every `check_interval` seconds at most, the certificate and key files of
+    a requested identity are checked and, if they were replaced (e.g. a
+    rotated certificate), the identity is loaded again.
+
+    A registry can be used as the signer of `passbook.batch.create_many` or
+    as `Pass.signers`, and pickled (each process loads the identities it
+    uses once).
+    """
+
+    def __init__(self, max_loaded=32, max_concurrent=None, check_interval=5.0):
+        self.max_loaded = max_loaded
+        self.max_concurrent = max_concurrent
+        self.check_interval = check_interval
+        self.loads = 0  # Identities loaded so far
+        self._registrations = {}
+        self._signers = collections.OrderedDict()  # Signer and time last checked, by pass type
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+
+    def __reduce__(self):
+        return _unpickle_registry, (self.max_loaded, self.max_concurrent, self.check_interval, self._registrations)
+
+    def __len__(self):
+        return len(self._registrations)
+
+    def register(self, passTypeIdentifier, teamIdentifier, certificate, key, wwdr_certificate, password,
+                 backend=None):
+        """
+        Registers the identity that signs the passes of `passTypeIdentifier`
+        issued by `teamIdentifier` (see `PassSigner`).
+        """
+        registration = _Registration(certificate, key, wwdr_certificate, password, backend)
+        with self._lock:
+            self._registrations[(passTypeIdentifier, teamIdentifier)] = registration
+            self._signers.pop((passTypeIdentifier, teamIdentifier), None)
+
+    def unregister(self, passTypeIdentifier, teamIdentifier):
+        with self._lock:
+            del self._registrations[(passTypeIdentifier, teamIdentifier)]
+            self._signers.pop((passTypeIdentifier, teamIdentifier), None)
+
+    @property
+    def loaded(self):
+        """
+        :return: The pass types whose identity is loaded, least recently
+                 used first.
+        """
+        with self._lock:
+            return list(self._signers)
+
+    def get(self, passTypeIdentifier, teamIdentifier):
+        """
+        :return: The `PassSigner` of the given pass type. Raises `KeyError`
+                 if it isn't registered.
+        """
+        key = (passTypeIdentifier, teamIdentifier)
+        now = time.monotonic()
+        with self._lock:
+            registration = self._registrations[key]
+            entry = self._signers.get(key)
+            if entry is not None:
+                self._signers.move_to_end(key)
+                signer, checked = entry
+                if now - checked < self.check_interval:
+                    return signer
+        stamp = _stamp(registration)  # Outside the lock, it hits the disk
+        with self._lock:
+            entry = self._signers.get(key)
+            if entry is not None and entry[0].stamp == stamp:
+                self._signers[key] = (entry[0], now)
+                return entry[0]
+            registration = self._registrations[key]  # Unless unregistered meanwhile
+            signer = _RegisteredSigner(registration, stamp, self._semaphore)
+            self._signers[key] = (signer, now)
+            self._signers.move_to_end(key)
+            self.loads += 1
+            while len(self._signers) > self.max_loaded:
+                self._signers.popitem(last=False)
+            return signer
+
+    def signer_for(self, passfile):
+        """
+        :return: The `PassSigner` of the type of `passfile`.
+        """
+        return self.get(passfile.passTypeIdentifier, passfile.teamIdentifier)
+
+
+def resolve_signer(signer, passTypeIdentifier, teamIdentifier):
+    """
+    :return: The signer of the given pass type if `signer` is a
+             `SignerRegistry`, else `signer` itself.
+    """
+    if isinstance(signer, SignerRegistry):
+        return signer.get(passTypeIdentifier, teamIdentifier)
+    return signer
+
+
+def _unpickle_registry(max_loaded, max_concurrent, check_interval, registrations):
+    registry = SignerRegistry(max_loaded, max_concurrent, check_interval)
+    registry._registrations.update(registrations)
+    return registry
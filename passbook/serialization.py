@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+JSON serialization of pass.json and manifest.json.
+
+By default passes are written exactly as `json.dumps(obj)` writes them.
+Backends can instead write compact JSON (no whitespace, non-ASCII
+characters as UTF-8, as `json.dumps(obj, separators=(',', ':'),
+ensure_ascii=False)` does), which orjson generates several times faster.
+The manifest holds the SHA1 hash of pass.json, so every backend writing
+the same format generates exactly the same bytes.
+"""
+import decimal
+import json
+import re
+
+
+def PassHandler(obj):
+    if hasattr(obj, 'json_dict'):
+        return obj.json_dict()
+    else:
+        # For Decimal latitude and logitude etc.
+        if isinstance(obj, decimal.Decimal):
+            return str(obj)
+        else:
+            return obj
+
+
+class JSONBackend(object):
+    """
+    Serializes passes to JSON. Objects that aren't JSON types are converted
+    with `PassHandler` (their `json_dict()`, strings for Decimals).
+    """
+    name = None
+
+    def dumps(self, obj):
+        """
+        :return: The JSON representation of `obj`, as a string.
+        """
+        raise NotImplementedError
+
+
+class StdlibJSONBackend(JSONBackend):
+    """
+    Serializes with the standard library, as `json.dumps` does by default
+    or, with `compact`, as compact JSON.
+    """
+    name = 'json'
+
+    def __init__(self, compact=False):
+        self.compact = compact
+        if compact:
+            self._encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=PassHandler)
+        else:
+            self._encoder = json.JSONEncoder(default=PassHandler)
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj)
+
+
+# Floats that orjson writes differently than repr(): 1e-5 (1e-05), 1e16
+# (1e+16), 0.00001234 (1.234e-05)
+_small_float = b'0.0000'
+_exponent = re.compile(br'e-?[0-9]')
+
+
+def _has_non_finite(obj):
+    """
+    :return: Whether `obj` holds NaN or infinite floats, which orjson writes
+             as null (as it writes None).
+    """
+    if isinstance(obj, float):
+        return obj - obj != 0.0  # NaN for NaN and infinite floats
+    if isinstance(obj, dict):
+        values = obj.values()
+    elif isinstance(obj, (list, tuple)):
+        values = obj
+    elif hasattr(obj, 'json_dict'):
+        values = (obj.json_dict(),)
+    else:
+        return False
+    for value in values:
+        if type(value) not in _SCALARS and _has_non_finite(value):
+            return True
+    return False
+
+
+# Types that can't be or hold non-finite floats
+_SCALARS = {str, int, bool, type(None)}
+
+
+def _has_exponent(data):
+    for match in _exponent.finditer(data):
+        if data[match.start() - 1:match.start()].isdigit():
+            return True
+    return False
+
+
+class OrjsonBackend(JSONBackend):
+    """
+    Serializes compact JSON with orjson, several times faster than the
+    standard library. Whatever orjson can't serialize exactly as
+    `StdlibJSONBackend(compact=True)` does (integers of more than 64 bits,
+    non-string keys, very small or very big floats, NaN and infinite
+    floats...) is serialized by `fallback` instead.
+    """
+    name = 'orjson'
+    compact = True
+
+    def __init__(self, fallback=None):
+        import orjson
+        self._orjson = orjson
+        # Types that the standard library can't serialize, left to PassHandler
+        self._options = orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_DATETIME
+        self._fallback = fallback or StdlibJSONBackend(compact=True)
+
+    def dumps(self, obj):
+        try:
+            data = self._orjson.dumps(obj, default=PassHandler, option=self._options)
+        except TypeError:  # Including orjson.JSONEncodeError
+            return self._fallback.dumps(obj)
+        # orjson writes NaN and infinite floats as null, json as NaN/Infinity
+        if _small_float in data or _has_exponent(data) or (b'null' in data and _has_non_finite(obj)):
+            return self._fallback.dumps(obj)
+        return data.decode('utf-8')
+
+
+BACKENDS = {backend.name: backend for backend in (StdlibJSONBackend, OrjsonBackend)}
+
+
+def get_json_backend(name=None, compact=False):
+    """
+    Returns an instance of the JSON backend `name` ('json' or 'orjson').
+
+    Only compact JSON (see above) can be written by orjson: with `compact`,
+    the fastest backend installed is returned by default.
+    """
+    if not compact:
+        if name not in (None, StdlibJSONBackend.name):
+            raise ValueError('The %s JSON backend only writes compact JSON' % name)
+        return StdlibJSONBackend()
+    if name is not None:
+        backend = BACKENDS[name]
+        return backend(compact=True) if backend is StdlibJSONBackend else backend()
+    try:
+        return OrjsonBackend()
+    except ImportError:
+        return StdlibJSONBackend(compact=True)
+
+
+_default_backend = None
+
+
+def default_json_backend():
+    """
+    Returns the JSON backend shared by the passes that don't set their
+    own, which writes passes as `json.dumps` does.
+    """
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = get_json_backend()
+    return _default_backend
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Backends that sign pass manifests: detached PKCS#7 signatures (DER encoded)
+made with the pass type certificate and its key, including the WWDR
+certificate.
+"""
+
+
+class SigningBackend(object):
+    """
+    Signs manifests with a signing identity (certificate, private key and
+    WWDR certificate) loaded once by `load`.
+    """
+    name = None
+
+    # Whether `sign` can be called from several threads at once
+    thread_safe = False
+
+    def __reduce__(self):
+        # Backends hold modules, which can't be pickled
+        return type(self), ()
+
+    def load(self, certificate, key, wwdr_certificate, password):
+        """
+        Parses the certificates and decrypts the key.
+
+        :return: The loaded identity, as given to `sign`.
+        """
+        raise NotImplementedError
+
+    def sign(self, identity, manifest):
+        """
+        :return: The signature (DER encoded) of `manifest` (str or bytes).
+        """
+        raise NotImplementedError
+
+
+def _read(path):
+    with open(path, 'rb') as fd:
+        return fd.read()
+
+
+def _encode(manifest):
+    return manifest.encode('utf-8') if isinstance(manifest, str) else manifest
+
+
+class M2CryptoBackend(SigningBackend):
+    """
+    Signs with M2Crypto. The identity is an `M2Crypto.SMIME.SMIME`, which
+    can't be used by several threads at once.
+    """
+    name = 'm2crypto'
+
+    def __init__(self):
+        from M2Crypto import SMIME, X509
+        self._SMIME = SMIME
+        self._X509 = X509
+
+    def load(self, certificate, key, wwdr_certificate, password):
+        def passwordCallback(*args, **kwds):
+            return bytes(password, encoding='ascii')
+
+        smime = self._SMIME.SMIME()
+
+        wwdrcert = self._X509.load_cert(wwdr_certificate)
+        stack = self._X509.X509_Stack()
+        stack.push(wwdrcert)
+        smime.set_x509_stack(stack)
+
+        smime.load_key(key, certfile=certificate, callback=passwordCallback)
+        return smime
+
+    def sign_pkcs7(self, smime, manifest):
+        """
+        :return: M2Crypto.SMIME.PKCS7
+        """
+        return smime.sign(
+            self._SMIME.BIO.MemoryBuffer(_encode(manifest)),
+            flags=self._SMIME.PKCS7_DETACHED | self._SMIME.PKCS7_BINARY
+        )
+
+    def sign(self, identity, manifest):
+        pk7 = self.sign_pkcs7(identity, manifest)
+        der = self._SMIME.BIO.MemoryBuffer()
+        pk7.write_der(der)
+        return der.read()
+
+
+class CryptographyBackend(SigningBackend):
+    """
+    Signs with the PKCS#7 builder of `cryptography` (`pip install
+    passbook[cryptography]`), with SHA-256 as M2Crypto does. The WWDR
+    certificate can be PEM or DER encoded.
+    """
+    name = 'cryptography'
+    thread_safe = True
+
+    def __init__(self):
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.serialization import pkcs7
+        self._x509 = x509
+        self._hashes = hashes
+        self._serialization = serialization
+        self._pkcs7 = pkcs7
+
+    def _load_certificate(self, path):
+        data = _read(path)
+        if b'-----BEGIN' in data:
+            return self._x509.load_pem_x509_certificate(data)
+        return self._x509.load_der_x509_certificate(data)
+
+    def load(self, certificate, key, wwdr_certificate, password):
+        private_key = self._serialization.load_pem_private_key(
+            _read(key), password.encode('ascii') if password else None)
+        return self._load_certificate(certificate), private_key, self._load_certificate(wwdr_certificate)
+
+    def sign(self, identity, manifest):
+        certificate, private_key, wwdr_certificate = identity
+        options = [self._pkcs7.PKCS7Options.DetachedSignature, self._pkcs7.PKCS7Options.Binary]
+        return self._pkcs7.PKCS7SignatureBuilder().set_data(_encode(manifest)).add_signer(
+            certificate, private_key, self._hashes.SHA256()
+        ).add_certificate(wwdr_certificate).sign(self._serialization.Encoding.DER, options)
+
+
+BACKENDS = {backend.name: backend for backend in (M2CryptoBackend, CryptographyBackend)}
+
+
+def get_signing_backend(name=None):
+    """
+    Returns an instance of the signing backend `name` ('m2crypto' or
+    'cryptography'), M2Crypto by default.
+    """
+    return BACKENDS[name or M2CryptoBackend.name]()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Pass templates: pass.json precompiled once for all the passes of a campaign.
+"""
+import json
+import re
+
+from passbook.archive import ZIP_STORED
+
+# How a Variable ends up in the pass.json generated for the prototype
+_placeholder = re.compile(r'"\\u0000(.*?)\\u0000"')
+
+
+class Variable(object):
+    """
+    Placeholder for a value that changes from pass to pass (serial number,
+    barcode message, field values...) in the prototype of a `PassTemplate`.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def json_dict(self):
+        return '\x00%s\x00' % self.name
+
+
+class PassTemplate(object):
+    """
+    Creates passes that only differ in a few values from a prototype `Pass`
+    in which those values are `Variable` instances, e.g.:
+
+        passfile = Pass(cardInfo, ...)
+        passfile.serialNumber = Variable('serialNumber')
+        passfile.barcode = Barcode(Variable('code'))
+        cardInfo.addPrimaryField('balance', Variable('balance'), 'Balance')
+
+        template = PassTemplate(passfile)
+        template.create({'serialNumber': '1234', 'code': '...', 'balance': 20}, signer)
+
+    The pass.json of the prototype is generated once and each pass only
+    serializes its own values, giving the same pass.json that the
+    equivalent `Pass` would. Since the prototype is generated with
+    variables in place of the values, keys that are only included when
+    their value is set (relevantDate, voided...) are always included if a
+    variable is used for them. The files of the prototype are included in
+    every pass, and a validator checks the prototype (variables included).
+    """
+
+    def __init__(self, passfile):
+        self.passfile = passfile
+        parts = _placeholder.split(passfile._createPassJson())
+        self._chunks = parts[0::2]
+        self._names = [json.loads('"%s"' % name) for name in parts[1::2]]
+
+    def addImage(self, name, source, pipeline):
+        """
+        Includes in every pass the versions of the image `name` ('logo',
+        'strip'...) that `pipeline` (a `passbook.images.ImagePipeline`)
+        derives from the master image `source`.
+        """
+        pipeline.add(self.passfile, name, source)
+
+    @property
+    def variables(self):
+        return set(self._names)
+
+    def render(self, values):
+        """
+        Returns the pass.json of the pass with the given `values` (a dict
+        with the value of every variable, by name).
+        """
+        chunks = self._chunks
+        dumps = self.passfile._dumps
+        result = [chunks[0]]
+        for i, name in enumerate(self._names, 1):
+            result.append(dumps(values[name]))
+            result.append(chunks[i])
+        return ''.join(result)
+
+    def create(self, values, signer, zip_file=None, compression=ZIP_STORED, hooks=None, cache=None, validator=None):
+        """
+        Creates the .pkpass file of the pass with the given `values`.
+        """
+        return self.passfile._create(lambda: self.render(values), signer, zip_file, compression, hooks, cache,
+                                     validator)
+
+    def stream(self, values, fileobj, signer, compression=ZIP_STORED, checksum='sha256', hooks=None, cache=None,
+               validator=None):
+        """
+        Writes the .pkpass file of the pass with the given `values` to
+        `fileobj` as it is generated (see `Pass.stream`).
+        """
+        return self.passfile._stream(lambda: self.render(values), fileobj, signer, compression, checksum, hooks,
+                                     cache, validator)
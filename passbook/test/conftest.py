@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures shared by the tests. The test data generators and fake servers of
+the benchmarks (`passbook.benchmarks`) are only imported through these.
+"""
+import pytest
+
+from passbook.models import PassSigner
+from passbook.test.test_passbook import certificate, key, password_file, wwdr_certificate
+
+
+@pytest.fixture
+def password():
+    try:
+        with open(password_file) as file_:
+            return file_.read().strip()
+    except IOError:
+        return ''
+
+
+@pytest.fixture
+def signer(password):
+    return PassSigner(certificate, key, wwdr_certificate, password)
+
+
+@pytest.fixture
+def push_server():
+    """
+    A started `passbook.benchmarks.push.FakePushServer`.
+    """
+    from passbook.benchmarks.push import FakePushServer
+    with FakePushServer() as server:
+        yield server
+
+
+@pytest.fixture
+def create_png():
+    """
+    :return: Function creating PNG images of the given width and height.
+    """
+    from passbook.benchmarks.images import create_png
+    return create_png
+
+
+@pytest.fixture
+def memory():
+    """
+    :return: The memory benchmark module, with `peak_memory` and the exports
+             it compares.
+    """
+    from passbook.benchmarks import memory
+    return memory
+
+
+@pytest.fixture
+def cold_start():
+    """
+    :return: Function running the imports of a cold start in a new
+             interpreter (see `passbook.benchmarks.imports.cold_start`).
+    """
+    from passbook.benchmarks.imports import cold_start
+    return cold_start
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import zipfile
+from io import BytesIO
+
+from passbook.archive import ZipWriter, compress
+from passbook.models import AssetRegistry
+from passbook.test.test_passbook import create_shell_pass, cwd
+
+
+def test_zip_writer():
+    zip_file = BytesIO()
+    with ZipWriter(zip_file) as writer:
+        writer.write('pass.json', '{"description": "%s"}' % ('x' * 100), zipfile.ZIP_DEFLATED)
+        writer.write(u'de.lproj/pass.strings', b'"name" = "Name";')
+        writer.write_entry(u'ñ.png', compress(b'\x89PNG', zipfile.ZIP_DEFLATED))
+    assert writer.offset == len(zip_file.getvalue())
+
+    archive = zipfile.ZipFile(zip_file)
+    assert archive.testzip() is None
+    assert archive.namelist() == ['pass.json', 'de.lproj/pass.strings', u'ñ.png']
+    assert archive.getinfo('pass.json').compress_type == zipfile.ZIP_DEFLATED
+    assert archive.read('pass.json') == ('{"description": "%s"}' % ('x' * 100)).encode('ascii')
+    # Not worth deflating
+    assert archive.getinfo(u'ñ.png').compress_type == zipfile.ZIP_STORED
+    assert archive.read(u'ñ.png') == b'\x89PNG'
+
+
+def test_deflated_pass(signer):
+    registry = AssetRegistry()
+    strip = registry.add(b'\x00' * 10000)
+
+    archives = []
+    for _ in range(2):
+        passfile = create_shell_pass()
+        passfile.addAsset('strip.png', strip)
+        passfile.addFile('icon.png', open(cwd / 'static' / 'white_square.png', 'rb'))
+        archives.append(passfile.create(signer=signer, compression=zipfile.ZIP_DEFLATED))
+    assert strip.zip_entry(zipfile.ZIP_DEFLATED) is strip.zip_entry(zipfile.ZIP_DEFLATED)
+    assert len(archives[0].getvalue()) < 10000
+
+    archive = zipfile.ZipFile(archives[0])
+    assert archive.testzip() is None
+    assert archive.getinfo('strip.png').compress_type == zipfile.ZIP_DEFLATED
+    assert archive.getinfo('pass.json').compress_type == zipfile.ZIP_DEFLATED
+    assert archive.read('strip.png') == strip.data
+    manifest = json.loads(archive.read('manifest.json').decode('utf-8'))
+    assert sorted(manifest) == ['icon.png', 'pass.json', 'strip.png']
+
+
+class WriteOnlyStream(object):
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+
+
+def test_stream_pass(signer):
+    passfile = create_shell_pass()
+    passfile.addFile('icon.png', open(cwd / 'static' / 'white_square.png', 'rb'))
+    stream = WriteOnlyStream()
+    info = passfile.stream(stream, signer)
+
+    data = b''.join(stream.chunks)
+    assert info.size == len(data)
+    assert info.checksum == hashlib.sha256(data).hexdigest()
+
+    archive = zipfile.ZipFile(BytesIO(data))
+    assert archive.testzip() is None
+    assert info.crcs == {zinfo.filename: zinfo.CRC for zinfo in archive.infolist()}
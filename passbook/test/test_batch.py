@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import pickle
+import shutil
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from passbook.batch import create_many, create_many_async
+from passbook.models import PassSigner
+from passbook.signing import M2CryptoBackend
+from passbook.test.test_passbook import certificate, create_shell_pass, key, wwdr_certificate
+
+
+def create_passes(count):
+    for i in range(count):
+        passfile = create_shell_pass()
+        passfile.serialNumber = str(i)
+        yield passfile
+
+
+def test_create_many_in_process(signer):
+    results = dict(create_many(create_passes(3), signer, workers=1))
+    assert sorted(results) == ['0', '1', '2']
+    pass_json = zipfile.ZipFile(BytesIO(results['1'])).read('pass.json')
+    assert b'"serialNumber": "1"' in pass_json
+
+
+def test_create_many_with_pool(signer):
+    results = dict(create_many(create_passes(10), signer, workers=2, max_pending=3))
+    assert sorted(results, key=int) == [str(i) for i in range(10)]
+    for data in results.values():
+        assert zipfile.ZipFile(BytesIO(data)).read('signature')
+
+
+def test_create_many_to_directory(tmpdir, signer):
+    results = dict(create_many(create_passes(4), signer, workers=2, directory=str(tmpdir)))
+    assert len(results) == 4
+    for serialNumber, path in results.items():
+        assert path == str(tmpdir.join('%s.pkpass' % serialNumber))
+        assert zipfile.ZipFile(path).read('manifest.json')
+    assert len(tmpdir.listdir()) == 4
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_create_async(signer):
+    passfile = create_shell_pass()
+    data = run(passfile.create_async(signer))
+    assert zipfile.ZipFile(BytesIO(data)).read('signature')
+
+
+async def collect(results):
+    collected = []
+    async for result in results:
+        collected.append(result)
+    return collected
+
+
+def test_create_many_async_with_processes(signer):
+    with ProcessPoolExecutor(2) as executor:
+        results = run(collect(create_many_async(create_passes(5), signer, executor, concurrency=2)))
+    assert sorted(serialNumber for serialNumber, _ in results) == ['0', '1', '2', '3', '4']
+    for _, data in results:
+        assert zipfile.ZipFile(BytesIO(data)).read('signature')
+
+
+def test_create_many_async_is_lazy(signer):
+    consumed = []
+
+    def passes():
+        for passfile in create_passes(6):
+            consumed.append(passfile.serialNumber)
+            yield passfile
+
+    async def first(results):
+        async for result in results:
+            await results.aclose()
+            return result
+
+    serialNumber, _ = run(first(create_many_async(passes(), signer, concurrency=2)))
+    assert serialNumber in ('0', '1')
+    assert consumed == ['0', '1']
+
+
+def test_unpickled_signers_are_reused(tmpdir, password):
+    shutil.copy(certificate, str(tmpdir.join('certificate.pem')))
+    shutil.copy(key, str(tmpdir.join('private.key')))
+    signer = PassSigner(str(tmpdir.join('certificate.pem')), str(tmpdir.join('private.key')), wwdr_certificate,
+                        password)
+    clone = pickle.loads(pickle.dumps(signer))
+    assert clone is not signer
+    assert pickle.loads(pickle.dumps(signer)) is clone
+
+    # Rotated certificate at the same path
+    stat = os.stat(signer.certificate)
+    os.utime(signer.certificate, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert pickle.loads(pickle.dumps(signer)) is not clone
+
+    signer = PassSigner(certificate, key, wwdr_certificate, password, M2CryptoBackend())
+    assert pickle.loads(pickle.dumps(signer)) is not pickle.loads(pickle.dumps(signer))
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+import json
+
+from passbook.benchmarks.__main__ import main
+
+
+def test_benchmarks(tmpdir, capsys):
+    baseline = tmpdir.join('baseline.json')
+    assert main(['--repeat', '2', '--passes', '2', '--workers', '2', '--baseline', str(baseline),
+                 '--save-baseline']) == 0
+    metrics = json.loads(baseline.read())
+    assert 'stages.large.signature.p99' in metrics
+    assert 'creation.small.parallel' in metrics
+
+    # Impossible to be that fast
+    baseline.write(json.dumps({'stages.empty.json.p50': 0.0000001}))
+    assert main(['stages', '--repeat', '2', '--baseline', str(baseline)]) == 1
+    assert 'REGRESSION' in capsys.readouterr().out
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import zipfile
+from io import BytesIO
+
+import pytest
+
+from passbook.archive import ZIP_DEFLATED
+from passbook.bundle import PassBundle, _create_member, _dump_members
+from passbook.cache import MemoryCache
+from passbook.models import AssetRegistry, PassHooks
+from passbook.reader import PassArchive, PassVerifier
+from passbook.test.test_passbook import create_shell_pass, wwdr_certificate
+from passbook.validation import ValidationError, Validator
+
+
+def create_passes(count):
+    logo = AssetRegistry().add(b'logo' * 256)
+    passes = []
+    for i in range(count):
+        passfile = create_shell_pass()
+        passfile.serialNumber = str(i)
+        passfile.addAsset('logo.png', logo)
+        passes.append(passfile)
+    return passes
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_bundle(workers, signer):
+    bundle = PassBundle(create_passes(5))
+    archive = zipfile.ZipFile(bundle.create(signer, compression=ZIP_DEFLATED, workers=workers))
+    assert archive.namelist() == ['%d.pkpass' % i for i in range(5)]
+    assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+    member = zipfile.ZipFile(BytesIO(archive.read('3.pkpass')))
+    assert member.getinfo('logo.png').compress_type == zipfile.ZIP_DEFLATED
+    assert member.read('logo.png') == b'logo' * 256
+    with PassArchive(archive.read('3.pkpass')) as member:
+        assert member.serialNumber == '3'
+        assert member.verify(PassVerifier(wwdr_certificate, chain=False)) == []
+
+
+def test_shared_assets(signer):
+    passes = create_passes(3)
+    logo = passes[0]._files['logo.png']
+    assets = PassBundle(passes)._shared_assets(ZIP_DEFLATED)
+    assert assets == {logo.sha1: logo}
+    assert ZIP_DEFLATED in logo._entries  # Compressed once, before the passes are sent to the workers
+
+    (position, data), = _dump_members(passes[2:], assets)
+    assert position == 0 and logo.data not in data
+    member = _create_member((position, data), {'signer': signer, 'compression': ZIP_DEFLATED, 'hooks': None,
+                                               'cache': None, 'validator': None, 'assets': assets})[1]
+    assert zipfile.ZipFile(BytesIO(member)).read('logo.png') == logo.data
+
+
+def test_stream(signer):
+    bundle = PassBundle()
+    for passfile in create_passes(2):
+        bundle.addPass(passfile)
+    output = BytesIO()
+    info = bundle.stream(output, signer)
+    assert info.size == len(output.getvalue())
+    assert len(info.crcs) == 2
+
+
+def test_duplicate_serial_numbers(signer):
+    passes = create_passes(2)
+    passes[1].serialNumber = '0'
+    archive = zipfile.ZipFile(PassBundle(passes).create(signer))
+    assert archive.namelist() == ['0-0.pkpass', '1-0.pkpass']
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_invalid_pass(workers, signer):
+    passes = create_passes(2)
+    passes[1].validator = Validator()
+    passes[1].backgroundColor = 'blue'
+    with pytest.raises(ValidationError) as e:
+        PassBundle(passes).create(signer, workers=workers)
+    assert 'Invalid backgroundColor: blue (must be rgb(r, g, b))' in e.value.errors
+    with pytest.raises(ValidationError):
+        PassBundle(create_passes(2)).create(signer, validator=Validator())
+
+
+def test_create_path(signer):
+    class Hooks(PassHooks):
+        stages = []
+
+        def stage(self, passfile, name, seconds, size):
+            self.stages.append((passfile.serialNumber, name))
+
+    cache = MemoryCache()
+    bundle = PassBundle(create_passes(2))
+    first = bundle.create(signer, hooks=Hooks(), cache=cache).getvalue()
+    assert ('1', 'signature') in Hooks.stages
+    assert (cache.hits, cache.misses) == (0, 2)
+    Hooks.stages = []
+    assert bundle.create(signer, hooks=Hooks(), cache=cache).getvalue() == first
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert [name for _, name in Hooks.stages] == ['json', 'manifest', 'cache'] * 2
+
+
+@pytest.mark.parametrize('serialNumber', ['../1', 'a\\b', '.hidden', ''])
+def test_invalid_member_name(serialNumber, signer):
+    passes = create_passes(2)
+    passes[0].serialNumber = serialNumber
+    with pytest.raises(ValueError):
+        PassBundle(passes).create(signer)
+
+
+def test_empty_bundle(signer):
+    with pytest.raises(ValueError):
+        PassBundle().create(signer)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import shutil
+import zipfile
+from io import BytesIO
+
+from passbook.cache import DiskCache, MemoryCache
+from passbook.models import PassHooks
+from passbook.registry import SignerRegistry
+from passbook.test.test_passbook import certificate, create_shell_pass, key, wwdr_certificate
+
+
+def create_pass(serialNumber='1234567'):
+    passfile = create_shell_pass()
+    passfile.serialNumber = serialNumber
+    passfile.addFile('icon.png', BytesIO(b'icon'))
+    return passfile
+
+
+def test_memory_cache(signer):
+    cache = MemoryCache()
+    data = create_pass().create(signer=signer, cache=cache).getvalue()
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    # Built again unchanged (even at another time): the cached pass
+    assert create_pass().create(signer=signer, cache=cache).getvalue() == data
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate == 0.5
+
+    other = create_pass('other').create(signer=signer, cache=cache).getvalue()
+    assert other != data
+    assert zipfile.ZipFile(BytesIO(other)).testzip() is None
+    compressed = create_pass().create(signer=signer, cache=cache, compression=zipfile.ZIP_DEFLATED).getvalue()
+    assert compressed != data
+    assert (cache.hits, cache.misses) == (1, 3)
+    assert len(cache) == 3
+
+
+def test_rotated_identity(tmpdir, password):
+    rotated_key = str(tmpdir.join('private.key'))
+    shutil.copy(key, rotated_key)
+    registry = SignerRegistry(check_interval=0)
+    registry.register('Pass Type ID', 'Team Identifier', certificate, rotated_key, wwdr_certificate,
+                      password)
+    cache = MemoryCache()
+    create_pass().create(signer=registry.signer_for(create_pass()), cache=cache)
+    create_pass().create(signer=registry.signer_for(create_pass()), cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    stat = os.stat(rotated_key)
+    os.utime(rotated_key, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    create_pass().create(signer=registry.signer_for(create_pass()), cache=cache)
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_memory_cache_eviction():
+    cache = MemoryCache(max_entries=2)
+    for name in 'abc':
+        cache.set(name, name.encode('ascii'))
+    assert cache.get('a') is None
+    assert cache.get('b') == b'b'
+    cache.set('d', b'd')
+    assert cache.get('c') is None
+    assert cache.get('b') == b'b'
+
+    cache = MemoryCache(max_size=10)
+    cache.set('a', b'12345')
+    cache.set('b', b'12345')
+    cache.set('c', b'1')
+    assert cache.get('a') is None
+    assert cache.size == 6
+    cache.set('d', b'too big to be cached')
+    assert cache.get('d') is None
+
+
+def test_disk_cache(tmpdir, signer):
+    directory = str(tmpdir.join('cache'))
+    data = create_pass().create(signer=signer, cache=DiskCache(directory)).getvalue()
+
+    cache = DiskCache(directory)
+    assert len(cache) == 1
+    zip_file = BytesIO()
+    info = create_pass().stream(zip_file, signer, cache=cache)
+    assert zip_file.getvalue() == data
+    assert info.size == len(data)
+    assert info.checksum == hashlib.sha256(data).hexdigest()
+    assert info.crcs == {zinfo.filename: zinfo.CRC for zinfo in zipfile.ZipFile(zip_file).infolist()}
+    assert cache.hits == 1
+
+    cache = DiskCache(directory, max_size=len(data) * 2)
+    for serialNumber in ('1', '2'):
+        create_pass(serialNumber).create(signer=signer, cache=cache)
+    assert len(cache) == 2
+    assert len(tmpdir.join('cache').listdir()) == 2
+    assert cache.size <= cache.max_size
+
+
+def test_cache_stage(signer):
+    stages = []
+
+    class Hooks(PassHooks):
+        def stage(self, passfile, name, seconds, size):
+            stages.append(name)
+
+    cache = MemoryCache()
+    signer.load()
+    create_pass().create(signer=signer, cache=cache, hooks=Hooks())
+    assert stages == ['json', 'manifest', 'signature', 'zip']
+    del stages[:]
+    create_pass().create(signer=signer, cache=cache, hooks=Hooks())
+    assert stages == ['json', 'manifest', 'cache']
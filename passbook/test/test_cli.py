@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import tarfile
+import zipfile
+from io import BytesIO, StringIO
+
+import pytest
+
+from passbook.cli import DirectoryOutput, GenerationReport, TarOutput, generate, load_template, main, read_rows
+from passbook.test.test_passbook import certificate, key, wwdr_certificate
+
+static = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+
+@pytest.fixture
+def template_path(tmpdir):
+    path = tmpdir.join('template.json')
+    path.write(json.dumps({
+        'organizationName': 'Org Name',
+        'passTypeIdentifier': 'pass.com.example',
+        'teamIdentifier': 'AGK5BZEN3E',
+        'description': '$$5 off',
+        'backgroundColor': 'rgb(255, 255, 255)',
+        'storeCard': {
+            'primaryFields': [{'key': 'name', 'label': 'Name', 'value': '$name'}],
+            'secondaryFields': [{'key': 'balance', 'label': 'Balance', 'value': '$balance', 'currencyCode': 'USD'}],
+        },
+        'barcode': {'message': '$serialNumber', 'format': 'PKBarcodeFormatQR'},
+        'files': {'icon.png': os.path.join(static, 'white_square.png')},
+        'localizations': {'es': {'Balance': '$ Saldo'}},
+    }))
+    return str(path)
+
+
+def pass_json(data):
+    return json.loads(zipfile.ZipFile(BytesIO(data)).read('pass.json').decode('utf-8'))
+
+
+def test_load_template(template_path, signer):
+    template = load_template(template_path)
+    assert template.variables == {'name', 'balance', 'serialNumber'}
+    data = template.create({'serialNumber': '12', 'name': u'Jähn', 'balance': 20}, signer).getvalue()
+    result = pass_json(data)
+    assert result['serialNumber'] == '12'
+    assert result['description'] == '$5 off'
+    assert result['barcode']['message'] == '12'
+    assert result['storeCard']['primaryFields'][0]['value'] == u'Jähn'
+    assert result['storeCard']['secondaryFields'][0]['currencyCode'] == 'USD'
+    archive = zipfile.ZipFile(BytesIO(data))
+    assert 'icon.png' in archive.namelist()
+    assert archive.read('es.lproj/pass.strings').decode('utf-16') == '"Balance" = "$ Saldo";\n'
+
+
+def test_load_template_errors(tmpdir):
+    path = tmpdir.join('template.json')
+    path.write(json.dumps({'description': 'No style'}))
+    with pytest.raises(ValueError):
+        load_template(str(path))
+    path.write(json.dumps({'generic': {}, 'unknownKey': 1}))
+    with pytest.raises(ValueError):
+        load_template(str(path))
+
+
+def test_read_rows():
+    rows = list(read_rows(StringIO('serialNumber,name\n1,A\n2,B\n'), 'csv'))
+    assert rows == [{'serialNumber': '1', 'name': 'A'}, {'serialNumber': '2', 'name': 'B'}]
+    rows = list(read_rows(StringIO('{"serialNumber": "1", "balance": 2}\n\n'), 'jsonl'))
+    assert rows == [{'serialNumber': '1', 'balance': 2}]
+
+
+def rows(count):
+    return [{'serialNumber': str(i), 'name': 'Name %d' % i, 'balance': i} for i in range(count)]
+
+
+def test_generate_to_directory(tmpdir, template_path, signer):
+    template = load_template(template_path)
+    output = DirectoryOutput(str(tmpdir.join('out')))
+    assert sorted(generate(template, rows(3), signer, output, workers=2)) == ['0', '1', '2']
+    assert sorted(os.listdir(str(tmpdir.join('out')))) == ['0.pkpass', '1.pkpass', '2.pkpass']
+
+    # Resuming only creates the missing passes
+    os.remove(str(tmpdir.join('out', '1.pkpass')))
+    report = GenerationReport()
+    assert list(generate(template, rows(5), signer, output, workers=1, resume=True, report=report)) == \
+        ['1', '3', '4']
+    assert report.count == 3
+    assert report.skipped == 2
+    assert pass_json(tmpdir.join('out', '4.pkpass').read_binary())['storeCard']['primaryFields'][0]['value'] == \
+        'Name 4'
+
+
+def test_generate_to_tar(tmpdir, template_path, signer):
+    template = load_template(template_path)
+    path = str(tmpdir.join('passes.tar'))
+    list(generate(template, rows(3), signer, TarOutput(path), workers=1))
+
+    # A crash in the middle of the last pass
+    with open(path, 'r+b') as fd:
+        with tarfile.open(path) as tar:
+            fd.truncate(tar.getmember('2.pkpass').offset_data + 100)
+    report = GenerationReport()
+    list(generate(template, rows(4), signer, TarOutput(path), workers=1, resume=True, report=report))
+    assert report.skipped == 2
+    with tarfile.open(path) as tar:
+        assert sorted(tar.getnames()) == ['0.pkpass', '1.pkpass', '2.pkpass', '3.pkpass']
+        assert pass_json(tar.extractfile('2.pkpass').read())['serialNumber'] == '2'
+
+
+def test_main(tmpdir, template_path, capsys, password):
+    password_file = tmpdir.join('password.txt')
+    password_file.write(password)
+    input_ = tmpdir.join('rows.csv')
+    input_.write('serialNumber,name,balance\n1,A,10\n2,B,20\n')
+    args = [template_path, str(input_), '--output', str(tmpdir.join('out')), '--certificate', certificate,
+            '--key', key, '--wwdr-certificate', wwdr_certificate, '--password-file', str(password_file),
+            '--workers', '1']
+    assert main(args) == 0
+    assert '2 passes created' in capsys.readouterr().err
+    assert pass_json(tmpdir.join('out', '2.pkpass').read_binary())['storeCard']['secondaryFields'][0]['value'] == \
+        '20'
+
+    input_.write('serialNumber,name\n3,C\n')
+    assert main(args + ['--quiet']) == 1
+    assert 'missing balance' in capsys.readouterr().err
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import struct
+import zlib
+
+import pytest
+
+from passbook.images import SCALES, ImagePipeline, image_size, optimize_png
+from passbook.models import EventTicket, Pass
+from passbook.test.test_passbook import create_shell_pass
+from passbook.validation import png_size
+
+
+def pixels(data):
+    position, result = 8, []
+    while position < len(data):
+        length, = struct.unpack('>I', data[position:position + 4])
+        body = data[position + 8:position + 8 + length]
+        assert struct.unpack('>I', data[position + 8 + length:position + 12 + length])[0] == \
+            zlib.crc32(data[position + 4:position + 8 + length])
+        if data[position + 4:position + 8] == b'IDAT':
+            result.append(body)
+        position += length + 12
+    return zlib.decompress(b''.join(result))
+
+
+def test_optimize_png(create_png):
+    data = create_png(100, 50)
+    optimized = optimize_png(data)
+    assert len(optimized) < len(data) * 0.7
+    assert b'iTXt' not in optimized
+    assert png_size(optimized) == (100, 50)
+    assert pixels(optimized) == pixels(data)
+    # Already optimized
+    assert optimize_png(optimized) == optimized
+    with pytest.raises(ValueError):
+        optimize_png(b'GIF89a')
+
+
+def test_image_size():
+    assert image_size('logo') == (160, 50)
+    assert image_size('strip', 'eventTicket') == (375, 98)
+    assert image_size('strip', 'storeCard') == (375, 144)
+    assert image_size('strip', 'coupon') == (375, 144)
+    assert image_size('strip', 'boardingPass') == (375, 123)
+    assert image_size('strip', 'generic') == (375, 123)
+
+
+class FakePipeline(ImagePipeline):
+    # Derives the versions without Pillow
+
+    def __init__(self, create_png, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.create_png = create_png
+        self.derived = []
+
+    def _derive(self, data, size):
+        self.derived.append(size)
+        return {suffix: self.create_png(size[0] * scale, size[1] * scale, 9) for suffix, scale in SCALES.items()}
+
+
+def test_pipeline_cache(tmpdir, create_png):
+    master = create_png(10, 10)
+    pipeline = FakePipeline(create_png, str(tmpdir))
+    first, second = create_shell_pass(), create_shell_pass()
+    pipeline.add(first, 'logo', master)
+    pipeline.add(second, 'logo', master)
+    assert pipeline.derived == [(160, 50)]
+    assert sorted(first._files) == ['logo.png', 'logo@2x.png', 'logo@3x.png']
+    assert first._files['logo@3x.png'] is second._files['logo@3x.png']
+    assert png_size(first._files['logo@2x.png'].data) == (320, 100)
+
+    # Strips of event tickets are smaller
+    ticket = Pass(EventTicket())
+    pipeline.add(ticket, 'strip', master)
+    assert pipeline.derived[-1] == (375, 98)
+
+    # Reused from disk by later runs
+    other = FakePipeline(create_png, str(tmpdir))
+    variants = other.variants('logo', master)
+    assert other.derived == []
+    assert [asset.sha1 for asset in variants.values()] == [first._files[name].sha1 for name in variants]
+
+
+def test_derive(tmpdir, create_png):
+    pytest.importorskip('PIL')
+    master = tmpdir.join('strip.png')
+    master.write_binary(create_png(1500, 300))
+    variants = ImagePipeline(str(tmpdir.join('cache'))).variants('strip', str(master))
+    assert png_size(variants['strip.png'].data) == (375, 75)
+    assert png_size(variants['strip@3x.png'].data) == (1125, 225)
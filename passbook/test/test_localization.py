@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import zipfile
+
+import pytest
+
+from passbook.localization import Localizations, encode_strings
+from passbook.test.test_passbook import create_shell_pass
+
+icon = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'white_square.png')
+
+
+def test_encode_strings():
+    data = encode_strings({'Name': u'Nombre', 'Say "hi"': u'Decí "hola"\nchau'})
+    assert data.startswith(b'\xff\xfe')
+    assert data.decode('utf-16') == u'"Name" = "Nombre";\n"Say \\"hi\\"" = "Decí \\"hola\\"\\nchau";\n'
+
+
+def test_localizations(signer):
+    localizations = Localizations()
+    localizations.addStrings('es', {'Name': 'Nombre'})
+    localizations.addStrings('pt-BR', encode_strings({'Name': 'Nome'}))
+    with open(icon, 'rb') as fd:
+        localizations.addFile('es', 'logo.png', fd)
+    assert localizations.locales == ['es', 'pt-BR']
+    assert list(localizations.assets()) == ['es.lproj/pass.strings', 'pt-BR.lproj/pass.strings', 'es.lproj/logo.png']
+    with pytest.raises(ValueError):
+        localizations.addStrings('../es', {})
+    with pytest.raises(ValueError):
+        localizations.addFile('es', '../logo.png', b'')
+
+    first, second = create_shell_pass(), create_shell_pass()
+    localizations.add_to(first)
+    localizations.add_to(second)
+    assert first._files['es.lproj/pass.strings'] is second._files['es.lproj/pass.strings']
+
+    archive = zipfile.ZipFile(first.create(signer=signer))
+    manifest = json.loads(archive.read('manifest.json').decode('utf-8'))
+    assert manifest['pt-BR.lproj/pass.strings'] == localizations.assets()['pt-BR.lproj/pass.strings'].sha1
+    assert archive.read('es.lproj/pass.strings').decode('utf-16') == u'"Name" = "Nombre";\n'
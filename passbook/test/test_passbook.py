@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 import json
+import pickle
+import zipfile
+from io import BytesIO
 
 import pytest
 from M2Crypto import BIO
@@ -7,7 +10,8 @@ from M2Crypto import SMIME
 from M2Crypto import X509
 from path import Path
 
-from passbook.models import Barcode, BarcodeFormat, CurrencyField, Pass, StoreCard
+from passbook.models import (AssetRegistry, Barcode, BarcodeFormat, CurrencyField, DateField, Field, Pass, PassHandler,
+                             PassHooks, StoreCard)
 
 cwd = Path(__file__).parent
 
@@ -214,3 +218,156 @@ def test_currency_field_has_no_numberstyle():
     pass_json = passfile.json_dict()
     assert 'currencyCode' in pass_json['storeCard']['headerFields'][0]
     assert 'numberStyle' not in pass_json['storeCard']['headerFields'][0]
+
+
+def test_signer_is_reused(signer):
+    smime = signer.smime
+
+    for serial in ('1', '2'):
+        passfile = create_shell_pass()
+        passfile.serialNumber = serial
+        zip_file = passfile.create(signer=signer)
+        assert zipfile.ZipFile(zip_file).read('signature')
+
+    assert signer.smime is smime
+
+
+def test_signer_can_be_pickled(signer):
+    signer.smime
+
+    clone = pickle.loads(pickle.dumps(signer))
+    assert clone._identity is None
+
+    passfile = create_shell_pass()
+    manifest_json = passfile._createManifest(passfile._createPassJson())
+    assert clone.sign(manifest_json)
+
+
+def test_asset_registry(signer):
+    registry = AssetRegistry()
+    icon = registry.add(open(cwd / 'static' / 'white_square.png', 'rb'))
+    logo = registry.add(open(cwd / 'static' / 'white_square.png', 'rb').read())
+    assert logo is icon
+    assert len(registry) == 1
+    assert registry.get('170eed23019542b0a2890a0bf753effea0db181a') is icon
+
+    passfiles = [create_shell_pass(), create_shell_pass()]
+    for passfile in passfiles:
+        passfile.addAsset('icon.png', icon)
+        passfile.addAsset('logo.png', logo)
+        manifest = json.loads(passfile._createManifest(passfile._createPassJson()))
+        assert manifest['icon.png'] == manifest['logo.png'] == '170eed23019542b0a2890a0bf753effea0db181a'
+    assert passfiles[0]._files['icon.png'].data is passfiles[1]._files['logo.png'].data
+
+    archive = zipfile.ZipFile(passfiles[0].create(signer=signer))
+    assert archive.read('icon.png') == icon.data
+
+
+class RecordingHooks(PassHooks):
+
+    def __init__(self):
+        self.stages = []
+
+    def stage(self, passfile, name, seconds, size):
+        assert seconds >= 0
+        self.stages.append((passfile.serialNumber, name, size))
+
+
+def test_hooks(signer):
+    hooks = RecordingHooks()
+    passfile = create_shell_pass()
+    zip_file = passfile.create(signer=signer, hooks=hooks)
+
+    assert [name for _, name, _ in hooks.stages] == ['key', 'json', 'manifest', 'signature', 'zip']
+    sizes = dict((name, size) for _, name, size in hooks.stages)
+    assert sizes['json'] == len(passfile._createPassJson().encode('utf-8'))
+    assert sizes['zip'] == len(zip_file.getvalue())
+
+    # The identity is only loaded once
+    hooks.stages = []
+    passfile.create(signer=signer, hooks=hooks)
+    assert [name for _, name, _ in hooks.stages] == ['json', 'manifest', 'signature', 'zip']
+
+
+def test_global_hooks(monkeypatch, signer):
+    hooks = RecordingHooks()
+    monkeypatch.setattr(Pass, 'hooks', hooks)
+    create_shell_pass().create(signer=signer)
+    assert len(hooks.stages) == 5
+    assert hooks.stages[0][0] == '1234567'
+
+
+def test_update(signer):
+    passfile = create_shell_pass()
+    passfile.addFile('icon.png', open(cwd / 'static' / 'white_square.png', 'rb'))
+    passfile.addFile('strip.png', BytesIO(b'strip' * 1000))
+    previous = passfile.create(signer=signer, compression=zipfile.ZIP_DEFLATED).getvalue()
+
+    # Only pass.json and logo.png change
+    updated = create_shell_pass()
+    updated.passInformation.addHeaderField('gate', 'B12', 'Gate')
+    updated.addFile('strip.png', BytesIO(b'strip' * 1000))
+    updated.addFile('logo.png', open(cwd / 'static' / 'white_square.png', 'rb'))
+    archive = zipfile.ZipFile(updated.update(previous, signer, compression=zipfile.ZIP_DEFLATED))
+    assert archive.testzip() is None
+    assert archive.namelist() == ['signature', 'manifest.json', 'pass.json', 'icon.png', 'strip.png', 'logo.png']
+    assert json.loads(archive.read('pass.json').decode('utf-8'))['storeCard']['headerFields'][0]['value'] == 'B12'
+
+    previous_archive = zipfile.ZipFile(BytesIO(previous))
+    for filename in ('icon.png', 'strip.png'):
+        assert archive.getinfo(filename).compress_size == previous_archive.getinfo(filename).compress_size
+        assert archive.read(filename) == previous_archive.read(filename)
+
+    manifest_json = archive.read('manifest.json').decode('utf-8')
+    manifest = json.loads(manifest_json)
+    updated._files['icon.png'] = passfile._files['icon.png']
+    assert manifest == json.loads(updated._createManifest(archive.read('pass.json').decode('utf-8')))
+
+    smime = signer.smime
+    store = X509.X509_Store()
+    store.load_info(str(wwdr_certificate))
+    smime.set_x509_store(store)
+    signature = SMIME.load_pkcs7_bio_der(BIO.MemoryBuffer(archive.read('signature')))
+    data_bio = BIO.MemoryBuffer(bytes(manifest_json, encoding='utf8'))
+    assert smime.verify(signature, data_bio, flags=SMIME.PKCS7_NOVERIFY) == bytes(manifest_json, encoding='utf8')
+
+
+def test_compact_objects():
+    field = DateField('boarding', '2020-01-01T10:00Z', 'Boarding', ignoresTimeZone=True)
+    assert not hasattr(field, '__dict__')
+    assert list(field.json_dict()) == ['key', 'value', 'label', 'changeMessage', 'textAlignment',
+                                       'dateStyle', 'timeStyle', 'isRelative', 'ignoresTimeZone']
+
+    field.attributedValue = '<a href="https://example.com">Link</a>'
+    assert field.json_dict()['attributedValue'] == field.attributedValue
+
+    barcode = Barcode('message')
+    assert barcode.json_dict() == {'format': BarcodeFormat.PDF417, 'message': 'message',
+                                   'messageEncoding': 'iso-8859-1'}
+
+    clone = pickle.loads(pickle.dumps(field))
+    assert clone.json_dict() == field.json_dict()
+
+
+def test_other_field_keys():
+    field = Field('seat', '12A', 'Seat')
+    field.row = 0
+    field.semantics = {'seats': [{'seatNumber': '12A'}]}
+    assert field.json_dict()['row'] == 0
+    assert field.json_dict()['semantics'] == {'seats': [{'seatNumber': '12A'}]}
+    date = DateField('boarding', '2020-01-01T10:00Z', 'Boarding')
+    date.row = 1
+    assert json.loads(json.dumps(date, default=PassHandler))['row'] == 1
+    assert pickle.loads(pickle.dumps(date)).row == 1
+    assert not hasattr(date, 'semantics')
+
+
+def test_compact_object_subclasses():
+    class SemanticField(Field):
+        def __init__(self, key, value, label, semantics):
+            super().__init__(key, value, label)
+            self.semantics = semantics
+
+    field = SemanticField('seat', '12A', 'Seat', {'seatNumber': '12A'})
+    assert field.json_dict()['semantics'] == {'seatNumber': '12A'}
+    assert field.json_dict()['key'] == 'seat'
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import os
+import zipfile
+from io import BytesIO
+
+from passbook.pipeline import DirectoryWriter, build, export, manifest, sign, write
+from passbook.test.test_passbook import create_shell_pass
+
+
+def create_pass(i):
+    passfile = create_shell_pass()
+    passfile.serialNumber = str(i)
+    passfile.addFile('strip.png', BytesIO(os.urandom(1024)))
+    return passfile
+
+
+def test_export(signer):
+    results = list(export(range(3), signer, factory=create_pass))
+    assert [serialNumber for serialNumber, _ in results] == ['0', '1', '2']
+    archive = zipfile.ZipFile(BytesIO(results[1][1]))
+    assert archive.namelist() == ['signature', 'manifest.json', 'pass.json', 'strip.png']
+    assert b'"serialNumber": "1"' in archive.read('pass.json')
+
+
+def test_stages_with_workers(tmpdir, signer):
+    passes = (create_pass(i) for i in range(10))
+    items = sign(manifest(build(passes)), signer, workers=2, max_pending=3)
+    results = dict(write(items, DirectoryWriter(str(tmpdir))))
+    assert sorted(results, key=int) == [str(i) for i in range(10)]
+    assert results['7'] == str(tmpdir.join('7.pkpass'))
+    assert zipfile.ZipFile(results['7']).read('signature')
+    assert not tmpdir.listdir(lambda path: path.ext == '.tmp')
+
+
+def test_flat_memory(tmpdir, signer, memory):
+    signer.load()
+    streaming = [memory.peak_memory(memory.export_streaming, count, signer, str(tmpdir)) for count in (10, 40)]
+    assert streaming[1] < streaming[0] * 1.5
+    assert streaming[1] < memory.peak_memory(memory.export_in_memory, 40, signer) / 4
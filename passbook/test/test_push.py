@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from passbook.push import HTTPTransport, PushDispatcher, PushReport
+from passbook.webservice import MemoryStorage
+
+
+def test_notify(push_server):
+    pushTokens = ['token-%d' % i for i in range(50)] + ['unregistered-1', 'busy-1', 'busy-2']
+    dispatcher = PushDispatcher(push_server.transport, connections=4, batch_size=10, backoff=0.01)
+    report = dispatcher.notify(iter(pushTokens), 'pass.com.example')
+    assert report.sent == 52
+    assert report.unregistered == ['unregistered-1']
+    assert report.failed == 0
+    assert report.retries == 2
+    assert report.count == 53
+    assert report.throughput > 0
+    assert push_server.notifications['busy-1'] == 2
+    assert push_server.notifications['token-1'] == 1
+    assert push_server.topics == {'pass.com.example'}
+    # Persistent connections
+    assert len(push_server.clients) <= 4
+
+
+def test_notify_failures(push_server):
+    host, port = push_server.server_address
+    push_server.shutdown()
+    push_server.server_close()
+    # Nothing listens anymore
+    dispatcher = PushDispatcher(HTTPTransport(host, port), connections=2, retries=2, backoff=0.01)
+    report = dispatcher.notify(['token-1', 'token-2'], 'pass.com.example')
+    assert report.failed == 2
+    assert report.retries == 4
+
+    class BrokenTransport(HTTPTransport):
+        def send(self, connection, pushToken, topic):
+            raise ValueError('Bug')
+
+    dispatcher = PushDispatcher(BrokenTransport(host, port), connections=2, batch_size=1)
+    with pytest.raises(ValueError):
+        dispatcher.notify(['token-%d' % i for i in range(20)], 'pass.com.example', PushReport())
+
+
+def test_notify_updated(push_server):
+    storage = MemoryStorage()
+    storage.register('device-1', 'token-1', 'pass.com.example', '1')
+    storage.register('device-1', 'token-1', 'pass.com.example', '2')
+    storage.register('device-2', 'token-2', 'pass.com.example', '2')
+    storage.register('device-3', 'token-3', 'pass.com.example', '3')
+    report = PushDispatcher(push_server.transport).notify_updated(storage, 'pass.com.example', ['1', '2'])
+    assert report.sent == 2
+    assert dict(push_server.notifications) == {'token-1': 1, 'token-2': 1}
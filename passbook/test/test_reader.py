@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import zipfile
+from io import BytesIO
+
+from passbook.reader import PassArchive, PassVerifier, ScanReport, scan, verify_file
+from passbook.test.test_passbook import create_shell_pass, cwd, wwdr_certificate
+
+
+def create_pass_data(signer, serialNumber='1234567'):
+    passfile = create_shell_pass()
+    passfile.serialNumber = serialNumber
+    passfile.addFile('icon.png', open(cwd / 'static' / 'white_square.png', 'rb'))
+    return passfile.create(signer=signer, compression=zipfile.ZIP_DEFLATED).getvalue()
+
+
+def tamper(data, name, content):
+    original = zipfile.ZipFile(BytesIO(data))
+    zip_file = BytesIO()
+    with zipfile.ZipFile(zip_file, 'w') as tampered:
+        for filename in original.namelist():
+            tampered.writestr(filename, content if filename == name else original.read(filename))
+    return zip_file.getvalue()
+
+
+def test_read_pass(tmpdir, signer):
+    data = create_pass_data(signer)
+    path = tmpdir.join('pass.pkpass')
+    path.write_binary(data)
+    for source in (data, str(path), BytesIO(data)):
+        with PassArchive(source) as archive:
+            assert archive.serialNumber == '1234567'
+            assert archive.passTypeIdentifier == 'Pass Type ID'
+            assert sorted(archive.manifest) == ['icon.png', 'pass.json']
+            assert archive.verify_manifest() == []
+
+
+def test_verify(signer):
+    verifier = PassVerifier(wwdr_certificate, chain=False)
+    data = create_pass_data(signer)
+    with PassArchive(data) as archive:
+        assert archive.verify(verifier) == []
+    # The test certificate isn't issued by Apple
+    with PassArchive(data) as archive:
+        assert archive.verify(PassVerifier(wwdr_certificate)) == ['Invalid signature']
+
+    with PassArchive(tamper(data, 'icon.png', b'tampered')) as archive:
+        assert archive.verify(verifier) == ['Wrong hash for icon.png']
+    with PassArchive(tamper(data, 'manifest.json', b'{"pass.json": "x"}')) as archive:
+        assert archive.verify(verifier) == ['Wrong hash for pass.json', 'icon.png is not in the manifest',
+                                            'Invalid signature']
+
+
+def test_scan(tmpdir, signer):
+    for i in range(4):
+        tmpdir.join('%d.pkpass' % i).write_binary(create_pass_data(signer, str(i)))
+    tmpdir.mkdir('more').join('tampered.pkpass').write_binary(tamper(create_pass_data(signer, '5'), 'icon.png', b''))
+    tmpdir.join('broken.pkpass').write_binary(b'not a zip file')
+    tmpdir.join('other.txt').write_binary(b'ignored')
+
+    report = ScanReport()
+    results = list(scan(str(tmpdir), PassVerifier(wwdr_certificate, chain=False), workers=2, report=report))
+    assert sorted(result.serialNumber for result in results if result.valid) == ['0', '1', '2', '3']
+    assert report.count == 6
+    assert report.invalid == 2
+    assert report.throughput > 0
+
+    result = verify_file(str(tmpdir.join('broken.pkpass')))
+    assert not result.valid
+    assert result.serialNumber is None
+
+
+def test_manifest_not_an_object(tmpdir, signer):
+    data = tamper(create_pass_data(signer), 'manifest.json', b'["pass.json"]')
+    tmpdir.join('list.pkpass').write_binary(tamper(data, 'pass.json', b'"1234567"'))
+    tmpdir.join('valid.pkpass').write_binary(create_pass_data(signer))
+    results = sorted(scan(str(tmpdir), PassVerifier(wwdr_certificate, chain=False), workers=1),
+                     key=lambda result: result.path)
+    assert results[0].errors == ['manifest.json is not a JSON object', 'Invalid signature']
+    assert results[0].serialNumber is None
+    assert results[1].valid
+
+
+def test_corrupted_member(tmpdir, signer):
+    data = bytearray(create_pass_data(signer))
+    info = zipfile.ZipFile(BytesIO(bytes(data))).getinfo('icon.png')
+    start = info.header_offset + 30 + len(info.filename) + len(info.extra)
+    data[start + 5:start + 10] = b'\xff' * 5
+    path = tmpdir.join('corrupted.pkpass')
+    path.write_binary(bytes(data))
+    result = verify_file(str(path), PassVerifier(wwdr_certificate, chain=False))
+    assert not result.valid
+    assert result.errors[0].startswith('Unreadable pass')
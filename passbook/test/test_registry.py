@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import os
+import pickle
+import shutil
+import threading
+import time
+
+import pytest
+
+from passbook.batch import create_many
+from passbook import models
+from passbook.models import Pass
+from passbook.pipeline import export
+from passbook.registry import SignerRegistry, resolve_signer
+from passbook.signing import M2CryptoBackend
+from passbook.test.test_passbook import certificate, create_shell_pass, key, wwdr_certificate
+
+
+def create_registry(password, count=3, **kwargs):
+    registry = SignerRegistry(**kwargs)
+    for i in range(count):
+        registry.register('pass.com.brand%d' % i, 'TEAM', certificate, key, wwdr_certificate, password)
+    return registry
+
+
+def create_passes(count, brands=3):
+    for i in range(count):
+        passfile = create_shell_pass()
+        passfile.serialNumber = str(i)
+        passfile.passTypeIdentifier = 'pass.com.brand%d' % (i % brands)
+        passfile.teamIdentifier = 'TEAM'
+        yield passfile
+
+
+def test_mixed_batch(password):
+    registry = create_registry(password)
+    results = dict(create_many(create_passes(12), registry, workers=1))
+    assert len(results) == 12
+    assert registry.loads == 3
+    assert len(list(export(create_passes(12), registry))) == 12
+    assert registry.loads == 3
+    # In worker processes
+    assert len(dict(create_many(create_passes(12), registry, workers=2))) == 12
+    assert len(list(export(create_passes(6), registry, workers=2))) == 6
+    with pytest.raises(KeyError):
+        registry.get('pass.com.unknown', 'TEAM')
+
+
+def test_resolve_signer(password):
+    registry = create_registry(password)
+    assert resolve_signer(registry, 'pass.com.brand1', 'TEAM') is registry.get('pass.com.brand1', 'TEAM')
+    signer = {'certificate': certificate}  # Signers that look like mappings aren't registries
+    assert resolve_signer(signer, 'pass.com.brand1', 'TEAM') is signer
+
+
+def test_lru(password):
+    registry = create_registry(password, max_loaded=2)
+    for brand in (0, 1, 0, 2):
+        registry.get('pass.com.brand%d' % brand, 'TEAM')
+    assert registry.loaded == [('pass.com.brand0', 'TEAM'), ('pass.com.brand2', 'TEAM')]
+    assert registry.loads == 3
+    registry.get('pass.com.brand1', 'TEAM')
+    assert registry.loads == 4
+
+
+def test_hot_reload(tmpdir, password):
+    rotated_key = str(tmpdir.join('private.key'))
+    shutil.copy(key, rotated_key)
+    registry = SignerRegistry(check_interval=0)
+    registry.register('pass.com.example', 'TEAM', certificate, rotated_key, wwdr_certificate, password)
+    signer = registry.get('pass.com.example', 'TEAM')
+    assert registry.get('pass.com.example', 'TEAM') is signer
+    clone = pickle.loads(pickle.dumps(signer))
+    shutil.copy(key, rotated_key + '.new')
+    os.replace(rotated_key + '.new', rotated_key)
+    assert registry.get('pass.com.example', 'TEAM') is not signer
+    assert registry.loads == 2
+
+    # Processes that received the former signer only keep the new one
+    assert pickle.loads(pickle.dumps(registry.get('pass.com.example', 'TEAM'))) is not clone
+    assert len([identity for identity in models._unpickled_signers if rotated_key in identity]) == 1
+
+
+def test_pass_signers(password):
+    passfile = next(create_passes(1))
+    Pass.signers = create_registry(password)
+    try:
+        assert passfile.create().getvalue()
+    finally:
+        Pass.signers = None
+
+
+def test_pickle(password):
+    registry = pickle.loads(pickle.dumps(create_registry(password)))
+    signer = registry.get('pass.com.brand1', 'TEAM')
+    assert pickle.loads(pickle.dumps(signer)) is pickle.loads(pickle.dumps(signer))
+    assert registry.get('pass.com.brand1', 'TEAM').sign('{}')
+
+
+def test_max_concurrent(password):
+    class SlowBackend(M2CryptoBackend):
+        thread_safe = True
+        running = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def sign(self, identity, manifest):
+            with self.lock:
+                SlowBackend.running += 1
+                SlowBackend.peak = max(SlowBackend.peak, SlowBackend.running)
+            time.sleep(0.01)
+            with self.lock:
+                SlowBackend.running -= 1
+            return b''
+
+    registry = SignerRegistry(max_concurrent=2)
+    registry.register('pass.com.example', 'TEAM', certificate, key, wwdr_certificate, password,
+                      SlowBackend())
+    signer = registry.get('pass.com.example', 'TEAM')
+    signer.load()
+    threads = [threading.Thread(target=signer.sign, args=('{}',)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert SlowBackend.peak == 2
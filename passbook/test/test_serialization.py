@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import decimal
+import json
+
+import pytest
+
+from passbook.models import Barcode, BarcodeFormat, IBeacon, Location, NumberField, Pass
+from passbook.serialization import OrjsonBackend, PassHandler, StdlibJSONBackend, get_json_backend
+from passbook.test.test_passbook import create_shell_pass
+
+
+def create_pass():
+    passfile = create_shell_pass(barcodeFormat=BarcodeFormat.CODE128)
+    passfile.passInformation.addPrimaryField('name', u'Jöhn "Doe" \\ 😀\x00\x1f\x7f', u'Näme')
+    passfile.passInformation.auxiliaryFields.append(NumberField('balance', decimal.Decimal('22.50'), 'Balance'))
+    passfile.barcode = Barcode(u'Zürich', BarcodeFormat.QR, altText='alt')
+    passfile.locations = [Location(-34.8222, -58.5358), Location(0.00001, 1e16, 1.5)]
+    passfile.ibeacons = [IBeacon('E2C56DB5-DFFB-48D2-B060-D0F5A71096E0', 1, 2)]
+    passfile.userInfo = {'big': 2 ** 70, 'floats': [1e-05, 123.456, -0.0, 1e300], 'e-ticket': 'Zone1 2e'}
+    return passfile
+
+
+def test_stdlib_backend():
+    passfile = create_pass()
+    pass_json = StdlibJSONBackend().dumps(passfile.json_dict())
+    assert pass_json == json.dumps(passfile, default=PassHandler)
+    assert json.loads(pass_json)['locations'][1]['longitude'] == 1e16
+    pass_json = StdlibJSONBackend(compact=True).dumps(passfile.json_dict())
+    assert pass_json == json.dumps(passfile, default=PassHandler, separators=(',', ':'), ensure_ascii=False)
+
+
+def test_default_backend():
+    passfile = create_pass()
+    assert passfile._createPassJson() == json.dumps(passfile, default=PassHandler)
+    manifest = passfile._createManifest(passfile._createPassJson())
+    assert manifest == json.dumps(json.loads(manifest))
+    with pytest.raises(ValueError):
+        get_json_backend('orjson')
+
+
+def test_plain_locations_and_beacons():
+    passfile = create_pass()
+    passfile.locations = [{'latitude': 1.0, 'longitude': 2.0}, Location(3.0, 4.0)]
+    passfile.ibeacons = [{'proximityUUID': 'E2C56DB5-DFFB-48D2-B060-D0F5A71096E0'}]
+    assert passfile._createPassJson() == json.dumps(passfile, default=PassHandler)
+    assert json.loads(passfile._createPassJson())['locations'][0] == {'latitude': 1.0, 'longitude': 2.0}
+
+
+def test_orjson_backend_is_byte_identical():
+    pytest.importorskip('orjson')
+    stdlib = get_json_backend('json', compact=True)
+    orjson = get_json_backend('orjson', compact=True)
+    passfile = create_pass()
+    assert orjson.dumps(passfile.json_dict()) == stdlib.dumps(passfile.json_dict())
+    manifest = passfile._createManifest(passfile._createPassJson())
+    assert orjson.dumps(json.loads(manifest)) == stdlib.dumps(json.loads(manifest))
+    for value in (1e-05, 0.00001234, 1e16, 1.5e300, 0.1, 2 ** 64, {1: 'a'}, u' 😀', decimal.Decimal('1.10'), None):
+        assert orjson.dumps([value]) == stdlib.dumps([value])
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_non_finite_floats(compact):
+    backends = [get_json_backend('json', compact)]
+    if compact:
+        pytest.importorskip('orjson')
+        backends.append(get_json_backend('orjson', compact))
+    value = {'nan': float('nan'), 'values': [float('inf'), -float('inf'), 1.5]}
+    expected = json.dumps(value, separators=(',', ':')) if compact else json.dumps(value)
+    for backend in backends:
+        assert backend.dumps(value) == expected
+
+
+def test_orjson_backend_nulls():
+    pytest.importorskip('orjson')
+
+    class Failing(object):
+        def dumps(self, obj):
+            raise AssertionError('Serialized by the fallback')
+
+    orjson = get_json_backend('orjson', compact=True)
+    passfile = create_shell_pass()
+    passfile.locations = [Location(-34.8222, -58.5358)]  # distance is None
+    assert OrjsonBackend(Failing()).dumps(passfile.json_dict()) == orjson.dumps(passfile.json_dict())
+    passfile.locations[0].altitude = float('inf')
+    assert '"altitude":Infinity' in orjson.dumps(passfile.json_dict())
+    assert orjson.dumps([None, (1, {'a': float('nan')})]) == '[null,[1,{"a":NaN}]]'
+
+
+def test_pass_json_backend(monkeypatch):
+    passfile = create_pass()
+    pass_json = passfile._createPassJson()
+    monkeypatch.setattr(Pass, 'json_backend', StdlibJSONBackend())
+    assert passfile._createPassJson() == pass_json
+    monkeypatch.setattr(Pass, 'json_backend', get_json_backend(compact=True))
+    assert passfile._createPassJson() == json.dumps(json.loads(pass_json), separators=(',', ':'), ensure_ascii=False)
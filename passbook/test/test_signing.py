@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import pickle
+import ssl
+
+import pytest
+
+from passbook.models import PassSigner
+from passbook.reader import PassArchive, PassVerifier
+from passbook.signing import CryptographyBackend, M2CryptoBackend
+from passbook.test.test_passbook import certificate, create_shell_pass, key, wwdr_certificate
+
+
+@pytest.mark.parametrize('backend', ['m2crypto', 'cryptography'])
+def test_backends(backend, password):
+    pytest.importorskip(backend.replace('m2crypto', 'M2Crypto'))
+    signer = PassSigner(certificate, key, wwdr_certificate, password, backend=backend)
+    data = create_shell_pass().create(signer=signer).getvalue()
+    with PassArchive(data) as archive:
+        assert archive.verify(PassVerifier(wwdr_certificate, chain=False)) == []
+
+    clone = pickle.loads(pickle.dumps(signer))
+    assert clone is not signer
+    assert type(clone.backend) is type(signer.backend)
+    assert pickle.loads(pickle.dumps(signer)) is clone
+
+
+def test_cryptography_backend_der_wwdr_certificate(tmpdir, password):
+    pytest.importorskip('cryptography')
+    der_certificate = tmpdir.join('wwdr.cer')
+    with open(wwdr_certificate) as fd:
+        der_certificate.write_binary(ssl.PEM_cert_to_DER_cert(fd.read()))
+    signer = PassSigner(certificate, key, str(der_certificate), password, backend=CryptographyBackend())
+    manifest = '{"pass.json": "0"}'
+    assert PassVerifier(wwdr_certificate, chain=False).verify(manifest.encode('utf-8'), signer.sign(manifest))
+
+
+def test_default_backend(signer):
+    assert isinstance(signer.backend, M2CryptoBackend)
+
+
+def test_no_crypto_import(cold_start):
+    _, modules = cold_start()
+    assert modules == []
+    _, modules = cold_start(sign=True)
+    assert 'M2Crypto' in modules
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import decimal
+import json
+import zipfile
+
+import pytest
+
+from passbook.models import Barcode, BarcodeFormat, BoardingPass, CurrencyField, DateField, Location, Pass
+from passbook.template import PassTemplate, Variable
+from passbook.test.test_passbook import cwd
+
+
+def create_boarding_pass(serialNumber, message, gate, balance):
+    info = BoardingPass()
+    info.addHeaderField('gate', gate, 'Gate')
+    info.addPrimaryField('from', u'Zürich', 'From')
+    info.addPrimaryField('to', 'Buenos Aires', 'To')
+    info.auxiliaryFields.append(DateField('boarding', '2020-01-01T10:00Z', 'Boarding'))
+    info.backFields.append(CurrencyField('balance', balance, 'Balance', 'USD'))
+    passfile = Pass(info, organizationName='Org Name', passTypeIdentifier='Pass Type ID',
+                    teamIdentifier='Team Identifier')
+    passfile.serialNumber = serialNumber
+    passfile.description = 'A Sample Pass'
+    passfile.barcode = Barcode(message, BarcodeFormat.CODE128, 'alternate text')
+    passfile.locations = [Location(decimal.Decimal('-34.6'), 58.4)]
+    passfile.backgroundColor = 'rgb(0, 0, 0)'
+    passfile.addFile('icon.png', open(cwd / 'static' / 'white_square.png', 'rb'))
+    return passfile
+
+
+def create_template():
+    return PassTemplate(create_boarding_pass(
+        Variable('serialNumber'), Variable('message'), Variable('gate'), Variable('balance')))
+
+
+@pytest.mark.parametrize('values', [
+    {'serialNumber': '1234567', 'message': 'test barcode', 'gate': 'A2', 'balance': 22.5},
+    {'serialNumber': 'ß"\\', 'message': u'Jähn Doe', 'gate': 7, 'balance': decimal.Decimal('1.10')},
+])
+def test_render_matches_pass_json(values):
+    template = create_template()
+    passfile = create_boarding_pass(values['serialNumber'], values['message'], values['gate'], values['balance'])
+    assert template.render(values) == passfile._createPassJson()
+
+
+def test_variables():
+    template = create_template()
+    assert template.variables == {'serialNumber', 'message', 'gate', 'balance'}
+    with pytest.raises(KeyError):
+        template.render({'serialNumber': '1'})
+
+
+def test_create(signer):
+    template = create_template()
+    values = {'serialNumber': '42', 'message': 'test barcode', 'gate': 'A2', 'balance': 10}
+    archive = zipfile.ZipFile(template.create(values, signer))
+
+    pass_json = json.loads(archive.read('pass.json').decode('utf-8'))
+    assert pass_json['serialNumber'] == '42'
+    assert pass_json['barcode']['message'] == 'test barcode'
+    manifest = json.loads(archive.read('manifest.json').decode('utf-8'))
+    assert sorted(manifest) == ['icon.png', 'pass.json']
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import os
+from io import BytesIO
+
+import pytest
+
+from passbook.batch import create_many
+from passbook.models import (Barcode, BarcodeFormat, BoardingPass, Generic, Pass, PassHooks, PassSigner,
+                             StoreCard)
+from passbook.test.test_passbook import certificate, create_shell_pass, key, wwdr_certificate
+from passbook.validation import ValidationError, ValidationReport, Validator, png_size
+
+icon = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'white_square.png')
+
+
+def create_valid_pass(serialNumber='1234567'):
+    passfile = create_shell_pass()
+    passfile.serialNumber = serialNumber
+    with open(icon, 'rb') as fd:
+        passfile.addFile('icon.png', fd)
+    return passfile
+
+
+def test_valid_pass():
+    assert Validator().errors(create_valid_pass()) == []
+
+
+def test_invalid_pass():
+    passfile = create_valid_pass()
+    passfile.description = ''
+    passfile.passInformation.addBackField('name', 'Duplicate', 'Name')
+    passfile.barcode = Barcode(u'Jähn', BarcodeFormat.CODE128)
+    passfile.backgroundColor = 'rgb(256, 0, 0)'
+    passfile.webServiceURL = 'http://example.com'
+    passfile.authenticationToken = 'short'
+    with open(icon, 'rb') as fd:
+        passfile.addFile('logo@2x.png', fd)
+        fd.seek(0)
+        passfile.addFile('thumbnail.png', fd)
+    with open(__file__, 'rb') as fd:
+        passfile.addFile('strip.png', fd)
+    del passfile._files['icon.png']
+    errors = Validator().errors(passfile)
+    assert errors == [
+        'Missing description',
+        'Duplicate field key: name',
+        'Code 128 barcode messages can only hold printable ASCII characters',
+        'Invalid backgroundColor: rgb(256, 0, 0) (must be rgb(r, g, b))',
+        'webServiceURL must use HTTPS',
+        'authenticationToken must have 16 characters at least',
+        'Missing icon.png',
+        'strip.png is not a PNG image',
+    ]
+    # Only some rules
+    assert Validator(['required', 'field_keys']).errors(passfile) == errors[:2]
+
+
+def test_image_sizes():
+    passfile = create_valid_pass()
+    with open(icon, 'rb') as fd:
+        data = fd.read()
+    assert png_size(data) == (58, 58)
+    with open(icon, 'rb') as fd:
+        passfile.addFile('footer@3x.png', fd)
+    assert Validator(['images']).errors(passfile) == ['footer@3x.png is 58x58, larger than 858x45']
+
+
+def test_strip_sizes(create_png):
+    strip = create_png(375, 144)
+    for style, errors in ((StoreCard(), []), (Generic(), ['strip.png is 375x144, larger than 375x123']),
+                          (BoardingPass(), ['strip.png is 375x144, larger than 375x123'])):
+        passfile = create_valid_pass()
+        passfile.passInformation = style
+        passfile.addFile('strip.png', BytesIO(strip))
+        assert Validator(['images']).errors(passfile) == errors
+
+
+def test_validation_before_signing(signer, password):
+    class Hooks(PassHooks):
+        stages = []
+
+        def stage(self, passfile, name, seconds, size):
+            self.stages.append(name)
+
+    class FailingSigner(PassSigner):
+        def sign(self, manifest):
+            raise AssertionError('Invalid passes must not be signed')
+
+    passfile = create_shell_pass()  # Without icon
+    failing = FailingSigner(certificate, key, wwdr_certificate, password)
+    with pytest.raises(ValidationError) as e:
+        passfile.create(signer=failing, validator=Validator())
+    assert e.value.errors == ['Missing icon.png']
+    assert not failing.loaded
+
+    Pass.validator = Validator()
+    try:
+        hooks = Hooks()
+        passfile = create_valid_pass()
+        passfile.create(signer=signer, hooks=hooks)
+        assert hooks.stages[:2] == ['validation', 'key']
+    finally:
+        Pass.validator = None
+
+
+def test_filter(signer):
+    passes = [create_valid_pass('1'), create_shell_pass(), create_valid_pass('3')]
+    passes[1].serialNumber = '2'
+    report = ValidationReport()
+    results = dict(create_many(Validator().filter(passes, report), signer, workers=1))
+    assert sorted(results) == ['1', '3']
+    assert report.count == 3
+    assert report.invalid == 1
+    assert report.rejected == [('2', ['Missing icon.png'])]
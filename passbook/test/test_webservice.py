@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import json
+import zipfile
+from io import BytesIO
+
+import pytest
+
+from passbook.test.test_passbook import create_shell_pass
+from passbook.webservice import MemoryStorage, PassWebService, SQLiteStorage
+
+AUTHORIZATION = {'Authorization': 'ApplePass secret-token'}
+
+
+def create_pass(serialNumber):
+    passfile = create_shell_pass()
+    passfile.description = serialNumber
+    passfile.serialNumber = serialNumber
+    passfile.webServiceURL = 'https://example.com/passes/'
+    passfile.authenticationToken = 'secret-token'
+    return passfile
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def service(request, tmpdir, signer):
+    if request.param == 'memory':
+        storage = MemoryStorage()
+    else:
+        storage = SQLiteStorage(str(tmpdir.join('passes.db')))
+    service = PassWebService(storage)
+    for serialNumber in ('1', '2', '3'):
+        service.publish(create_pass(serialNumber), signer)
+    service.signer = signer
+    return service
+
+
+def register(service, device, serialNumber, headers=AUTHORIZATION):
+    return service.handle('POST', '/v1/devices/%s/registrations/Pass Type ID/%s' % (device, serialNumber),
+                          headers, json.dumps({'pushToken': 'token-%s' % device}).encode('utf-8'))
+
+
+def test_registration(service):
+    assert register(service, 'device', '1').status == 201
+    assert register(service, 'device', '1').status == 200
+    assert register(service, 'device', '1', {'Authorization': 'ApplePass wrong'}).status == 401
+    assert register(service, 'device', 'unknown').status == 401
+    assert register(service, 'other', '1').status == 201
+    assert sorted(service.storage.push_tokens('Pass Type ID', '1')) == ['token-device', 'token-other']
+
+    response = service.handle('DELETE', '/v1/devices/other/registrations/Pass%20Type%20ID/1', AUTHORIZATION)
+    assert response.status == 200
+    assert service.storage.push_tokens('Pass Type ID', '1') == ['token-device']
+
+
+def test_serial_numbers(service):
+    register(service, 'device', '1')
+    register(service, 'device', '2')
+    response = service.handle('GET', '/v1/devices/device/registrations/Pass Type ID')
+    assert response.status == 200
+    result = json.loads(response.body.decode('utf-8'))
+    assert result['serialNumbers'] == ['1', '2']
+
+    path = '/v1/devices/device/registrations/Pass Type ID?passesUpdatedSince=%s' % result['lastUpdated']
+    assert service.handle('GET', path).status == 204
+
+    # Unchanged passes aren't updated
+    assert service.publish(create_pass('1'), service.signer).tag <= int(result['lastUpdated'])
+    assert service.handle('GET', path).status == 204
+
+    for serialNumber in ('2', '3'):  # 3 isn't registered
+        passfile = create_pass(serialNumber)
+        passfile.description = 'Updated'
+        service.publish(passfile, service.signer)
+    response = service.handle('GET', path)
+    assert json.loads(response.body.decode('utf-8'))['serialNumbers'] == ['2']
+    assert service.handle('GET', '/v1/devices/other/registrations/Pass Type ID').status == 204
+
+
+def test_latest_pass(service):
+    response = service.handle('GET', '/v1/passes/Pass Type ID/1', AUTHORIZATION)
+    assert response.status == 200
+    assert response.headers['Content-Type'] == 'application/vnd.apple.pkpass'
+    pass_json = json.loads(zipfile.ZipFile(BytesIO(response.body)).read('pass.json').decode('utf-8'))
+    assert pass_json['serialNumber'] == '1'
+    assert service.handle('GET', '/v1/passes/Pass Type ID/1').status == 401
+
+    headers = dict(AUTHORIZATION, **{'If-None-Match': response.headers['ETag']})
+    not_modified = service.handle('GET', '/v1/passes/Pass Type ID/1', headers)
+    assert not_modified.status == 304
+    assert not_modified.body == b''
+    headers = dict(AUTHORIZATION, **{'If-Modified-Since': response.headers['Last-Modified']})
+    assert service.handle('GET', '/v1/passes/Pass Type ID/1', headers).status == 304
+
+    passfile = create_pass('1')
+    passfile.description = 'Updated'
+    service.publish(passfile, service.signer)
+    headers = dict(AUTHORIZATION, **{'If-None-Match': response.headers['ETag']})
+    assert service.handle('GET', '/v1/passes/Pass Type ID/1', headers).status == 200
+
+
+def test_pass_without_token(service):
+    passfile = create_pass('4')
+    passfile.authenticationToken = None
+    service.publish(passfile, service.signer)
+    headers = {'Authorization': 'ApplePass None'}
+    assert service.handle('GET', '/v1/passes/Pass Type ID/4', headers).status == 401
+    assert register(service, 'device', '4', headers).status == 401
+    assert service.handle('DELETE', '/v1/devices/device/registrations/Pass Type ID/4', headers).status == 401
+
+
+def test_other_requests(service):
+    assert service.handle('POST', '/v1/log', body=b'{"logs": ["Error"]}').status == 200
+    assert service.handle('POST', '/v1/log', body=b'not json').status == 400
+    assert service.handle('GET', '/v2/passes/Pass Type ID/1').status == 404
+    assert service.handle('PUT', '/v1/passes/Pass Type ID/1').status == 405
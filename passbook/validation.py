@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Validation of passes before they are signed: catches the mistakes that
+make devices reject a pass (missing keys, duplicate field keys, barcodes
+that can't be encoded, images of the wrong size...) without spending a
+signature on it.
+"""
+import collections
+import re
+import struct
+
+from passbook.images import IMAGE_SIZES, PNG_SIGNATURE, SCALES
+from passbook.models import BarcodeFormat
+
+_REQUIRED_KEYS = ('description', 'organizationName', 'passTypeIdentifier', 'serialNumber', 'teamIdentifier')
+
+_FIELD_GROUPS = ('headerFields', 'primaryFields', 'secondaryFields', 'auxiliaryFields', 'backFields')
+
+_BARCODE_FORMATS = {BarcodeFormat.PDF417, BarcodeFormat.QR, BarcodeFormat.AZTEC, BarcodeFormat.CODE128}
+
+_COLORS = ('backgroundColor', 'foregroundColor', 'labelColor')
+_color = re.compile(r'rgb\(\s*(\d{1,3})\s*,\s*(\d{1,3})\s*,\s*(\d{1,3})\s*\)$')
+
+
+def _max_sizes():
+    """
+    :return: The largest size in pixels of every image file (including the
+             @2x and @3x versions), by file name and style. Devices scale
+             bigger icons down, so their size isn't limited.
+    """
+    sizes = {}
+    for image, styles in IMAGE_SIZES.items():
+        if image == 'icon':
+            continue
+        for suffix, scale in SCALES.items():
+            sizes['%s%s.png' % (image, suffix)] = {
+                style: (width * scale, height * scale) for style, (width, height) in styles.items()
+            }
+    return sizes
+
+
+_MAX_SIZES = _max_sizes()
+
+
+class ValidationError(ValueError):
+    """
+    Raised when a pass breaks some of the rules it is validated against.
+    `errors` holds the description of every broken rule.
+    """
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+    def __reduce__(self):
+        # Raised in worker processes too
+        return ValidationError, (self.errors,)
+
+
+def check_required(passfile):
+    for name in _REQUIRED_KEYS:
+        if not getattr(passfile, name):
+            yield 'Missing %s' % name
+    if passfile.formatVersion != 1:
+        yield 'formatVersion must be 1'
+    if passfile.passInformation is None:
+        yield 'Missing pass style'
+
+
+def check_field_keys(passfile):
+    seen = set()
+    for group in _FIELD_GROUPS:
+        for field in getattr(passfile.passInformation, group, ()):
+            if not field.key:
+                yield 'Field without key in %s' % group
+            elif field.key in seen:
+                yield 'Duplicate field key: %s' % field.key
+            seen.add(field.key)
+
+
+def check_barcode(passfile):
+    barcode = passfile.barcode
+    if barcode is None:
+        return
+    if barcode.format not in _BARCODE_FORMATS:
+        yield 'Unknown barcode format: %s' % barcode.format
+    if not isinstance(barcode.message, str):
+        return  # e.g. a passbook.template.Variable
+    try:
+        barcode.message.encode(barcode.messageEncoding)
+    except LookupError:
+        yield 'Unknown barcode message encoding: %s' % barcode.messageEncoding
+    except UnicodeEncodeError:
+        yield 'Barcode message not encodable as %s' % barcode.messageEncoding
+    if barcode.format == BarcodeFormat.CODE128 and not all(' ' <= c <= '~' for c in barcode.message):
+        yield 'Code 128 barcode messages can only hold printable ASCII characters'
+
+
+def check_colors(passfile):
+    for name in _COLORS:
+        value = getattr(passfile, name)
+        if value is None or not isinstance(value, str):
+            continue
+        match = _color.match(value)
+        if match is None or any(int(component) > 255 for component in match.groups()):
+            yield 'Invalid %s: %s (must be rgb(r, g, b))' % (name, value)
+
+
+def check_web_service(passfile):
+    if passfile.webServiceURL and isinstance(passfile.webServiceURL, str):
+        if not passfile.webServiceURL.startswith('https://'):
+            yield 'webServiceURL must use HTTPS'
+        if len(passfile.authenticationToken or '') < 16:
+            yield 'authenticationToken must have 16 characters at least'
+
+
+def png_size(data):
+    """
+    :return: The width and height of the PNG image `data`, None if it isn't
+             a PNG image.
+    """
+    if data[:8] != PNG_SIGNATURE or data[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', data[16:24])
+
+
+def check_images(passfile):
+    if 'icon.png' not in passfile._files:
+        yield 'Missing icon.png'
+    style = getattr(passfile.passInformation, 'jsonname', None)
+    for filename, asset in passfile._files.items():
+        directory, _, name = filename.rpartition('/')
+        if not name.endswith('.png') or (directory and not directory.endswith('.lproj')):
+            continue
+        size = png_size(asset.data)
+        if size is None:
+            yield '%s is not a PNG image' % filename
+            continue
+        sizes = _MAX_SIZES.get(name)
+        if sizes is None:
+            continue
+        width, height = sizes.get(style, sizes[None])
+        if size[0] > width or size[1] > height:
+            yield '%s is %dx%d, larger than %dx%d' % ((filename,) + size + (width, height))
+
+
+# Rules by name, in the order they are checked
+RULES = collections.OrderedDict([
+    ('required', check_required),
+    ('field_keys', check_field_keys),
+    ('barcode', check_barcode),
+    ('colors', check_colors),
+    ('web_service', check_web_service),
+    ('images', check_images),
+])
+
+
+class ValidationReport(object):
+    """
+    Counts the passes checked by `Validator.filter`, and holds the serial
+    number and errors of every invalid one.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.rejected = []
+
+    @property
+    def invalid(self):
+        return len(self.rejected)
+
+
+class Validator(object):
+    """
+    Checks passes against the `rules` with the given names (see `RULES`, all
+    of them by default). A rule is a function that yields the description of
+    every problem it finds in a pass, extra ones can be given as `extra`.
+
+    The rules are looked up once, when the validator is built: share one
+    validator among all the passes to check.
+    """
+
+    def __init__(self, rules=None, extra=()):
+        names = RULES if rules is None else rules
+        self._rules = tuple(RULES[name] for name in names) + tuple(extra)
+
+    def errors(self, passfile):
+        """
+        :return: The description of every broken rule (an empty list if the
+                 pass is valid).
+        """
+        errors = []
+        for rule in self._rules:
+            errors.extend(rule(passfile))
+        return errors
+
+    def check(self, passfile):
+        """
+        Raises `ValidationError` if the pass breaks any rule.
+        """
+        errors = self.errors(passfile)
+        if errors:
+            raise ValidationError(errors)
+
+    def filter(self, passes, report=None):
+        """
+        Yields the valid passes among `passes` (any iterable) and drops the
+        invalid ones, which are recorded in `report` (a `ValidationReport`),
+        e.g. to only sign valid passes with `passbook.batch.create_many`:
+
+            create_many(validator.filter(passes, report), signer)
+        """
+        for passfile in passes:
+            errors = self.errors(passfile)
+            if report is not None:
+                report.count += 1
+                if errors:
+                    report.rejected.append((passfile.serialNumber, errors))
+            if not errors:
+                yield passfile
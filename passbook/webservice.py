@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+"""
+Framework neutral implementation of the web service that keeps passes up to
+date (https://developer.apple.com/documentation/walletpasses/adding_a_web_service_to_update_passes):
+device registration, passes updated since a given tag and latest version
+of a pass.
+
+Passes are published to a `PassStorage` once built, so requests for the
+latest version of a pass copy the stored .pkpass file (or answer 304 Not
+Modified from its stored ETag) instead of building it again:
+
+    service = PassWebService(SQLiteStorage('passes.db'))
+    service.publish(passfile, signer)
+
+    # In the view of any web framework
+    response = service.handle(request.method, request.path, request.headers, request.body)
+"""
+import collections
+import email.utils
+import hashlib
+import hmac
+import json
+import logging
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qs, unquote
+
+from passbook.archive import read_entries
+
+logger = logging.getLogger(__name__)
+
+PKPASS_CONTENT_TYPE = 'application/vnd.apple.pkpass'
+
+
+class StoredPass(object):
+    """
+    Latest version of a pass published to a `PassStorage`, without its
+    content. `tag` orders the updates of the passes of a pass type.
+    """
+
+    def __init__(self, passTypeIdentifier, serialNumber, authenticationToken, etag, modified, tag):
+        self.passTypeIdentifier = passTypeIdentifier
+        self.serialNumber = serialNumber
+        self.authenticationToken = authenticationToken
+        self.etag = etag
+        self.modified = modified  # Timestamp
+        self.tag = tag
+
+
+def _etag(data):
+    # The manifest identifies the content of the pass, whenever it was built
+    manifest = read_entries(data)['manifest.json'].read()
+    return '"%s"' % hashlib.sha1(manifest).hexdigest()
+
+
+class PassStorage(object):
+    """
+    Storage of the passes and the devices registered for their updates, to
+    be implemented for each database.
+    """
+
+    def save_pass(self, passTypeIdentifier, serialNumber, authenticationToken, data):
+        """
+        Saves `data` (the .pkpass file) as the latest version of the pass,
+        unless it has the same content (manifest) as the version already
+        stored.
+
+        :return: StoredPass
+        """
+        raise NotImplementedError
+
+    def get_pass(self, passTypeIdentifier, serialNumber):
+        """
+        :return: StoredPass, None if the pass isn't stored.
+        """
+        raise NotImplementedError
+
+    def read_pass(self, passTypeIdentifier, serialNumber):
+        """
+        :return: The latest .pkpass file of the pass (bytes).
+        """
+        raise NotImplementedError
+
+    def register(self, deviceLibraryIdentifier, pushToken, passTypeIdentifier, serialNumber):
+        """
+        :return: Whether the device wasn't registered for the pass yet.
+        """
+        raise NotImplementedError
+
+    def unregister(self, deviceLibraryIdentifier, passTypeIdentifier, serialNumber):
+        """
+        :return: Whether the device was registered for the pass.
+        """
+        raise NotImplementedError
+
+    def updated_since(self, deviceLibraryIdentifier, passTypeIdentifier, tag=None):
+        """
+        :return: The serial numbers of the passes of `passTypeIdentifier`
+                 for which the device is registered updated after `tag`
+                 (all of them if None), and the tag of the last update.
+        """
+        raise NotImplementedError
+
+    def push_tokens(self, passTypeIdentifier, serialNumber):
+        """
+        :return: The push tokens of the devices registered for the pass.
+        """
+        raise NotImplementedError
+
+
+class MemoryStorage(PassStorage):
+    """
+    Keeps everything in memory, for tests and single process services.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._passes = {}  # (StoredPass, data) by (passTypeIdentifier, serialNumber)
+        # Serial numbers of every pass type, least recently updated first
+        self._updates = collections.defaultdict(collections.OrderedDict)
+        self._tags = collections.Counter()  # Last tag of every pass type
+        self._tokens = {}  # Push token by device
+        self._registrations = collections.defaultdict(set)  # Devices by pass
+        self._devices = collections.defaultdict(set)  # Serial numbers by (device, passTypeIdentifier)
+
+    def save_pass(self, passTypeIdentifier, serialNumber, authenticationToken, data):
+        etag = _etag(data)
+        with self._lock:
+            previous = self._passes.get((passTypeIdentifier, serialNumber))
+            if previous and previous[0].etag == etag and previous[0].authenticationToken == authenticationToken:
+                return previous[0]
+            self._tags[passTypeIdentifier] += 1
+            stored = StoredPass(passTypeIdentifier, serialNumber, authenticationToken, etag, time.time(),
+                                self._tags[passTypeIdentifier])
+            self._passes[passTypeIdentifier, serialNumber] = stored, data
+            updates = self._updates[passTypeIdentifier]
+            updates[serialNumber] = stored.tag
+            updates.move_to_end(serialNumber)
+        return stored
+
+    def get_pass(self, passTypeIdentifier, serialNumber):
+        stored = self._passes.get((passTypeIdentifier, serialNumber))
+        return stored[0] if stored else None
+
+    def read_pass(self, passTypeIdentifier, serialNumber):
+        return self._passes[passTypeIdentifier, serialNumber][1]
+
+    def register(self, deviceLibraryIdentifier, pushToken, passTypeIdentifier, serialNumber):
+        with self._lock:
+            self._tokens[deviceLibraryIdentifier] = pushToken
+            devices = self._registrations[passTypeIdentifier, serialNumber]
+            if deviceLibraryIdentifier in devices:
+                return False
+            devices.add(deviceLibraryIdentifier)
+            self._devices[deviceLibraryIdentifier, passTypeIdentifier].add(serialNumber)
+            return True
+
+    def unregister(self, deviceLibraryIdentifier, passTypeIdentifier, serialNumber):
+        with self._lock:
+            devices = self._registrations.get((passTypeIdentifier, serialNumber), set())
+            if deviceLibraryIdentifier not in devices:
+                return False
+            devices.discard(deviceLibraryIdentifier)
+            self._devices[deviceLibraryIdentifier, passTypeIdentifier].discard(serialNumber)
+            return True
+
+    def updated_since(self, deviceLibraryIdentifier, passTypeIdentifier, tag=None):
+        with self._lock:
+            registered = self._devices.get((deviceLibraryIdentifier, passTypeIdentifier), set())
+            updates = self._updates.get(passTypeIdentifier, collections.OrderedDict())
+            if tag is None:
+                serialNumbers = [serialNumber for serialNumber in registered if serialNumber in updates]
+            else:
+                # Walks back the updates only until `tag`
+                serialNumbers = []
+                for serialNumber in reversed(updates):
+                    if updates[serialNumber] <= tag:
+                        break
+                    if serialNumber in registered:
+                        serialNumbers.append(serialNumber)
+            return sorted(serialNumbers), self._tags[passTypeIdentifier]
+
+    def push_tokens(self, passTypeIdentifier, serialNumber):
+        with self._lock:
+            return [self._tokens[device] for device in self._registrations.get((passTypeIdentifier, serialNumber), ())]
+
+
+class SQLiteStorage(PassStorage):
+    """
+    Keeps everything in the SQLite database at `path`. Passes updated since
+    a tag are found through an index on the update tags of every pass type.
+    """
+
+    _schema = (
+        """CREATE TABLE IF NOT EXISTS passes (
+            pass_type_identifier TEXT NOT NULL,
+            serial_number TEXT NOT NULL,
+            authentication_token TEXT,
+            data BLOB NOT NULL,
+            etag TEXT NOT NULL,
+            modified REAL NOT NULL,
+            tag INTEGER NOT NULL,
+            PRIMARY KEY (pass_type_identifier, serial_number))""",
+        "CREATE INDEX IF NOT EXISTS passes_tag ON passes (pass_type_identifier, tag)",
+        """CREATE TABLE IF NOT EXISTS devices (
+            device_library_identifier TEXT PRIMARY KEY,
+            push_token TEXT NOT NULL)""",
+        """CREATE TABLE IF NOT EXISTS registrations (
+            device_library_identifier TEXT NOT NULL,
+            pass_type_identifier TEXT NOT NULL,
+            serial_number TEXT NOT NULL,
+            PRIMARY KEY (device_library_identifier, pass_type_identifier, serial_number))""",
+        "CREATE INDEX IF NOT EXISTS registrations_pass ON registrations (pass_type_identifier, serial_number)",
+    )
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            for statement in self._schema:
+                self._connection.execute(statement)
+
+    def close(self):
+        self._connection.close()
+
+    def _execute(self, sql, parameters=()):
+        with self._lock, self._connection:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def save_pass(self, passTypeIdentifier, serialNumber, authenticationToken, data):
+        etag = _etag(data)
+        modified = time.time()
+        with self._lock, self._connection:
+            previous = self._connection.execute(
+                'SELECT authentication_token, etag, modified, tag FROM passes '
+                'WHERE pass_type_identifier = ? AND serial_number = ?', (passTypeIdentifier, serialNumber)).fetchone()
+            if previous and previous[1] == etag and previous[0] == authenticationToken:
+                return StoredPass(passTypeIdentifier, serialNumber, *previous)
+            tag, = self._connection.execute(
+                'SELECT COALESCE(MAX(tag), 0) + 1 FROM passes WHERE pass_type_identifier = ?',
+                (passTypeIdentifier,)).fetchone()
+            self._connection.execute(
+                'INSERT OR REPLACE INTO passes VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (passTypeIdentifier, serialNumber, authenticationToken, data, etag, modified, tag))
+        return StoredPass(passTypeIdentifier, serialNumber, authenticationToken, etag, modified, tag)
+
+    def get_pass(self, passTypeIdentifier, serialNumber):
+        rows = self._execute(
+            'SELECT authentication_token, etag, modified, tag FROM passes '
+            'WHERE pass_type_identifier = ? AND serial_number = ?', (passTypeIdentifier, serialNumber))
+        return StoredPass(passTypeIdentifier, serialNumber, *rows[0]) if rows else None
+
+    def read_pass(self, passTypeIdentifier, serialNumber):
+        rows = self._execute('SELECT data FROM passes WHERE pass_type_identifier = ? AND serial_number = ?',
+                             (passTypeIdentifier, serialNumber))
+        if not rows:
+            raise KeyError((passTypeIdentifier, serialNumber))
+        return bytes(rows[0][0])
+
+    def register(self, deviceLibraryIdentifier, pushToken, passTypeIdentifier, serialNumber):
+        with self._lock, self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO devices VALUES (?, ?)',
+                                     (deviceLibraryIdentifier, pushToken))
+            cursor = self._connection.execute(
+                'INSERT OR IGNORE INTO registrations VALUES (?, ?, ?)',
+                (deviceLibraryIdentifier, passTypeIdentifier, serialNumber))
+            return cursor.rowcount == 1
+
+    def unregister(self, deviceLibraryIdentifier, passTypeIdentifier, serialNumber):
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                'DELETE FROM registrations WHERE device_library_identifier = ? AND pass_type_identifier = ? '
+                'AND serial_number = ?', (deviceLibraryIdentifier, passTypeIdentifier, serialNumber))
+            return cursor.rowcount == 1
+
+    def updated_since(self, deviceLibraryIdentifier, passTypeIdentifier, tag=None):
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT passes.serial_number FROM registrations JOIN passes '
+                'ON passes.pass_type_identifier = registrations.pass_type_identifier '
+                'AND passes.serial_number = registrations.serial_number '
+                'WHERE registrations.device_library_identifier = ? AND registrations.pass_type_identifier = ? '
+                'AND passes.tag > ? ORDER BY passes.serial_number',
+                (deviceLibraryIdentifier, passTypeIdentifier, tag or 0)).fetchall()
+            last, = self._connection.execute(
+                'SELECT COALESCE(MAX(tag), 0) FROM passes WHERE pass_type_identifier = ?',
+                (passTypeIdentifier,)).fetchone()
+        return [serialNumber for serialNumber, in rows], last
+
+    def push_tokens(self, passTypeIdentifier, serialNumber):
+        rows = self._execute(
+            'SELECT devices.push_token FROM registrations JOIN devices '
+            'ON devices.device_library_identifier = registrations.device_library_identifier '
+            'WHERE registrations.pass_type_identifier = ? AND registrations.serial_number = ?',
+            (passTypeIdentifier, serialNumber))
+        return [pushToken for pushToken, in rows]
+
+
+class Response(object):
+
+    def __init__(self, status, headers=None, body=b''):
+        self.status = status
+        self.headers = headers or {}
+        self.body = body
+
+
+def _json_response(status, obj):
+    return Response(status, {'Content-Type': 'application/json'}, json.dumps(obj).encode('utf-8'))
+
+
+class PassWebService(object):
+    """
+    The web service of the passes published to `storage` (a `PassStorage`).
+
+    `handle` answers the requests of the web service protocol whatever the
+    web framework; each endpoint is also available as a method.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def publish(self, passfile, signer, **kwargs):
+        """
+        Builds `passfile` (with `Pass.create`, given `signer` and `kwargs`)
+        and stores it as the latest version of the pass.
+
+        :return: StoredPass
+        """
+        data = passfile.create(signer=signer, **kwargs).getvalue()
+        return self.storage.save_pass(passfile.passTypeIdentifier, passfile.serialNumber,
+                                      passfile.authenticationToken, data)
+
+    def _authorized(self, passTypeIdentifier, serialNumber, headers):
+        stored = self.storage.get_pass(passTypeIdentifier, serialNumber)
+        if stored is None or not stored.authenticationToken:
+            return None  # Passes published without a token can't be updated
+        authorization = headers.get('authorization', '').encode('utf-8')
+        expected = ('ApplePass %s' % stored.authenticationToken).encode('utf-8')
+        if not hmac.compare_digest(authorization, expected):
+            return None
+        return stored
+
+    def register(self, deviceLibraryIdentifier, passTypeIdentifier, serialNumber, headers, body):
+        if self._authorized(passTypeIdentifier, serialNumber, headers) is None:
+            return Response(401)
+        try:
+            pushToken = json.loads(body.decode('utf-8'))['pushToken']
+        except (ValueError, KeyError, TypeError):
+            return Response(400)
+        created = self.storage.register(deviceLibraryIdentifier, pushToken, passTypeIdentifier, serialNumber)
+        return Response(201 if created else 200)
+
+    def unregister(self, deviceLibraryIdentifier, passTypeIdentifier, serialNumber, headers):
+        if self._authorized(passTypeIdentifier, serialNumber, headers) is None:
+            return Response(401)
+        self.storage.unregister(deviceLibraryIdentifier, passTypeIdentifier, serialNumber)
+        return Response(200)
+
+    def serial_numbers(self, deviceLibraryIdentifier, passTypeIdentifier, passesUpdatedSince=None):
+        try:
+            tag = int(passesUpdatedSince) if passesUpdatedSince else None
+        except ValueError:
+            tag = None
+        serialNumbers, last = self.storage.updated_since(deviceLibraryIdentifier, passTypeIdentifier, tag)
+        if not serialNumbers:
+            return Response(204)
+        return _json_response(200, {'serialNumbers': serialNumbers, 'lastUpdated': str(last)})
+
+    def latest_pass(self, passTypeIdentifier, serialNumber, headers):
+        stored = self._authorized(passTypeIdentifier, serialNumber, headers)
+        if stored is None:
+            return Response(401)
+        response_headers = {
+            'ETag': stored.etag,
+            'Last-Modified': email.utils.formatdate(stored.modified, usegmt=True),
+        }
+        if 'if-none-match' in headers:
+            if stored.etag in [etag.strip() for etag in headers['if-none-match'].split(',')]:
+                return Response(304, response_headers)
+        elif 'if-modified-since' in headers:
+            try:
+                since = email.utils.parsedate_to_datetime(headers['if-modified-since']).timestamp()
+            except (TypeError, ValueError):
+                since = None
+            if since is not None and int(stored.modified) <= since:
+                return Response(304, response_headers)
+        response_headers['Content-Type'] = PKPASS_CONTENT_TYPE
+        return Response(200, response_headers, self.storage.read_pass(passTypeIdentifier, serialNumber))
+
+    def log(self, body):
+        try:
+            messages = json.loads(body.decode('utf-8'))['logs']
+        except (ValueError, KeyError, TypeError):
+            return Response(400)
+        for message in messages:
+            logger.warning('Wallet: %s', message)
+        return Response(200)
+
+    def handle(self, method, path, headers=None, body=b''):
+        """
+        Answers the request for `path` (relative to the webServiceURL of the
+        passes, with its query string).
+
+        :return: Response
+        """
+        headers = {name.lower(): value for name, value in (headers or {}).items()}
+        path, _, query = path.partition('?')
+        parts = [unquote(part) for part in path.split('/') if part]
+        if parts[:1] != ['v1']:
+            return Response(404)
+        parts = parts[1:]
+        method = method.upper()
+
+        if len(parts) == 5 and parts[0] == 'devices' and parts[2] == 'registrations':
+            if method == 'POST':
+                return self.register(parts[1], parts[3], parts[4], headers, body)
+            if method == 'DELETE':
+                return self.unregister(parts[1], parts[3], parts[4], headers)
+            return Response(405)
+        if len(parts) == 4 and parts[0] == 'devices' and parts[2] == 'registrations':
+            if method == 'GET':
+                passesUpdatedSince = parse_qs(query).get('passesUpdatedSince', [None])[0]
+                return self.serial_numbers(parts[1], parts[3], passesUpdatedSince)
+            return Response(405)
+        if len(parts) == 3 and parts[0] == 'passes':
+            if method == 'GET':
+                return self.latest_pass(parts[1], parts[2], headers)
+            return Response(405)
+        if parts == ['log']:
+            if method == 'POST':
+                return self.log(body)
+            return Response(405)
+        return Response(404)
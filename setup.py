@@ -7,7 +7,8 @@ setup(
     version=version,
     author='Fernando Aramendi',
     author_email='fernando@devartis.com',
-    packages=['passbook', 'passbook.test'],
+    packages=['passbook', 'passbook.benchmarks', 'passbook.test'],
+    package_data={'passbook.benchmarks': ['baseline.json']},
     url='http://github.com/devartis/passbook/',
     license=open('LICENSE.txt').read(),
     description='Passbook file generator',
@@ -18,6 +19,15 @@ setup(
     install_requires=[
         'M2Crypto >= 0.28.2',
     ],
+    extras_require={
+        'orjson': ['orjson'],
+        'images': ['Pillow'],
+        'cryptography': ['cryptography'],
+        'httpx': ['httpx[http2]'],
+    },
+    entry_points={
+        'console_scripts': ['passbook = passbook.cli:main'],
+    },
 
     classifiers=[
         'Development Status :: 3 - Alpha',